@@ -1,11 +1,24 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, Response, stream_with_context
 import os
+import click
 from flask_cors import CORS
 from .models import User
 from werkzeug.security import generate_password_hash
 
 from .extensions import db, migrate, jwt, mail
 from .config import Config
+from .utils.storage import get_storage, LocalStorage
+from .utils.images import get_mime_type
+from .utils.image_counters import reconcile_image_counters
+from .utils.mailer import init_mail_sender, deliver_pending
+from .utils.contact_digest import flush_contact_digest
+from .utils.contact_archive import archive_old_contacts
+from .utils.passwords import PasswordHasherBusy
+from .utils.sqlite_pragmas import init_sqlite_pragmas
+from .utils.write_queue import WriteQueueTimeout, init_write_queue
+from .utils.db_routing import init_replica_routing, init_read_only_requests
+from .utils.db_pool import init_db_pool, pool_snapshot
+from .utils.query_deadline import init_query_deadlines, is_statement_timeout, record_statement_timeout
 
 # Import route blueprints
 from .routes.users_route import users_bp
@@ -18,6 +31,7 @@ from .routes.blog_route import blog_bp
 from .routes.portfolio_route import portfolio_bp
 from .routes.images_route import images_bp
 from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 
 # Configure Flask to serve React build (client/my-portfolio/dist)
 app = Flask(
@@ -31,9 +45,16 @@ app.config.from_object(Config)
 
 # Initialize extensions
 db.init_app(app)
+init_sqlite_pragmas(app, db)
+init_replica_routing(app)
+init_read_only_requests(app)
+init_db_pool(app, db)
+init_query_deadlines(app, db)
 migrate.init_app(app, db)
 jwt.init_app(app)
 mail.init_app(app)
+init_mail_sender(app)
+init_write_queue(app)
 
 # Enable CORS with more permissive settings
 CORS(app, 
@@ -67,6 +88,35 @@ app.register_blueprint(blog_bp, url_prefix='/api')
 app.register_blueprint(portfolio_bp, url_prefix='/api')
 app.register_blueprint(images_bp, url_prefix='/api/images')
 
+# CLI commands
+@app.cli.command('reconcile-image-counters')
+def reconcile_image_counters_command():
+    """Rebuild the image counters from the images table and report any drift."""
+    drift = reconcile_image_counters()
+    for scope, scope_key, stored_count, count, stored_bytes, size in drift:
+        print(f"{scope}:{scope_key} count {stored_count} -> {count}, bytes {stored_bytes} -> {size}")
+    print(f"Image counters reconciled ({len(drift)} drifted)")
+
+@app.cli.command('send-queued-mail')
+def send_queued_mail_command():
+    """Deliver every due email in the outbox once (for cron or manual draining)."""
+    if app.config.get('CONTACT_DIGEST_ENABLED'):
+        flush_contact_digest()
+    total = 0
+    while True:
+        sent = deliver_pending()
+        if not sent:
+            break
+        total += sent
+    print(f"Sent {total} queued emails")
+
+@app.cli.command('archive-contacts')
+@click.option('--days', type=int, default=None, help='Retention window in days (default CONTACT_RETENTION_DAYS)')
+def archive_contacts_command(days):
+    """Move old contact messages from contacts to contacts_archive, keeping monthly rollups."""
+    archived = archive_old_contacts(retention_days=days)
+    print(f"Archived {archived} contact messages")
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -88,6 +138,44 @@ def unauthorized(error):
 def forbidden(error):
     return jsonify({"error": "Forbidden"}), 403
 
+@app.errorhandler(DBAPIError)
+def database_error(error):
+    # The connection dropped mid-request; the pool has been refreshed, so a retry will reconnect
+    if error.connection_invalidated:
+        response = jsonify({"error": "Database connection was reset, please retry", "retry_after": 1})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    # A statement ran past its deadline (DB_STATEMENT_TIMEOUT_MS / @query_deadline) and was cancelled
+    if is_statement_timeout(error):
+        record_statement_timeout(app)
+        app.logger.warning(f"Query deadline exceeded in {request.endpoint}: {str(error.statement)[:200]}")
+        return jsonify({"error": "The request took too long, please try again later"}), 504
+    app.logger.error(f"Database error: {str(error)}")
+    return jsonify({"error": "Internal server error"}), 500
+
+@app.errorhandler(PoolTimeoutError)
+def database_busy(error):
+    # Every pooled connection stayed checked out for DB_POOL_TIMEOUT seconds
+    app.logger.warning(f"No database connection available: {str(error)}")
+    response = jsonify({"error": "Server is busy, please try again shortly", "retry_after": 1})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({"error": "Server is busy, please try again shortly", "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+@app.errorhandler(WriteQueueTimeout)
+def write_queue_timeout(error):
+    # A retry would write twice if the job may still commit, so only ask for one when it was cancelled
+    if error.may_apply:
+        return jsonify({"message": "Accepted, still being saved; do not resend", "pending": True}), 202
+    response = jsonify({"error": "Server is busy, nothing was saved; please try again", "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_react(path):
@@ -104,7 +192,14 @@ def serve_react(path):
 # Serve static files (uploads)
 @app.route('/static/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory('static/uploads', filename)    
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        return send_from_directory(storage.root, filename)
+
+    # Object storage without a public URL: stream the object through
+    if not storage.exists(filename):
+        return jsonify({"error": "Resource not found"}), 404
+    return Response(stream_with_context(storage.get(filename)), mimetype=get_mime_type(filename))
 
 @app.route('/health')
 def health_check():
@@ -137,5 +232,19 @@ def debug_db():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Connection pool sizing and checkout wait times, per bind, for this worker
+@app.route('/debug/db/pool')
+def debug_db_pool():
+    config = app.config
+    per_worker = config['DB_POOL_SIZE'] + config['DB_MAX_OVERFLOW']
+    return jsonify({
+        "pools": {bind or 'default': pool_snapshot(engine) for bind, engine in db.engines.items()},
+        "workers": config['WEB_CONCURRENCY'],
+        "threads": config['GUNICORN_THREADS'],
+        "max_connections_per_worker": per_worker,
+        "max_connections_total": per_worker * config['WEB_CONCURRENCY'],
+        "statement_timeouts": app.extensions['query_deadlines'].snapshot(),
+    }), 200
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput vs. latency of other endpoints while logins run.
+
+Runs N login threads and one reader hitting GET /api/projects against a
+throwaway SQLite database, once with hashing inline on the request threads
+and once on the bounded hasher pool.
+Run with: python server/bench_passwords.py [--seconds 5] [--login-threads 8]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ['MAIL_SENDER_ENABLED'] = 'False'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.app import app
+from server.extensions import db
+from server.models import User
+from server.utils.passwords import PasswordHasher
+
+app.config['RATE_LIMIT_ENABLED'] = False
+
+
+def run(label, hasher, seconds, login_threads):
+    old = app.extensions.pop('password_hasher', None)
+    if old is not None:
+        old.shutdown()
+    app.extensions['password_hasher'] = hasher
+
+    stop = threading.Event()
+    results = {'ok': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    read_latencies = []
+
+    def login_loop():
+        client = app.test_client()
+        while not stop.is_set():
+            status = client.post('/api/auth/login', json={
+                'email': 'bench@example.com', 'password': 'bench-password'
+            }).status_code
+            key = 'ok' if status == 200 else 'busy' if status == 503 else 'failed'
+            with lock:
+                results[key] += 1
+            if status == 503:
+                time.sleep(0.01)
+
+    def read_loop():
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get('/api/projects')
+            read_latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=read_loop))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    hasher.shutdown()
+
+    read_latencies.sort()
+    p95 = read_latencies[int(len(read_latencies) * 0.95) - 1] if read_latencies else 0
+    print(f"{label:<28} logins/s={results['ok'] / seconds:7.1f}  503s={results['busy']:5d}  "
+          f"failed={results['failed']:3d}  GET /api/projects p50={statistics.median(read_latencies or [0]):6.1f}ms "
+          f"p95={p95:6.1f}ms  reads={len(read_latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--method', default=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
+    parser.add_argument('--workers', type=int, default=app.config.get('PASSWORD_HASH_WORKERS', 2))
+    parser.add_argument('--max-pending', type=int, default=app.config.get('PASSWORD_HASH_MAX_PENDING', 8))
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com',
+                    password_hash=PasswordHasher(args.method, workers=0).hash('bench-password'))
+        db.session.add(user)
+        db.session.commit()
+
+    print(f"method={args.method}  login threads={args.login_threads}  {args.seconds}s per run")
+    run('inline (workers=0)', PasswordHasher(args.method, workers=0), args.seconds, args.login_threads)
+    run(f'pool (workers={args.workers}, pending={args.max_pending})',
+        PasswordHasher(args.method, workers=args.workers, max_pending=args.max_pending),
+        args.seconds, args.login_threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent SQLite read/write throughput with and without the PRAGMA profile.
+
+Reader threads page through published blogs while writer threads insert
+contact messages and bump blog view counters, each in its own short
+transaction, against a throwaway database file.
+Run with: python server/bench_sqlite.py [--seconds 5] [--readers 6] [--writers 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import OperationalError
+
+from server.extensions import db
+from server.models import Blog, Contact, User
+from server.utils.sqlite_pragmas import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+BLOGS = 2000
+
+
+def make_engine(path, pragmas):
+    # Same URL shape the app uses for its SQLite file
+    engine = create_engine(f'sqlite:///{path}?check_same_thread=false')
+    if pragmas:
+        apply_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{
+            'id': 1, 'username': 'admin', 'email': 'admin@example.com', 'password_hash': 'x', 'is_admin': True
+        }])
+        connection.execute(Blog.__table__.insert(), [{
+            'title': f'Post {i}', 'slug': f'post-{i}', 'content': 'lorem ipsum ' * 200, 'author_id': 1,
+            'published': i % 3 != 0, 'published_at': now, 'views': 0
+        } for i in range(BLOGS)])
+
+
+def run(label, pragmas, seconds, readers, writers):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(make_engine(path, None))
+    engine = make_engine(path, pragmas)
+
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def read_loop(offset):
+        page = offset
+        while not stop.is_set():
+            query = select(Blog.id, Blog.title, Blog.content).where(Blog.published == True) \
+                .order_by(Blog.published_at.desc()).limit(20).offset((page % 50) * 20)
+            try:
+                with engine.connect() as connection:
+                    connection.execute(query).fetchall()
+                bump('reads')
+            except OperationalError:
+                bump('locked')
+            page += 1
+
+    def write_loop(offset):
+        i = offset
+        while not stop.is_set():
+            try:
+                with engine.begin() as connection:
+                    connection.execute(Contact.__table__.insert().values(
+                        name='Bench', email='bench@example.com', message='hello', read=False,
+                        created_at=datetime.utcnow()
+                    ))
+                    connection.execute(update(Blog).where(Blog.id == i % BLOGS + 1).values(views=Blog.views + 1))
+                bump('writes')
+            except OperationalError:
+                bump('locked')
+            i += 1
+
+    threads = [threading.Thread(target=read_loop, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(n * 997,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    print(f"{label:<10} reads/s={counts['reads'] / seconds:9.1f}  writes/s={counts['writes'] / seconds:8.1f}  "
+          f"locked errors={counts['locked']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=6)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s per run")
+    run('defaults', None, args.seconds, args.readers, args.writers)
+    run('tuned', DEFAULT_SQLITE_PRAGMAS, args.seconds, args.readers, args.writers)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from datetime import timedelta
 from dotenv import load_dotenv
 import os
+from .utils.db_pool import pool_engine_options
 
 load_dotenv()
 
@@ -19,8 +20,50 @@ class Config:
     if SQLALCHEMY_DATABASE_URI.startswith('sqlite:///') and 'check_same_thread' not in SQLALCHEMY_DATABASE_URI:
         SQLALCHEMY_DATABASE_URI += '?check_same_thread=false'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True
+
+    # Connection pool per gunicorn worker. Each request thread holds at most one connection, plus
+    # the mail sender and write queue threads; overflow covers bursts. Keep
+    # WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the database's max_connections.
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 3))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', GUNICORN_THREADS + 2))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', GUNICORN_THREADS))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    # Replace connections before server/proxy idle timeouts can drop them, instead of pinging on every checkout
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'False').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = pool_engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+    )
+
+    # Optional read replica: read-only GET requests use it (see utils/db_routing.py)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    # After a write, the same client reads from the primary for this long
+    REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', 5))
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+    REPLICA_HEALTH_CHECK_SECONDS = int(os.getenv('REPLICA_HEALTH_CHECK_SECONDS', 5))
+    # How GET requests read: 'autocommit' (no BEGIN/COMMIT), 'read_only' (SET TRANSACTION READ ONLY) or 'off'.
+    # GET routes that write opt out with @read_write_transaction.
+    DB_GET_TRANSACTION_MODE = os.getenv('DB_GET_TRANSACTION_MODE', 'autocommit')
+    # Longest a single SQL statement of a request may run before it is cancelled with a 504 (0 = no limit).
+    # Routes can set their own with @query_deadline; DB_ROUTE_STATEMENT_TIMEOUTS overrides both,
+    # e.g. "blog.search_blogs=2000,projects.get_projects=1000". CLI commands and background threads are not limited.
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 10000))
+    DB_ROUTE_STATEMENT_TIMEOUTS = {
+        endpoint.strip(): int(ms)
+        for endpoint, ms in (item.split('=', 1) for item in os.getenv('DB_ROUTE_STATEMENT_TIMEOUTS', '').split(',') if '=' in item)
+    }
+
+    # PRAGMAs run on every new SQLite connection (see utils/sqlite_pragmas.py); ignored for other databases
+    SQLITE_PRAGMAS_ENABLED = os.getenv('SQLITE_PRAGMAS_ENABLED', 'True').lower() == 'true'
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 268435456)),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -65536)),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
     }
 
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
@@ -34,6 +77,24 @@ class Config:
     # Ensure upload folder exists
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+    # Storage backend for uploads: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible store)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # e.g. http://minio:9000
+    S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+    S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY')
+    S3_PUBLIC_URL = os.getenv('S3_PUBLIC_URL')  # Public base URL for objects, if the bucket is public
+    S3_PREFIX = os.getenv('S3_PREFIX', '')
+    PRESIGNED_URL_EXPIRES = int(os.getenv('PRESIGNED_URL_EXPIRES', 900))
+
+    # Batch image uploads (/api/images/upload/batch)
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', 50))
+    BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', 4))
+
+    # Longest edge (px) of the inline placeholder thumbnail stored with each image
+    IMAGE_PLACEHOLDER_SIZE = int(os.getenv('IMAGE_PLACEHOLDER_SIZE', 16))
+
     # Mail settings (loaded from .env)
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -46,4 +107,73 @@ class Config:
     MAIL_DEFAULT_SENDER = (
         os.getenv('MAIL_DEFAULT_NAME', 'My Website'),
         _mail_username or os.getenv('MAIL_DEFAULT_EMAIL', 'noreply@example.com')
-    )
\ No newline at end of file
+    )
+
+    # Outbound mail queue (mail_outbox table) drained by a background sender
+    MAIL_SENDER_ENABLED = os.getenv('MAIL_SENDER_ENABLED', 'True').lower() == 'true'
+    MAIL_SENDER_POLL_SECONDS = float(os.getenv('MAIL_SENDER_POLL_SECONDS', 5))
+    MAIL_SEND_BATCH_SIZE = int(os.getenv('MAIL_SEND_BATCH_SIZE', 50))
+    MAIL_SEND_LEASE_SECONDS = int(os.getenv('MAIL_SEND_LEASE_SECONDS', 120))
+    MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 8))
+    MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', 30))
+    MAIL_RETRY_MAX_SECONDS = int(os.getenv('MAIL_RETRY_MAX_SECONDS', 3600))
+
+    # Pooled SMTP sessions shared by all sends in a worker
+    MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
+    MAIL_POOL_MAX_IDLE_SECONDS = int(os.getenv('MAIL_POOL_MAX_IDLE_SECONDS', 60))
+    MAIL_POOL_HEALTHCHECK_SECONDS = int(os.getenv('MAIL_POOL_HEALTHCHECK_SECONDS', 15))
+    MAIL_POOL_MAX_MESSAGES = int(os.getenv('MAIL_POOL_MAX_MESSAGES', 100))
+    MAIL_TIMEOUT = float(os.getenv('MAIL_TIMEOUT', 10))
+
+    # Circuit breaker around SMTP, and the time budget for sends made inside a request
+    MAIL_BREAKER_FAILURE_THRESHOLD = int(os.getenv('MAIL_BREAKER_FAILURE_THRESHOLD', 5))
+    MAIL_BREAKER_RESET_SECONDS = int(os.getenv('MAIL_BREAKER_RESET_SECONDS', 30))
+    MAIL_SEND_BUDGET_SECONDS = float(os.getenv('MAIL_SEND_BUDGET_SECONDS', 3))
+
+    # Owner contact notifications: one digest email per window instead of one per contact.
+    # The first contact after CONTACT_DIGEST_QUIET_SECONDS without notifications is sent right away.
+    CONTACT_DIGEST_ENABLED = os.getenv('CONTACT_DIGEST_ENABLED', 'False').lower() == 'true'
+    CONTACT_DIGEST_WINDOW_SECONDS = int(os.getenv('CONTACT_DIGEST_WINDOW_SECONDS', 300))
+    CONTACT_DIGEST_QUIET_SECONDS = int(os.getenv('CONTACT_DIGEST_QUIET_SECONDS', 300))
+    CONTACT_DIGEST_MAX_ITEMS = int(os.getenv('CONTACT_DIGEST_MAX_ITEMS', 50))
+
+    # Idempotency-Key support on create endpoints: how long first responses are kept for replay
+    IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_KEY_TTL_SECONDS', 3600))
+
+    # Token-bucket rate limits per client IP ('<requests>/<second|minute|hour|day>').
+    # Buckets live in a local SQLite file so every gunicorn worker on the host shares them.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', f"sqlite:///{os.path.join(INSTANCE_DIR, 'ratelimit.db')}")
+    RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', 0))
+    RATE_LIMIT_CONTACT = os.getenv('RATE_LIMIT_CONTACT', '5/minute')
+    RATE_LIMIT_LOGIN = os.getenv('RATE_LIMIT_LOGIN', '10/minute')
+    RATE_LIMIT_REGISTER = os.getenv('RATE_LIMIT_REGISTER', '5/hour')
+
+    # Contacts older than this move to contacts_archive (flask archive-contacts)
+    CONTACT_RETENTION_DAYS = int(os.getenv('CONTACT_RETENTION_DAYS', 365))
+    CONTACT_ARCHIVE_BATCH_SIZE = int(os.getenv('CONTACT_ARCHIVE_BATCH_SIZE', 1000))
+
+    # Cross-request cache of the authenticated user (id, username, email, is_admin) per worker
+    USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 256))
+
+    # Verified JWT claims cached per worker until the token's exp
+    JWT_CLAIMS_CACHE_ENABLED = os.getenv('JWT_CLAIMS_CACHE_ENABLED', 'True').lower() == 'true'
+    JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', 1024))
+    JWT_CLAIMS_CACHE_MAX_TTL_SECONDS = int(os.getenv('JWT_CLAIMS_CACHE_MAX_TTL_SECONDS', 300))
+    # Logouts and password changes are stored in the database; other workers see them within this long
+    JWT_REVOCATION_CHECK_SECONDS = int(os.getenv('JWT_REVOCATION_CHECK_SECONDS', 5))
+
+    # Password hashing runs on a small bounded thread pool; when it is full, logins get 503 + Retry-After.
+    # Stored hashes made with another method/cost are upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Route SQLite writes (blog views, contact form, image uploads) through one writer thread per worker
+    # that group-commits them, so request threads never fight over the write lock
+    WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', 'False').lower() == 'true'
+    WRITE_QUEUE_MAX_BATCH = int(os.getenv('WRITE_QUEUE_MAX_BATCH', 50))
+    WRITE_QUEUE_MAX_WAIT_MS = int(os.getenv('WRITE_QUEUE_MAX_WAIT_MS', 5))
+    WRITE_QUEUE_TIMEOUT = int(os.getenv('WRITE_QUEUE_TIMEOUT', 10))
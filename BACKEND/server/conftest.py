@@ -0,0 +1,72 @@
+"""
+Shared setup for the server/test_*.py suites.
+Run with: python -m pytest server/
+
+Tests use an in-memory SQLite database and never send mail; each test that
+touches the database asks for `fresh_db` to start from empty tables.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ['MAIL_SENDER_ENABLED'] = 'False'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from server.app import app
+from server.extensions import db, jwt
+from server.models import User
+from server.utils.auth import user_cache
+
+# Rate limits are covered by test_rate_limit.py
+app.config['RATE_LIMIT_ENABLED'] = False
+
+
+def _reset_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    # Per-process caches would otherwise serve rows from the previous database
+    user_cache.invalidate()
+    jwt.claims_cache.clear()
+    jwt.revocations.clear()
+
+
+@pytest.fixture
+def fresh_db():
+    """Recreate every table, empty. Returns the reset function for tests that need to start over mid-way."""
+    _reset_database()
+    return _reset_database
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_id(fresh_db):
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', password_hash='x', is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+@pytest.fixture
+def admin_headers(admin_id):
+    return _auth_headers(admin_id)
+
+
+@pytest.fixture
+def auth_headers():
+    """Returns a function that makes bearer token headers for a user id."""
+    return _auth_headers
+
+
+def _auth_headers(user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
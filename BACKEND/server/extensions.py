@@ -1,11 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
+from .utils.jwt_cache import CachingJWTManager
+from .utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
-jwt = JWTManager()
+jwt = CachingJWTManager()
 cors = CORS()
 mail = Mail()
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""index image foreign keys
+
+Revision ID: 1a876a7ebca9
+Revises: f0e312134af0
+Create Date: 2026-10-19 10:03:17.584920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a876a7ebca9'
+down_revision = 'f0e312134af0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_images_blog_id'), ['blog_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_images_project_id'), ['project_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_images_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_images_user_id'))
+        batch_op.drop_index(batch_op.f('ix_images_project_id'))
+        batch_op.drop_index(batch_op.f('ix_images_blog_id'))
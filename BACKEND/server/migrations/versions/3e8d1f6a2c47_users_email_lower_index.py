@@ -0,0 +1,24 @@
+"""users email lower index
+
+Revision ID: 3e8d1f6a2c47
+Revises: 7b2f0c8e4a19
+Create Date: 2026-10-19 18:12:40.215307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8d1f6a2c47'
+down_revision = '7b2f0c8e4a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
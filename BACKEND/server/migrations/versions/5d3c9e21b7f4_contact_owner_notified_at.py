@@ -0,0 +1,31 @@
+"""contact owner notified at
+
+Revision ID: 5d3c9e21b7f4
+Revises: 892a5a31425a
+Create Date: 2026-10-19 14:02:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d3c9e21b7f4'
+down_revision = '892a5a31425a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('owner_notified_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_contacts_owner_notified_at'), ['owner_notified_at'], unique=False)
+
+    # Existing contacts were already emailed one by one; keep them out of the first digest
+    op.execute("UPDATE contacts SET owner_notified_at = created_at WHERE owner_notified_at IS NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contacts_owner_notified_at'))
+        batch_op.drop_column('owner_notified_at')
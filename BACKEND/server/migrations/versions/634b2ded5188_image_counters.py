@@ -0,0 +1,47 @@
+"""image counters
+
+Revision ID: 634b2ded5188
+Revises: 1a876a7ebca9
+Create Date: 2026-10-19 11:40:52.318047
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '634b2ded5188'
+down_revision = '1a876a7ebca9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_counters',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('scope_key', sa.String(length=50), nullable=False),
+    sa.Column('image_count', sa.Integer(), nullable=False),
+    sa.Column('total_bytes', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'scope_key')
+    )
+
+    # Backfill from the existing active images
+    op.execute(
+        "INSERT INTO image_counters (scope, scope_key, image_count, total_bytes) "
+        "SELECT 'all', '', COUNT(id), COALESCE(SUM(file_size), 0) FROM images WHERE is_active = true"
+    )
+    op.execute(
+        "INSERT INTO image_counters (scope, scope_key, image_count, total_bytes) "
+        "SELECT 'type', image_type, COUNT(id), COALESCE(SUM(file_size), 0) FROM images "
+        "WHERE is_active = true GROUP BY image_type"
+    )
+    for scope in ('user', 'project', 'blog'):
+        op.execute(
+            "INSERT INTO image_counters (scope, scope_key, image_count, total_bytes) "
+            f"SELECT '{scope}', CAST({scope}_id AS VARCHAR(50)), COUNT(id), COALESCE(SUM(file_size), 0) "
+            f"FROM images WHERE is_active = true AND {scope}_id IS NOT NULL GROUP BY {scope}_id"
+        )
+
+
+def downgrade():
+    op.drop_table('image_counters')
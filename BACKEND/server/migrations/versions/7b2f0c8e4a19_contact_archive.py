@@ -0,0 +1,49 @@
+"""contact archive
+
+Revision ID: 7b2f0c8e4a19
+Revises: c41e7a9d2b56
+Create Date: 2026-10-19 16:25:03.771942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2f0c8e4a19'
+down_revision = 'c41e7a9d2b56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contacts_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('subject', sa.String(length=200), nullable=True),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('read', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('contacts_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contacts_archive_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contacts_archive_email'), ['email'], unique=False)
+
+    op.create_table('contact_monthly_rollups',
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('read_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('month')
+    )
+
+
+def downgrade():
+    op.drop_table('contact_monthly_rollups')
+    with op.batch_alter_table('contacts_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contacts_archive_email'))
+        batch_op.drop_index(batch_op.f('ix_contacts_archive_created_at'))
+
+    op.drop_table('contacts_archive')
@@ -0,0 +1,64 @@
+"""hot path indexes
+
+Revision ID: 9a4c7e2d5b13
+Revises: 3e8d1f6a2c47
+Create Date: 2026-10-19 18:47:21.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e2d5b13'
+down_revision = '3e8d1f6a2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blogs', schema=None) as batch_op:
+        batch_op.create_index('ix_blogs_published_published_at', ['published', 'published_at'], unique=False)
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_projects_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_projects_featured_created_at', ['featured', 'created_at'], unique=False)
+        batch_op.create_index('ix_projects_status_created_at', ['status', 'created_at'], unique=False)
+
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contacts_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_contacts_read_created_at', ['read', 'created_at'], unique=False)
+
+    with op.batch_alter_table('experiences', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_experiences_start_date'), ['start_date'], unique=False)
+
+    with op.batch_alter_table('education', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_education_start_date'), ['start_date'], unique=False)
+
+    op.create_index(
+        'ix_images_image_type_active', 'images', ['image_type'], unique=False,
+        postgresql_where=sa.text('is_active'),
+        sqlite_where=sa.text('is_active = 1')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_images_image_type_active', table_name='images')
+
+    with op.batch_alter_table('education', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_education_start_date'))
+
+    with op.batch_alter_table('experiences', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_experiences_start_date'))
+
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.drop_index('ix_contacts_read_created_at')
+        batch_op.drop_index(batch_op.f('ix_contacts_created_at'))
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_index('ix_projects_status_created_at')
+        batch_op.drop_index('ix_projects_featured_created_at')
+        batch_op.drop_index(batch_op.f('ix_projects_created_at'))
+
+    with op.batch_alter_table('blogs', schema=None) as batch_op:
+        batch_op.drop_index('ix_blogs_published_published_at')
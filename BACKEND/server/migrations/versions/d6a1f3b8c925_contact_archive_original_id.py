@@ -0,0 +1,34 @@
+"""contact archive original id
+
+Revision ID: d6a1f3b8c925
+Revises: 9a4c7e2d5b13
+Create Date: 2026-10-19 21:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1f3b8c925'
+down_revision = '9a4c7e2d5b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows archived so far keep their id, which was their contacts id until now
+    with op.batch_alter_table('contacts_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('original_id', sa.Integer(), nullable=True))
+
+    op.execute('UPDATE contacts_archive SET original_id = id')
+
+    with op.batch_alter_table('contacts_archive', schema=None) as batch_op:
+        batch_op.alter_column('original_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_contacts_archive_original_id'), ['original_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contacts_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contacts_archive_original_id'))
+        batch_op.drop_column('original_id')
@@ -0,0 +1,30 @@
+"""image dimensions and placeholder
+
+Revision ID: f0e312134af0
+Revises: 97fc53f47b68
+Create Date: 2026-10-19 09:12:41.226310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0e312134af0'
+down_revision = '97fc53f47b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('placeholder')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
@@ -43,6 +43,13 @@ class User(db.Model):
     cv_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Tokens issued before this (UTC, whole seconds) are rejected; set when the password changes
+    tokens_valid_after = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Login matches on lower(email); this lets it seek instead of scanning users
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -76,9 +83,15 @@ class Project(db.Model):
     status = db.Column(db.Enum(ProjectStatus, name='project_status'), default=ProjectStatus.COMPLETED, nullable=False)
     featured = db.Column(db.Boolean, default=False)
     technologies = db.Column(db.Text)  # JSON string of technology IDs
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Project lists filter by featured or status and always sort newest first
+    __table_args__ = (
+        db.Index('ix_projects_featured_created_at', 'featured', 'created_at'),
+        db.Index('ix_projects_status_created_at', 'status', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Project {self.title}>'
 
@@ -90,7 +103,7 @@ class Experience(db.Model):
     company = db.Column(db.String(200), nullable=False)
     position = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    start_date = db.Column(db.Date, nullable=False)
+    start_date = db.Column(db.Date, nullable=False, index=True)
     end_date = db.Column(db.Date)
     current = db.Column(db.Boolean, default=False)
     location = db.Column(db.String(100))
@@ -110,7 +123,7 @@ class Education(db.Model):
     degree = db.Column(db.String(200), nullable=False)
     field_of_study = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    start_date = db.Column(db.Date, nullable=False)
+    start_date = db.Column(db.Date, nullable=False, index=True)
     end_date = db.Column(db.Date)
     current = db.Column(db.Boolean, default=False)
     gpa = db.Column(db.Float)
@@ -132,12 +145,50 @@ class Contact(db.Model):
     subject = db.Column(db.String(200))
     message = db.Column(db.Text, nullable=False)
     read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Set once the owner has been told about this contact (directly or in a digest)
+    owner_notified_at = db.Column(db.DateTime, index=True)
+
+    # The admin inbox filters by read and sorts newest first
+    __table_args__ = (
+        db.Index('ix_contacts_read_created_at', 'read', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Contact from {self.name}>'
 
 
+class ContactArchive(db.Model):
+    """Contact messages moved out of the hot contacts table after the retention window"""
+    __tablename__ = 'contacts_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Id the message had in contacts; not unique, since SQLite hands out ids again once the hot table empties
+    original_id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False, index=True)
+    subject = db.Column(db.String(200))
+    message = db.Column(db.Text, nullable=False)
+    read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ContactArchive from {self.name}>'
+
+
+class ContactMonthlyRollup(db.Model):
+    """Per-month counts of archived contacts, so statistics still cover archived months"""
+    __tablename__ = 'contact_monthly_rollups'
+
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    total = db.Column(db.Integer, default=0, nullable=False)
+    read_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<ContactMonthlyRollup {self.month}>'
+
+
 class Blog(db.Model):
     __tablename__ = 'blogs'
 
@@ -157,6 +208,11 @@ class Blog(db.Model):
 
     author = db.relationship('User', backref='blogs')
 
+    # Public listings: published posts, newest first
+    __table_args__ = (
+        db.Index('ix_blogs_published_published_at', 'published', 'published_at'),
+    )
+
     def __repr__(self):
         return f'<Blog {self.title}>'
 
@@ -172,10 +228,13 @@ class Image(db.Model):
     file_url = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
     mime_type = db.Column(db.String(100), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.Text)  # Tiny inline thumbnail (data URI) shown while loading
     image_type = db.Column(db.String(50), nullable=False)  # 'hero', 'about', 'avatar', 'project', 'blog', etc.
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True)
-    blog_id = db.Column(db.Integer, db.ForeignKey('blogs.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True, index=True)
+    blog_id = db.Column(db.Integer, db.ForeignKey('blogs.id'), nullable=True, index=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -185,5 +244,85 @@ class Image(db.Model):
     project = db.relationship('Project', backref='images')
     blog = db.relationship('Blog', backref='images')
 
+    # Gallery lookups by type only ever want active images
+    __table_args__ = (
+        db.Index(
+            'ix_images_image_type_active', 'image_type',
+            postgresql_where=db.text('is_active'),
+            sqlite_where=db.text('is_active = 1')
+        ),
+    )
+
+    def __repr__(self):
+        return f'<Image {self.filename}>'
+
+
+class ImageCounter(db.Model):
+    """Denormalized active-image counts and byte totals, kept in step with the images table"""
+    __tablename__ = 'image_counters'
+
+    scope = db.Column(db.String(20), primary_key=True)  # 'all', 'type', 'user', 'project', 'blog'
+    scope_key = db.Column(db.String(50), primary_key=True, default='')
+    image_count = db.Column(db.Integer, default=0, nullable=False)
+    total_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<ImageCounter {self.scope}:{self.scope_key}>'
+
+
+class OutboundEmail(db.Model):
+    """Queued outbound email, delivered by the background mail sender"""
+    __tablename__ = 'mail_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    body = db.Column(db.Text, nullable=False)
+    reply_to = db.Column(db.String(120))
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboundEmail {self.id} {self.status}>'
+
+
+class RevokedToken(db.Model):
+    """A logged-out JWT, rejected by every worker until it would have expired anyway"""
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, index=True)  # None: the token never expires
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
+
+class IdempotencyKey(db.Model):
+    """First response to a request sent with an Idempotency-Key header, replayed on retries"""
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    scope = db.Column(db.String(120), nullable=False)  # 'user:<id>' or 'ip:<address>'
+    endpoint = db.Column(db.String(120), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), default='in_progress', nullable=False)  # 'in_progress', 'completed'
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('key', 'scope', name='uq_idempotency_keys_key_scope'),
+    )
+
     def __repr__(self):
-        return f'<Image {self.filename}>'
\ No newline at end of file
+        return f'<IdempotencyKey {self.key} {self.status}>'
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
 from ..extensions import db
-from ..models import Blog, User
+from ..models import Blog, Image
+from ..utils.images import image_to_dict
+from ..utils.idempotency import idempotent
+from ..utils.auth import get_current_user
+from ..utils.write_queue import submit_write
+from ..utils.db_routing import read_write_transaction
+from ..utils.query_deadline import query_deadline
+from sqlalchemy.orm import selectinload
 import json
 import re
 from datetime import datetime
@@ -9,13 +16,6 @@ from datetime import datetime
 blog_bp = Blueprint('blog', __name__)
 
 
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 def generate_slug(title):
     """Generate a URL-friendly slug from title"""
     slug = re.sub(r'[^\w\s-]', '', title.lower())
@@ -30,9 +30,14 @@ def get_blogs():
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 10, type=int), 50)
     tag = request.args.get('tag')
+    embed_images = 'images' in request.args.get('embed', '').split(',')
     
     query = Blog.query
     
+    # ?embed=images loads the page's images in one extra query
+    if embed_images:
+        query = query.options(selectinload(Blog.images))
+    
     # Filter by published status
     if published.lower() == 'true':
         query = query.filter_by(published=True)
@@ -74,6 +79,8 @@ def get_blogs():
             "views": blog.views,
             "created_at": blog.created_at.isoformat() if blog.created_at else None
         }
+        if embed_images:
+            blog_data["images"] = [image_to_dict(img) for img in blog.images if img.is_active]
         blogs_data.append(blog_data)
     
     return jsonify({
@@ -89,17 +96,21 @@ def get_blogs():
     }), 200
 
 
+def _count_blog_view(blog_id):
+    Blog.query.filter_by(id=blog_id).update({Blog.views: Blog.views + 1}, synchronize_session=False)
+
+
 @blog_bp.route('/blog/<slug>', methods=['GET'])
+@read_write_transaction
 def get_blog_by_slug(slug):
     """Get a specific blog by slug"""
     blog = Blog.query.filter_by(slug=slug, published=True).first_or_404()
     
-    # Increment view count
-    blog.views += 1
-    try:
-        db.session.commit()
-    except:
-        db.session.rollback()
+    # Increment view count in SQL so concurrent views aren't lost; the response doesn't wait for it
+    views = (blog.views or 0) + 1
+    counted = submit_write(_count_blog_view, blog.id)
+    if counted.done() and counted.exception():
+        current_app.logger.warning(f"Could not count view for blog {blog.id}: {str(counted.exception())}")
     
     blog_data = {
         "id": blog.id,
@@ -117,7 +128,8 @@ def get_blog_by_slug(slug):
         "published": blog.published,
         "published_at": blog.published_at.isoformat() if blog.published_at else None,
         "tags": json.loads(blog.tags) if blog.tags else [],
-        "views": blog.views,
+        "views": views,
+        "images": [image_to_dict(img) for img in Image.query.filter_by(blog_id=blog.id, is_active=True).order_by(Image.id)],
         "created_at": blog.created_at.isoformat() if blog.created_at else None,
         "updated_at": blog.updated_at.isoformat() if blog.updated_at else None
     }
@@ -127,6 +139,7 @@ def get_blog_by_slug(slug):
 
 @blog_bp.route('/blog', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_blog():
     """Create a new blog post (admin only)"""
     user = get_current_user()
@@ -271,6 +284,7 @@ def get_blog_tags():
 
 
 @blog_bp.route('/blog/search', methods=['GET'])
+@query_deadline(3000)
 def search_blogs():
     """Search blogs by title, content, or tags"""
     query = request.args.get('q', '').strip()
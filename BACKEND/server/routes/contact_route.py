@@ -1,27 +1,106 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..extensions import db, mail
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+from ..extensions import db
 from flask_mail import Message
-from ..models import Contact, User
+from ..models import Contact, ContactArchive, ContactMonthlyRollup, OutboundEmail
+from ..utils.mailer import queue_email, get_owner_email, wake_mail_sender
+from ..utils.contact_digest import notify_owner
+from ..utils.circuit_breaker import CircuitOpenError
+from ..utils.smtp_pool import get_smtp_pool
+from ..utils.idempotency import idempotent
+from ..utils.rate_limit import rate_limit
+from ..utils.contact_archive import month_key
+from ..utils.auth import get_current_user
+from ..utils.write_queue import WriteQueueTimeout, run_write
+from datetime import datetime, timedelta
+import csv
+import io
+import json
 import re
+import smtplib
 
 contact_bp = Blueprint('contact', __name__)
 
 
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 def validate_email(email):
     """Simple email validation"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
 
+def parse_datetime_arg(value):
+    """Parse an ISO date or datetime query parameter (e.g. 2024-01-31 or 2024-01-31T12:00:00)"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+
+def contact_filters(args, model=Contact):
+    """
+    Build filter conditions from query parameters shared by the admin contact endpoints:
+    read=true|false, since/until (ISO dates, on created_at), older_than_days, email,
+    q (text search). `model` is Contact or ContactArchive, which share these columns.
+    Raises ValueError for malformed values.
+    """
+    conditions = []
+    read = args.get('read')
+    if read is not None:
+        conditions.append(model.read == (str(read).lower() == 'true'))
+    if args.get('since'):
+        conditions.append(model.created_at >= parse_datetime_arg(args['since']))
+    if args.get('until'):
+        conditions.append(model.created_at < parse_datetime_arg(args['until']))
+    if args.get('older_than_days') is not None:
+        try:
+            days = float(args['older_than_days'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid older_than_days: {args['older_than_days']}")
+        conditions.append(model.created_at < datetime.utcnow() - timedelta(days=days))
+    if args.get('email'):
+        conditions.append(db.func.lower(model.email) == args['email'].strip().lower())
+    if args.get('q'):
+        pattern = f"%{args['q'].strip()}%"
+        conditions.append(db.or_(
+            model.name.ilike(pattern),
+            model.email.ilike(pattern),
+            model.subject.ilike(pattern),
+            model.message.ilike(pattern)
+        ))
+    return conditions
+
+
+def _save_contact(name, email, subject, message):
+    """Store a contact message and queue its emails in the same transaction; returns the contact id."""
+    contact = Contact(
+        name=name,
+        email=email,
+        subject=subject,
+        message=message
+    )
+    db.session.add(contact)
+
+    # Queue the owner notification (or hold it for the next digest) and the
+    # visitor acknowledgement; the background mail sender delivers them, so
+    # the request never waits on SMTP
+    notify_owner(contact)
+
+    ack_subject = "Thanks for contacting me"
+    ack_body = (
+        f"Hi {name},\n\n"
+        f"Thanks for reaching out! I have received your message and will get back to you shortly.\n\n"
+        f"Your message:\n{message}\n\n"
+        f"Regards,\nPortfolio"
+    )
+    queue_email(ack_subject, [email], ack_body)
+
+    db.session.flush()
+    return contact.id
+
+
 @contact_bp.route('/contact', methods=['POST'])
+@rate_limit('contact')
+@idempotent
 def submit_contact():
     """Submit a contact form message"""
     data = request.get_json()
@@ -47,66 +126,17 @@ def submit_contact():
     if len(message) < 10 or len(message) > 2000:
         return jsonify({"error": "Message must be between 10 and 2000 characters"}), 400
     
-    # Create contact entry
-    contact = Contact(
-        name=name,
-        email=email,
-        subject=subject,
-        message=message
-    )
-    
     try:
-        db.session.add(contact)
-        db.session.commit()
+        run_write(_save_contact, name, email, subject, message)
+        wake_mail_sender()
 
-        # Send notification email to site owner
-        notify_errors = None
-        try:
-            subject_line = f"New contact: {subject or 'No subject'} from {name}"
-            body = (
-                f"You have received a new contact message from your portfolio site.\n\n"
-                f"Name: {name}\n"
-                f"Email: {email}\n"
-                f"Subject: {subject or 'N/A'}\n\n"
-                f"Message:\n{message}\n\n"
-                f"Submitted via API /contact"
-            )
-
-            owner_email = mail.app.config.get('MAIL_USERNAME') or mail.app.config.get('MAIL_DEFAULT_SENDER')
-            if isinstance(owner_email, (list, tuple)):
-                owner_email = owner_email[-1]
-
-            msg_owner = Message(subject=subject_line, recipients=[owner_email])
-            msg_owner.body = body
-            mail.send(msg_owner)
-        except Exception as mail_err:
-            notify_errors = str(mail_err)
-
-        # Send acknowledgement to user
-        ack_errors = None
-        try:
-            ack_subject = "Thanks for contacting me"
-            ack_body = (
-                f"Hi {name},\n\n"
-                f"Thanks for reaching out! I have received your message and will get back to you shortly.\n\n"
-                f"Your message:\n{message}\n\n"
-                f"Regards,\nPortfolio"
-            )
-            msg_user = Message(subject=ack_subject, recipients=[email])
-            msg_user.body = ack_body
-            mail.send(msg_user)
-        except Exception as ack_err:
-            ack_errors = str(ack_err)
-
-        resp = {"message": "Message sent successfully"}
-        if notify_errors:
-            resp["mail_notification_error"] = notify_errors
-        if ack_errors:
-            resp["mail_ack_error"] = ack_errors
-        return jsonify(resp), 201
+        return jsonify({"message": "Message sent successfully"}), 201
+    except WriteQueueTimeout:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": "An error occurred while sending the message", "details": str(e)}), 500
+        current_app.logger.error(f"Error saving contact message: {str(e)}")
+        return jsonify({"error": "An error occurred while sending the message"}), 500
 
 
 @contact_bp.route('/contact', methods=['GET'])
@@ -161,6 +191,80 @@ def get_contacts():
     }), 200
 
 
+# Columns written by the contact export, in order
+EXPORT_COLUMNS = ('id', 'name', 'email', 'subject', 'message', 'read', 'created_at')
+EXPORT_BATCH_SIZE = 1000
+
+
+def _csv_safe(value):
+    """Stop spreadsheet apps from evaluating visitor-supplied text as a formula"""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+@contact_bp.route('/contact/export', methods=['GET'])
+@jwt_required()
+def export_contacts():
+    """Stream every matching contact message as NDJSON or CSV (admin only)"""
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    try:
+        conditions = contact_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Plain column rows streamed from a server-side cursor, EXPORT_BATCH_SIZE at a time,
+    # so memory stays flat no matter how many contacts there are
+    query = db.session.query(*[getattr(Contact, column) for column in EXPORT_COLUMNS]) \
+        .filter(*conditions) \
+        .order_by(Contact.id) \
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    def generate_ndjson():
+        lines = []
+        for row in query:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['created_at'] = record['created_at'].isoformat() if record['created_at'] else None
+            lines.append(json.dumps(record))
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(query, 1):
+            writer.writerow([
+                _csv_safe(value.isoformat() if isinstance(value, datetime) else value) for value in row
+            ])
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+
+    filename = f"contacts-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @contact_bp.route('/contact/<int:contact_id>', methods=['GET'])
 @jwt_required()
 def get_contact(contact_id):
@@ -222,6 +326,69 @@ def delete_contact(contact_id):
         return jsonify({"error": "An error occurred while deleting the message", "details": str(e)}), 500
 
 
+MAX_BULK_IDS = 1000
+BULK_ACTIONS = ('mark_read', 'mark_unread', 'delete')
+
+
+@contact_bp.route('/contact/bulk', methods=['POST'])
+@jwt_required()
+def bulk_contacts():
+    """
+    Mark read/unread or delete many contact messages in one statement (admin only).
+
+    Body: {"action": "mark_read" | "mark_unread" | "delete"} plus either
+    {"ids": [1, 2, 3]} or {"filter": {"read": false, "older_than_days": 30}}
+    (same filters as the export).
+    """
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    data = request.get_json() or {}
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({"error": f"action must be one of: {', '.join(BULK_ACTIONS)}"}), 400
+
+    ids = data.get('ids')
+    filters = data.get('filter')
+    if (ids is None) == (filters is None):
+        return jsonify({"error": "Provide either ids or filter"}), 400
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+            return jsonify({"error": "ids must be a non-empty list of integers"}), 400
+        if len(ids) > MAX_BULK_IDS:
+            return jsonify({"error": f"At most {MAX_BULK_IDS} ids per request"}), 400
+        conditions = [Contact.id.in_(ids)]
+    else:
+        if not isinstance(filters, dict):
+            return jsonify({"error": "filter must be an object"}), 400
+        try:
+            conditions = contact_filters(filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Refuse to touch the whole table by accident
+        if not conditions:
+            return jsonify({"error": "filter must contain at least one condition"}), 400
+
+    try:
+        if action == 'delete':
+            statement = db.delete(Contact).where(*conditions)
+        else:
+            statement = db.update(Contact).where(*conditions).values(read=(action == 'mark_read'))
+        affected = db.session.execute(
+            statement.execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error running bulk contact action {action}: {str(e)}")
+        return jsonify({"error": "An error occurred while updating contacts"}), 500
+
+    key = 'deleted' if action == 'delete' else 'updated'
+    return jsonify({"message": f"{affected} contact messages {key}", key: affected}), 200
+
+
 @contact_bp.route('/contact/<int:contact_id>/reply', methods=['POST'])
 @jwt_required()
 def reply_contact(contact_id):
@@ -243,26 +410,109 @@ def reply_contact(contact_id):
         base = contact.subject or 'your message'
         reply_subject = f"Re: {base}"
 
-    try:
-        # Determine sender and reply-to
-        default_sender = mail.app.config.get('MAIL_DEFAULT_SENDER')
-        owner_email = mail.app.config.get('MAIL_USERNAME') or (default_sender[-1] if isinstance(default_sender, (list, tuple)) else default_sender)
+    # Determine sender and reply-to
+    owner_email = get_owner_email()
 
-        msg = Message(subject=reply_subject, recipients=[contact.email])
-        msg.body = reply_message
-        if owner_email:
-            msg.reply_to = owner_email
+    msg = Message(subject=reply_subject, recipients=[contact.email])
+    msg.body = reply_message
+    if owner_email:
+        msg.reply_to = owner_email
 
-        mail.send(msg)
+    try:
+        # Try to send right away, but never wait longer than the request budget
+        get_smtp_pool().send(msg, timeout=current_app.config.get('MAIL_SEND_BUDGET_SECONDS', 3))
+        queued = False
+    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+        current_app.logger.warning(f"Reply to contact {contact.id} refused by mail server: {str(e)}")
+        return jsonify({"error": "The mail server refused the reply"}), 502
+    except (CircuitOpenError, smtplib.SMTPException, OSError) as e:
+        # Mail server slow or down: hand the reply to the outbox instead of failing
+        current_app.logger.warning(f"Reply to contact {contact.id} deferred to the outbox: {str(e)}")
+        queued = True
+    except Exception as e:
+        current_app.logger.error(f"Error sending reply to contact {contact.id}: {str(e)}")
+        return jsonify({"error": "Failed to send reply"}), 500
 
+    try:
+        if queued:
+            queue_email(reply_subject, [contact.email], reply_message, reply_to=owner_email)
         # Optionally mark as read after replying
         contact.read = True
         db.session.commit()
-
-        return jsonify({"message": "Reply sent successfully"}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": "Failed to send reply", "details": str(e)}), 500
+        current_app.logger.error(f"Error saving reply to contact {contact.id}: {str(e)}")
+        return jsonify({"error": "Failed to send reply"}), 500
+
+    if queued:
+        return jsonify({"message": "Mail server unavailable, reply queued for delivery", "queued": True}), 202
+    return jsonify({"message": "Reply sent successfully"}), 200
+
+
+@contact_bp.route('/contact/archive', methods=['GET'])
+@jwt_required()
+def search_contact_archive():
+    """Search archived contact messages (admin only); same filters as the export"""
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    try:
+        conditions = contact_filters(request.args, model=ContactArchive)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    pagination = ContactArchive.query.filter(*conditions) \
+        .order_by(ContactArchive.created_at.desc()) \
+        .paginate(page=page, per_page=per_page, error_out=False)
+
+    contacts_data = []
+    for contact in pagination.items:
+        contacts_data.append({
+            "id": contact.id,
+            "original_id": contact.original_id,
+            "name": contact.name,
+            "email": contact.email,
+            "subject": contact.subject,
+            "message": contact.message,
+            "read": contact.read,
+            "created_at": contact.created_at.isoformat() if contact.created_at else None,
+            "archived_at": contact.archived_at.isoformat() if contact.archived_at else None
+        })
+
+    return jsonify({
+        "contacts": contacts_data,
+        "pagination": {
+            "page": page,
+            "per_page": per_page,
+            "total": pagination.total,
+            "pages": pagination.pages,
+            "has_next": pagination.has_next,
+            "has_prev": pagination.has_prev
+        }
+    }), 200
+
+
+@contact_bp.route('/contact/mail/status', methods=['GET'])
+@jwt_required()
+def get_mail_status():
+    """SMTP circuit breaker, connection pool and outbox metrics (admin only)"""
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    pool = get_smtp_pool()
+    outbox = dict(
+        db.session.query(OutboundEmail.status, db.func.count(OutboundEmail.id))
+        .group_by(OutboundEmail.status).all()
+    )
+    return jsonify({
+        "breaker": pool.breaker.snapshot(),
+        "pool": pool.stats,
+        "outbox": outbox
+    }), 200
 
 
 @contact_bp.route('/contact/stats', methods=['GET'])
@@ -274,35 +524,45 @@ def get_contact_stats():
         return jsonify({"error": "Admin access required"}), 403
     
     try:
-        total_messages = Contact.query.count()
-        unread_messages = Contact.query.filter_by(read=False).count()
-        read_messages = Contact.query.filter_by(read=True).count()
-        
-        # Get messages count by month for the last 6 months
-        from datetime import datetime, timedelta
-        from sqlalchemy import func
-        
-        six_months_ago = datetime.utcnow() - timedelta(days=180)
-        monthly_stats = db.session.query(
-            func.date_trunc('month', Contact.created_at).label('month'),
-            func.count(Contact.id).label('count')
-        ).filter(Contact.created_at >= six_months_ago).group_by(
-            func.date_trunc('month', Contact.created_at)
-        ).order_by(func.date_trunc('month', Contact.created_at)).all()
-        
+        # Archived messages only survive as monthly rollups, so add those back in
+        archived_total, archived_read = db.session.query(
+            db.func.coalesce(db.func.sum(ContactMonthlyRollup.total), 0),
+            db.func.coalesce(db.func.sum(ContactMonthlyRollup.read_count), 0)
+        ).one()
+        hot_total = Contact.query.count()
+        hot_read = Contact.query.filter_by(read=True).count()
+
+        total_messages = hot_total + archived_total
+        read_messages = hot_read + archived_read
+        unread_messages = total_messages - read_messages
+
+        # Get messages count by month for the last 6 months (whole months, to line up with the rollups)
+        six_months_ago = (datetime.utcnow() - timedelta(days=180)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month = month_key(Contact.created_at)
+        monthly_counts = dict(
+            db.session.query(month, db.func.count(Contact.id))
+            .filter(Contact.created_at >= six_months_ago)
+            .group_by(month).all()
+        )
+        for rollup in ContactMonthlyRollup.query.filter(
+            ContactMonthlyRollup.month >= six_months_ago.strftime('%Y-%m')
+        ):
+            monthly_counts[rollup.month] = monthly_counts.get(rollup.month, 0) + rollup.total
+
         monthly_data = []
-        for month, count in monthly_stats:
+        for month_label in sorted(monthly_counts):
             monthly_data.append({
-                "month": month.strftime('%Y-%m') if month else None,
-                "count": count
+                "month": month_label,
+                "count": monthly_counts[month_label]
             })
-        
+
         return jsonify({
             "total_messages": total_messages,
             "unread_messages": unread_messages,
             "read_messages": read_messages,
+            "archived_messages": archived_total,
             "monthly_stats": monthly_data
         }), 200
-        
+
     except Exception as e:
         return jsonify({"error": "An error occurred while getting statistics", "details": str(e)}), 500
@@ -1,19 +1,13 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from ..extensions import db
-from ..models import Experience, User
+from ..models import Experience
+from ..utils.auth import get_current_user
 from datetime import datetime
 
 experience_bp = Blueprint('experience', __name__)
 
 
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 @experience_bp.route('/experience', methods=['GET'])
 def get_experience():
     """Get all experience entries"""
@@ -1,19 +1,76 @@
-from flask import Blueprint, request, jsonify, url_for, current_app
-from ..models import Image, User, Project, Blog
+from flask import Blueprint, request, jsonify, current_app
+from ..models import Image, Project, Blog, ImageCounter
 from ..utils.images import (
     save_portfolio_image, 
     delete_image_file, 
     allowed_file, 
     get_file_size, 
-    get_mime_type
+    get_mime_type,
+    generate_unique_filename,
+    inspect_image,
+    image_format_allowed,
+    image_to_dict,
+    IMAGE_HEADER_BYTES
 )
+from ..utils.storage import get_storage
+from ..utils.image_counters import get_image_count, get_image_totals
+from ..utils.auth import get_current_user
+from ..utils.write_queue import WriteQueueTimeout, run_write
 from ..extensions import db
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from concurrent.futures import ThreadPoolExecutor
+import io
 import os
 
 # Blueprint Configuration
 images_bp = Blueprint('images', __name__)
 MAX_IMAGES_PER_ENTITY = 20
+MAX_ENTITY_IDS_PER_LOOKUP = 100
+VALID_IMAGE_TYPES = ['hero', 'about', 'avatar', 'project', 'blog', 'general', 'skill', 'experience', 'education']
+
+
+def _parse_id_list(value):
+    """Parse a comma-separated id list such as '1,2,3' into unique ints."""
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(part)
+        if int(part) not in ids:
+            ids.append(int(part))
+    return ids
+
+
+def _store_batch_file(app, storage, file, filename):
+    """Inspect one file of a batch upload and stream it to storage (runs in a worker thread)."""
+    with app.app_context():
+        try:
+            metadata = inspect_image(file.stream)
+            if not metadata or not image_format_allowed(metadata['format']):
+                return {'filename': filename, 'invalid': True}
+            file_size = storage.put(filename, file.stream, metadata['mime_type'])
+            return dict(metadata, filename=filename, file_size=file_size)
+        except Exception as e:
+            return {'filename': filename, 'error': str(e)}
+
+
+def _insert_images(rows):
+    """Insert image rows (dicts of column values) in one transaction; returns their ids."""
+    images = [Image(**row) for row in rows]
+    db.session.add_all(images)
+    db.session.flush()
+    return [image.id for image in images]
+
+
+def _discard_presigned_upload(storage, filename):
+    """Delete a directly uploaded object that could not be recorded; logs if that fails too."""
+    try:
+        storage.delete(filename)
+    except Exception as e:
+        current_app.logger.error(f"Failed to delete unrecorded upload {filename}, remove it by hand: {str(e)}")
+
 
 @images_bp.route('/upload', methods=['POST'])
 @jwt_required()
@@ -21,8 +78,7 @@ def upload_image():
     """Upload a new image for portfolio use."""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
 
@@ -44,61 +100,328 @@ def upload_image():
         blog_id = request.form.get('blog_id', type=int)
 
         # Validate image type
-        valid_types = ['hero', 'about', 'avatar', 'project', 'blog', 'general', 'skill', 'experience', 'education']
-        if image_type not in valid_types:
-            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(valid_types)}'}), 400
+        if image_type not in VALID_IMAGE_TYPES:
+            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
 
         # Check image limits for specific entities
         if entity_id and image_type in ['project', 'blog']:
-            current_count = Image.query.filter_by(
-                **{f'{image_type}_id': entity_id, 'is_active': True}
-            ).count()
+            current_count = get_image_count(image_type, entity_id)
             if current_count >= MAX_IMAGES_PER_ENTITY:
                 return jsonify({'error': f'Maximum {MAX_IMAGES_PER_ENTITY} images per {image_type} reached'}), 400
 
+        # Check the real format from the file's bytes, not its extension
+        metadata = inspect_image(file.stream)
+        if not metadata or not image_format_allowed(metadata['format']):
+            return jsonify({'error': 'File content is not a supported image'}), 400
+
         # Save the image file
-        image_path = save_portfolio_image(file, image_type, entity_id, current_user_id)
+        image_path = save_portfolio_image(file, image_type, entity_id, user.id, metadata['mime_type'])
         if not image_path:
             return jsonify({'error': 'Image upload failed'}), 500
 
         # Get file metadata
-        full_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], os.path.basename(image_path))
-        file_size = get_file_size(full_file_path)
-        mime_type = get_mime_type(file.filename)
+        filename = os.path.basename(image_path)
+        file_size = get_file_size(image_path)
+        mime_type = metadata['mime_type']
 
         # Create image record
-        new_image = Image(
-            filename=os.path.basename(image_path),
+        new_image = dict(
+            filename=filename,
             original_filename=file.filename,
             file_path=image_path,
-            file_url=url_for('static', filename=image_path, _external=True),
+            file_url=get_storage().url(filename, external=True),
             file_size=file_size,
             mime_type=mime_type,
+            width=metadata['width'],
+            height=metadata['height'],
+            placeholder=metadata['placeholder'],
             image_type=image_type,
-            user_id=current_user_id,
+            user_id=user.id,
             project_id=project_id if image_type == 'project' else None,
             blog_id=blog_id if image_type == 'blog' else None
         )
-
-        db.session.add(new_image)
-        db.session.commit()
+        [image_id] = run_write(_insert_images, [new_image])
 
         return jsonify({
             'message': 'Image uploaded successfully',
-            'image_id': new_image.id,
-            'filename': new_image.filename,
-            'file_url': new_image.file_url,
-            'image_type': new_image.image_type,
-            'file_size': new_image.file_size,
-            'mime_type': new_image.mime_type
+            'image_id': image_id,
+            'filename': new_image['filename'],
+            'file_url': new_image['file_url'],
+            'image_type': new_image['image_type'],
+            'file_size': new_image['file_size'],
+            'mime_type': new_image['mime_type'],
+            'width': new_image['width'],
+            'height': new_image['height'],
+            'placeholder': new_image['placeholder']
         }), 201
 
+    except WriteQueueTimeout as e:
+        if not e.may_apply:
+            delete_image_file(filename)
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Failed to upload image: {str(e)}")
         return jsonify({'error': 'Image upload failed'}), 500
 
 
+@images_bp.route('/upload/batch', methods=['POST'])
+@jwt_required()
+def upload_images_batch():
+    """Upload many images in one request and record them in a single transaction."""
+    stored = []
+    try:
+        user = get_current_user()
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({'error': 'No image files provided'}), 400
+
+        max_files = current_app.config.get('BATCH_UPLOAD_MAX_FILES', 50)
+        if len(files) > max_files:
+            return jsonify({'error': f'Maximum {max_files} files per batch'}), 400
+
+        image_type = request.form.get('image_type', 'general')
+        project_id = request.form.get('project_id', type=int)
+        blog_id = request.form.get('blog_id', type=int)
+
+        if image_type not in VALID_IMAGE_TYPES:
+            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
+
+        entity_id = project_id if image_type == 'project' else blog_id if image_type == 'blog' else None
+
+        # Check the entity limit once for the whole batch
+        remaining = None
+        if entity_id:
+            current_count = get_image_count(image_type, entity_id)
+            remaining = max(MAX_IMAGES_PER_ENTITY - current_count, 0)
+
+        limit_error = f'Maximum {MAX_IMAGES_PER_ENTITY} images per {image_type} reached'
+
+        # Cheap per-file checks first, so rejected files never reach storage
+        results = [None] * len(files)
+        accepted = []
+        for index, file in enumerate(files):
+            if not file.filename:
+                results[index] = {'original_filename': file.filename, 'error': 'No selected file'}
+            elif not allowed_file(file.filename):
+                results[index] = {'original_filename': file.filename, 'error': 'File type not allowed. Allowed types: png, jpg, jpeg, gif'}
+            elif remaining == 0:
+                results[index] = {'original_filename': file.filename, 'error': limit_error}
+            else:
+                accepted.append((index, file, generate_unique_filename(file.filename, image_type, entity_id)))
+
+        # Validate and stream the accepted files to storage concurrently
+        app = current_app._get_current_object()
+        storage = get_storage()
+        workers = current_app.config.get('BATCH_UPLOAD_WORKERS', 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(
+                lambda item: _store_batch_file(app, storage, item[1], item[2]), accepted
+            ))
+
+        new_images = []
+        for (index, file, filename), outcome in zip(accepted, outcomes):
+            if outcome.get('invalid'):
+                results[index] = {'original_filename': file.filename, 'error': 'File content is not a supported image'}
+                continue
+            if 'error' in outcome:
+                current_app.logger.error(f"Failed to store batch image {file.filename}: {outcome['error']}")
+                results[index] = {'original_filename': file.filename, 'error': 'Image upload failed'}
+                continue
+            # The limit counts only files that turned out to be images, in upload order
+            if remaining is not None and len(new_images) >= remaining:
+                delete_image_file(filename)
+                results[index] = {'original_filename': file.filename, 'error': limit_error}
+                continue
+            stored.append(filename)
+            image = dict(
+                filename=filename,
+                original_filename=file.filename,
+                file_path=f"uploads/{filename}",
+                file_url=storage.url(filename, external=True),
+                file_size=outcome['file_size'],
+                mime_type=outcome['mime_type'],
+                width=outcome['width'],
+                height=outcome['height'],
+                placeholder=outcome['placeholder'],
+                image_type=image_type,
+                user_id=user.id,
+                project_id=project_id if image_type == 'project' else None,
+                blog_id=blog_id if image_type == 'blog' else None
+            )
+            new_images.append((index, image))
+
+        # One transaction for every row in the batch
+        image_ids = run_write(_insert_images, [image for _, image in new_images]) if new_images else []
+
+        for (index, image), image_id in zip(new_images, image_ids):
+            results[index] = {
+                'original_filename': image['original_filename'],
+                'image_id': image_id,
+                'filename': image['filename'],
+                'file_url': image['file_url'],
+                'file_size': image['file_size'],
+                'mime_type': image['mime_type'],
+                'width': image['width'],
+                'height': image['height'],
+                'placeholder': image['placeholder']
+            }
+
+        uploaded = len(new_images)
+        status = 201 if uploaded == len(files) else 207 if uploaded else 400
+        return jsonify({
+            'message': f'{uploaded} of {len(files)} images uploaded',
+            'uploaded': uploaded,
+            'failed': len(files) - uploaded,
+            'results': results
+        }), status
+
+    except WriteQueueTimeout as e:
+        # The rows may still be written, and will need their files
+        if not e.may_apply:
+            for filename in stored:
+                delete_image_file(filename)
+        raise
+    except Exception as e:
+        db.session.rollback()
+        # Don't leave orphaned objects behind when the transaction fails
+        for filename in stored:
+            delete_image_file(filename)
+        current_app.logger.error(f"Failed to upload image batch: {str(e)}")
+        return jsonify({'error': 'Image upload failed'}), 500
+
+
+@images_bp.route('/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    """Issue a presigned URL so the browser can upload straight to object storage."""
+    try:
+        user = get_current_user()
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        data = request.get_json() or {}
+        original_filename = data.get('filename', '')
+        image_type = data.get('image_type', 'general')
+        entity_id = data.get('entity_id')
+
+        if not original_filename or not allowed_file(original_filename):
+            return jsonify({'error': 'File type not allowed. Allowed types: png, jpg, jpeg, gif'}), 400
+
+        if image_type not in VALID_IMAGE_TYPES:
+            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
+
+        filename = generate_unique_filename(original_filename, image_type, entity_id)
+        upload = get_storage().presigned_upload(
+            filename,
+            get_mime_type(original_filename),
+            current_app.config.get('PRESIGNED_URL_EXPIRES', 900)
+        )
+        if not upload:
+            return jsonify({'error': 'Direct uploads are not supported by the configured storage backend'}), 400
+
+        return jsonify({
+            'upload': upload,
+            'filename': filename,
+            'file_path': f"uploads/{filename}"
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Failed to presign upload: {str(e)}")
+        return jsonify({'error': 'Failed to create upload URL'}), 500
+
+
+@images_bp.route('/presign/complete', methods=['POST'])
+@jwt_required()
+def complete_presigned_upload():
+    """Record an image that the browser uploaded directly to object storage."""
+    new_image = None
+    try:
+        user = get_current_user()
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+
+        data = request.get_json() or {}
+        filename = os.path.basename(data.get('filename', ''))
+        original_filename = data.get('original_filename') or filename
+        image_type = data.get('image_type', 'general')
+        project_id = data.get('project_id')
+        blog_id = data.get('blog_id')
+
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Invalid filename'}), 400
+
+        if image_type not in VALID_IMAGE_TYPES:
+            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
+
+        storage = get_storage()
+        file_size = storage.size(filename)
+        if file_size is None:
+            return jsonify({'error': 'Uploaded object not found in storage'}), 400
+
+        # Only the header is fetched back; the placeholder is skipped for direct uploads
+        header = b''
+        for chunk in storage.get(filename):
+            header += chunk
+            if len(header) >= IMAGE_HEADER_BYTES:
+                break
+        metadata = inspect_image(io.BytesIO(header), with_placeholder=False)
+        if not metadata or not image_format_allowed(metadata['format']):
+            storage.delete(filename)
+            return jsonify({'error': 'File content is not a supported image'}), 400
+
+        entity_id = project_id if image_type == 'project' else blog_id if image_type == 'blog' else None
+        if entity_id:
+            current_count = get_image_count(image_type, entity_id)
+            if current_count >= MAX_IMAGES_PER_ENTITY:
+                storage.delete(filename)
+                return jsonify({'error': f'Maximum {MAX_IMAGES_PER_ENTITY} images per {image_type} reached'}), 400
+
+        new_image = dict(
+            filename=filename,
+            original_filename=original_filename,
+            file_path=f"uploads/{filename}",
+            file_url=storage.url(filename, external=True),
+            file_size=file_size,
+            mime_type=metadata['mime_type'],
+            width=metadata['width'],
+            height=metadata['height'],
+            image_type=image_type,
+            user_id=user.id,
+            project_id=project_id if image_type == 'project' else None,
+            blog_id=blog_id if image_type == 'blog' else None
+        )
+        [image_id] = run_write(_insert_images, [new_image])
+
+        return jsonify({
+            'message': 'Image uploaded successfully',
+            'image_id': image_id,
+            'filename': new_image['filename'],
+            'file_url': new_image['file_url'],
+            'image_type': new_image['image_type'],
+            'file_size': new_image['file_size'],
+            'mime_type': new_image['mime_type'],
+            'width': new_image['width'],
+            'height': new_image['height'],
+            'placeholder': None
+        }), 201
+
+    except WriteQueueTimeout as e:
+        if not e.may_apply:
+            _discard_presigned_upload(storage, filename)
+        raise
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to complete presigned upload: {str(e)}")
+        if new_image is not None:
+            # The object passed its checks but has no row; don't leave it orphaned in storage
+            _discard_presigned_upload(storage, filename)
+        return jsonify({'error': 'Image upload failed'}), 500
+
+
 @images_bp.route('/<int:image_id>', methods=['GET'])
 def get_image(image_id):
     """Get image details by ID."""
@@ -115,6 +438,9 @@ def get_image(image_id):
             'file_url': image.file_url,
             'file_size': image.file_size,
             'mime_type': image.mime_type,
+            'width': image.width,
+            'height': image.height,
+            'placeholder': image.placeholder,
             'image_type': image.image_type,
             'user_id': image.user_id,
             'project_id': image.project_id,
@@ -136,9 +462,8 @@ def get_images_by_type(image_type):
         per_page = request.args.get('per_page', 20, type=int)
         
         # Validate image type
-        valid_types = ['hero', 'about', 'avatar', 'project', 'blog', 'general', 'skill', 'experience', 'education']
-        if image_type not in valid_types:
-            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(valid_types)}'}), 400
+        if image_type not in VALID_IMAGE_TYPES:
+            return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
 
         images = Image.query.filter_by(
             image_type=image_type, 
@@ -156,6 +481,9 @@ def get_images_by_type(image_type):
                 'file_url': img.file_url,
                 'file_size': img.file_size,
                 'mime_type': img.mime_type,
+                'width': img.width,
+                'height': img.height,
+                'placeholder': img.placeholder,
                 'created_at': img.created_at.isoformat()
             } for img in images.items],
             'total': images.total,
@@ -205,6 +533,9 @@ def get_entity_images(entity_type, entity_id):
                 'file_url': img.file_url,
                 'file_size': img.file_size,
                 'mime_type': img.mime_type,
+                'width': img.width,
+                'height': img.height,
+                'placeholder': img.placeholder,
                 'image_type': img.image_type,
                 'created_at': img.created_at.isoformat()
             } for img in images.items],
@@ -219,14 +550,57 @@ def get_entity_images(entity_type, entity_id):
         return jsonify({'error': 'Failed to retrieve entity images'}), 500
 
 
+@images_bp.route('/entities', methods=['GET'])
+def get_images_for_entities():
+    """Get active images for many projects/blogs at once, grouped by entity."""
+    try:
+        try:
+            project_ids = _parse_id_list(request.args.get('project_ids'))
+            blog_ids = _parse_id_list(request.args.get('blog_ids'))
+        except ValueError:
+            return jsonify({'error': 'project_ids and blog_ids must be comma-separated integers'}), 400
+
+        if not project_ids and not blog_ids:
+            return jsonify({'error': 'Provide project_ids and/or blog_ids'}), 400
+        if len(project_ids) + len(blog_ids) > MAX_ENTITY_IDS_PER_LOOKUP:
+            return jsonify({'error': f'Maximum {MAX_ENTITY_IDS_PER_LOOKUP} ids per request'}), 400
+
+        # One IN query over the indexed foreign keys for every requested entity
+        conditions = []
+        if project_ids:
+            conditions.append(Image.project_id.in_(project_ids))
+        if blog_ids:
+            conditions.append(Image.blog_id.in_(blog_ids))
+        images = Image.query.filter(
+            Image.is_active == True,
+            db.or_(*conditions)
+        ).order_by(Image.id).all()
+
+        projects = {str(entity_id): [] for entity_id in project_ids}
+        blogs = {str(entity_id): [] for entity_id in blog_ids}
+        for img in images:
+            if img.project_id in project_ids:
+                projects[str(img.project_id)].append(image_to_dict(img))
+            if img.blog_id in blog_ids:
+                blogs[str(img.blog_id)].append(image_to_dict(img))
+
+        return jsonify({
+            'projects': projects,
+            'blogs': blogs
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Failed to get images for entities: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve entity images'}), 500
+
+
 @images_bp.route('/<int:image_id>', methods=['PUT'])
 @jwt_required()
 def update_image(image_id):
     """Update image metadata."""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
 
@@ -235,9 +609,8 @@ def update_image(image_id):
 
         # Update allowed fields
         if 'image_type' in data:
-            valid_types = ['hero', 'about', 'avatar', 'project', 'blog', 'general', 'skill', 'experience', 'education']
-            if data['image_type'] not in valid_types:
-                return jsonify({'error': f'Invalid image type. Valid types: {", ".join(valid_types)}'}), 400
+            if data['image_type'] not in VALID_IMAGE_TYPES:
+                return jsonify({'error': f'Invalid image type. Valid types: {", ".join(VALID_IMAGE_TYPES)}'}), 400
             image.image_type = data['image_type']
 
         if 'project_id' in data:
@@ -268,8 +641,7 @@ def delete_image(image_id):
     """Delete an image (soft delete)."""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
 
@@ -303,8 +675,7 @@ def hard_delete_image(image_id):
     """Permanently delete an image from database and filesystem."""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
 
@@ -335,23 +706,21 @@ def get_image_stats():
     """Get image statistics for admin dashboard."""
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         if not user or not user.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
 
-        # Get statistics
-        total_images = Image.query.filter_by(is_active=True).count()
-        images_by_type = db.session.query(
-            Image.image_type, 
-            db.func.count(Image.id)
-        ).filter_by(is_active=True).group_by(Image.image_type).all()
-
-        total_size = db.session.query(db.func.sum(Image.file_size)).filter_by(is_active=True).scalar() or 0
+        # Read the denormalized counters instead of scanning the images table
+        total_images, total_size = get_image_totals('all')
+        type_counters = ImageCounter.query.filter(
+            ImageCounter.scope == 'type',
+            ImageCounter.image_count > 0
+        ).all()
 
         return jsonify({
             'total_images': total_images,
-            'images_by_type': dict(images_by_type),
+            'images_by_type': {c.scope_key: c.image_count for c in type_counters},
+            'size_by_type_bytes': {c.scope_key: c.total_bytes for c in type_counters},
             'total_size_bytes': total_size,
             'total_size_mb': round(total_size / (1024 * 1024), 2)
         }), 200
@@ -1,27 +1,29 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from ..extensions import db
-from ..models import Project, User, ProjectStatus
+from ..models import Project, ProjectStatus, Image
+from ..utils.images import image_to_dict
+from ..utils.idempotency import idempotent
+from ..utils.auth import get_current_user
+from sqlalchemy.orm import selectinload
 import json
 
 projects_bp = Blueprint('projects', __name__)
 
 
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 @projects_bp.route('/projects', methods=['GET'])
 def get_projects():
     """Get all projects with optional filtering"""
     status = request.args.get('status')
     featured = request.args.get('featured')
+    embed_images = 'images' in request.args.get('embed', '').split(',')
     
     query = Project.query
     
+    # ?embed=images loads every project's images in one extra query
+    if embed_images:
+        query = query.options(selectinload(Project.images))
+    
     if status:
         try:
             status_enum = ProjectStatus(status)
@@ -51,6 +53,8 @@ def get_projects():
             "created_at": project.created_at.isoformat() if project.created_at else None,
             "updated_at": project.updated_at.isoformat() if project.updated_at else None
         }
+        if embed_images:
+            project_data["images"] = [image_to_dict(img) for img in project.images if img.is_active]
         projects_data.append(project_data)
     
     return jsonify(projects_data), 200
@@ -72,6 +76,7 @@ def get_project(project_id):
         "status": project.status.value,
         "featured": project.featured,
         "technologies": json.loads(project.technologies) if project.technologies else [],
+        "images": [image_to_dict(img) for img in Image.query.filter_by(project_id=project.id, is_active=True).order_by(Image.id)],
         "created_at": project.created_at.isoformat() if project.created_at else None,
         "updated_at": project.updated_at.isoformat() if project.updated_at else None
     }
@@ -81,6 +86,7 @@ def get_project(project_id):
 
 @projects_bp.route('/projects', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_project():
     """Create a new project (admin only)"""
     user = get_current_user()
@@ -1,18 +1,12 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from ..extensions import db
-from ..models import Skill, User, CategoryStatus
+from ..models import Skill, CategoryStatus
+from ..utils.auth import get_current_user
 
 skills_bp = Blueprint('skills', __name__)
 
 
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 @skills_bp.route('/skills', methods=['GET'])
 def get_skills():
     """Get all skills with optional filtering"""
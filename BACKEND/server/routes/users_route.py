@@ -1,10 +1,13 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, create_refresh_token
-from ..extensions import db
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, create_access_token, create_refresh_token
+from ..extensions import db, jwt
 from sqlalchemy import func
 from ..models import User, Image
-from werkzeug.security import generate_password_hash
+from ..utils.images import delete_image_file, inspect_image, image_format_allowed
+from ..utils.storage import get_storage
+from ..utils.rate_limit import rate_limit
+from ..utils.auth import get_current_user, load_current_user, user_cache
+from ..utils.passwords import hash_password, verify_password
 import os
 import uuid
 from werkzeug.utils import secure_filename
@@ -14,19 +17,20 @@ from datetime import datetime
 users_bp = Blueprint('auth', __name__)
 ALLOWED_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
 
+
+def normalize_email(email):
+    """Emails are stored trimmed and lowercased so lookups on lower(email) hit ix_users_email_lower."""
+    return email.strip().lower()
+
+
+def find_user_by_email(email):
+    return User.query.filter(func.lower(User.email) == normalize_email(email)).first()
+
 def allowed_image(filename):
     _, ext = os.path.splitext(filename.lower())
     return ext in ALLOWED_IMAGE_EXTENSIONS
 
 
-# Utility function to get the current logged in user based on JWT token
-def get_current_user():
-    current_user_id = get_jwt_identity()
-    if not current_user_id:
-        return None
-    return db.session.get(User, current_user_id)
-
-
 # A protected route to test user access tokens
 @users_bp.route('/protected', methods=['GET'])
 @jwt_required()
@@ -38,6 +42,20 @@ def protected_route():
     return jsonify({"message": f"Welcome, {user.username}! You are authorized to access this route"})
 
 
+@users_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def get_auth_cache_stats():
+    """Hit rates of the JWT claims cache and the current-user cache in this worker (admin only)"""
+    user = get_current_user()
+    if not user or not user.is_admin:
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify({
+        "jwt_claims": current_app.extensions['jwt_claims_cache'].snapshot(),
+        "current_user": dict(user_cache.stats)
+    }), 200
+
+
 @users_bp.route("/refresh", methods=['POST'])
 @jwt_required(refresh=True)
 def refresh_token():
@@ -47,7 +65,20 @@ def refresh_token():
     return jsonify({'access_token': new_access_token}), 200
 
 
+@users_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the token sent with this request (access or refresh; send each to log out fully)"""
+    token = get_jwt()
+    try:
+        jwt.revocations.revoke(token['jti'], expires_at=token.get('exp'))
+    except Exception as e:
+        return jsonify({"message": "An error occurred while logging out", "details": str(e)}), 500
+    return jsonify({"message": "Logged out"}), 200
+
+
 @users_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     data = request.get_json()
 
@@ -55,13 +86,19 @@ def login():
     if not data.get('email') or not data.get('password'):
         return jsonify({"message": "Email and password are required"}), 400
 
-    email = data['email'].strip().lower()
     password = data['password']
 
     # Fetch the user from the database (case-insensitive email match)
-    user = User.query.filter(func.lower(User.email) == email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    user = find_user_by_email(data['email'])
+    if not user or not verify_password(user, password):
         return jsonify({"message": "Invalid email or password"}), 401
+    if db.session.is_modified(user):
+        # The stored hash was upgraded to the current PASSWORD_HASH_METHOD
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Could not save rehashed password for user {user.id}: {str(e)}")
 
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
@@ -80,6 +117,7 @@ def login():
 
 
 @users_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     data = request.get_json()
     # Validate input
@@ -87,11 +125,11 @@ def register():
         return jsonify({"error": "Missing required fields"}), 400
     
     username = data['username']
-    email = data['email']
+    email = normalize_email(data['email'])
     password = data['password']
     
     # Check if the email already exists
-    if User.query.filter_by(email=email).first():
+    if find_user_by_email(email):
         return jsonify({"error": "Email already exists"}), 400
     
     # Check if username already exists
@@ -99,7 +137,7 @@ def register():
         return jsonify({"error": "Username already exists"}), 400
     
     # Hash passwords before storing them in the database
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
 
     # Create a new user
     user = User(username=username, email=email, password_hash=password_hash)
@@ -115,7 +153,7 @@ def register():
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
-    user = get_current_user()
+    user = load_current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
     
@@ -185,13 +223,27 @@ def get_public_profile():
 @users_bp.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
-    user = get_current_user()
+    user = load_current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
     
     data = request.get_json()
     
     # Update allowed fields
+    if 'email' in data:
+        email = normalize_email(data['email'] or '')
+        if not email:
+            return jsonify({"error": "Email cannot be empty"}), 400
+        if email != user.email:
+            # The email is the login name, so changing it takes the password like change-password does
+            if not data.get('current_password'):
+                return jsonify({"error": "Current password is required to change the email"}), 400
+            if not verify_password(user, data['current_password']):
+                return jsonify({"error": "Current password is incorrect"}), 400
+            existing = find_user_by_email(email)
+            if existing and existing.id != user.id:
+                return jsonify({"error": "Email already exists"}), 400
+        user.email = email
     if 'first_name' in data:
         user.first_name = data['first_name']
     if 'last_name' in data:
@@ -238,7 +290,7 @@ def update_profile():
 @users_bp.route('/change-password', methods=['PUT'])
 @jwt_required()
 def change_password():
-    user = get_current_user()
+    user = load_current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
     
@@ -248,26 +300,34 @@ def change_password():
         return jsonify({"error": "Current password and new password are required"}), 400
     
     # Verify current password
-    if not check_password_hash(user.password_hash, data['current_password']):
+    if not verify_password(user, data['current_password']):
         return jsonify({"error": "Current password is incorrect"}), 400
     
-    # Hash new password
-    user.password_hash = generate_password_hash(data['new_password'])
+    # Hash new password, and end every session started before now
+    user.password_hash = hash_password(data['new_password'])
+    user.tokens_valid_after = datetime.utcnow().replace(microsecond=0)
     
     try:
-        db.session.commit()
-        return jsonify({"message": "Password changed successfully"}), 200
+        # This token may be from this same second, so it is revoked by jti too; commits the change with it
+        token = get_jwt()
+        jwt.revocations.revoke(token['jti'], expires_at=token.get('exp'))
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "An error occurred while changing the password", "details": str(e)}), 500
 
+    return jsonify({
+        "message": "Password changed successfully",
+        "access_token": create_access_token(identity=user.id),
+        "refresh_token": create_refresh_token(identity=user.id)
+    }), 200
+
 
 # Image upload endpoints
 @users_bp.route('/profile/upload/<image_type>', methods=['POST'])
 @jwt_required()
 def upload_profile_image(image_type):
     """Upload hero, about, or avatar image and store in database with metadata."""
-    user = get_current_user()
+    user = load_current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
 
@@ -284,31 +344,34 @@ def upload_profile_image(image_type):
     if not allowed_image(file.filename):
         return jsonify({"error": "Unsupported file type"}), 400
 
-    # Create upload directory
-    upload_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'uploads')
-    upload_dir = os.path.normpath(upload_dir)
-    os.makedirs(upload_dir, exist_ok=True)
-
     # Generate unique filename while preserving original name
     original_filename = secure_filename(file.filename)
     name_without_ext, file_ext = os.path.splitext(original_filename)
     unique_id = uuid.uuid4().hex[:8]  # Short unique ID
     unique_filename = f"{name_without_ext}_{unique_id}{file_ext}"
-    
-    # Save file
-    file_path = os.path.join(upload_dir, unique_filename)
-    file.save(file_path)
-    
-    # Get file info
-    file_size = os.path.getsize(file_path)
-    mime_type = file.content_type or 'image/jpeg'
-    
-    # Public URL
-    public_url = f"/static/uploads/{unique_filename}"
+
+    # Check the real format from the file's bytes, not the client's content type
+    metadata = inspect_image(file.stream)
+    allowed_formats = {ext.lstrip('.') for ext in ALLOWED_IMAGE_EXTENSIONS}
+    if not metadata or not image_format_allowed(metadata['format'], allowed_formats):
+        return jsonify({"error": "Unsupported file type"}), 400
+    mime_type = metadata['mime_type']
+
+    # Stream the upload to the configured storage backend
+    storage = get_storage()
+    try:
+        file_size = storage.put(unique_filename, file.stream, mime_type)
+    except Exception as e:
+        return jsonify({"error": "Failed to store image", "details": str(e)}), 500
+
+    file_path = f"uploads/{unique_filename}"
+    public_url = storage.url(unique_filename)
 
     try:
         # Deactivate previous images of this type for this user
-        Image.query.filter_by(user_id=user.id, image_type=image_type, is_active=True).update({'is_active': False})
+        # (row by row so the image counters see the change)
+        for previous in Image.query.filter_by(user_id=user.id, image_type=image_type, is_active=True):
+            previous.is_active = False
         
         # Create new image record
         new_image = Image(
@@ -318,6 +381,9 @@ def upload_profile_image(image_type):
             file_url=public_url,
             file_size=file_size,
             mime_type=mime_type,
+            width=metadata['width'],
+            height=metadata['height'],
+            placeholder=metadata['placeholder'],
             image_type=image_type,
             user_id=user.id,
             is_active=True
@@ -340,14 +406,16 @@ def upload_profile_image(image_type):
             "url": public_url,
             "image_id": new_image.id,
             "filename": unique_filename,
-            "file_size": file_size
+            "file_size": file_size,
+            "width": new_image.width,
+            "height": new_image.height,
+            "placeholder": new_image.placeholder
         }), 200
         
     except Exception as e:
         db.session.rollback()
         # Clean up uploaded file if database save fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        delete_image_file(unique_filename)
         return jsonify({"error": "Failed to save image", "details": str(e)}), 500
 
 
@@ -369,6 +437,9 @@ def get_user_images():
             "file_url": img.file_url,
             "file_size": img.file_size,
             "mime_type": img.mime_type,
+            "width": img.width,
+            "height": img.height,
+            "placeholder": img.placeholder,
             "image_type": img.image_type,
             "created_at": img.created_at.isoformat()
         } for img in images]
@@ -379,7 +450,7 @@ def get_user_images():
 @jwt_required()
 def delete_user_image(image_id):
     """Delete a specific image."""
-    user = get_current_user()
+    user = load_current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
     
@@ -389,8 +460,7 @@ def delete_user_image(image_id):
     
     try:
         # Delete physical file
-        if os.path.exists(image.file_path):
-            os.remove(image.file_path)
+        delete_image_file(image.file_path)
         
         # Remove from database
         db.session.delete(image)
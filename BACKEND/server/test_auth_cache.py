@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared current-user resolver and its cache.
+Run with: python -m pytest server/test_auth_cache.py
+"""
+
+from sqlalchemy import event
+
+from server.app import app
+from server.extensions import db
+from server.models import User
+
+
+class UserQueryCounter:
+    """Counts SELECTs against the users table while active."""
+
+    def __init__(self):
+        with app.app_context():
+            self.engine = db.engine
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM users' in statement:
+            self.count += 1
+
+
+def test_admin_burst_hits_users_table_once(client, admin_headers):
+    # Each request gets its own app context, so only the cross-request cache can help here
+    with UserQueryCounter() as queries:
+        for path in ['/api/contact', '/api/contact/stats', '/api/images/stats', '/api/contact/mail/status'] * 5:
+            assert client.get(path, headers=admin_headers).status_code == 200, path
+    # One for the user snapshot, one for the revocation check's tokens_valid_after
+    assert queries.count == 2
+
+
+def test_user_update_invalidates_cache(client, admin_id, admin_headers):
+    assert client.get('/api/contact', headers=admin_headers).status_code == 200
+
+    with app.app_context():
+        admin = db.session.get(User, admin_id)
+        admin.is_admin = False
+        db.session.commit()
+
+    # Demotion takes effect on the next request, not after the TTL
+    assert client.get('/api/contact', headers=admin_headers).status_code == 403
+
+
+def test_profile_reads_the_full_row(client, admin_headers):
+    assert client.put('/api/auth/profile', json={'bio': 'Hello'}, headers=admin_headers).status_code == 200
+    assert client.get('/api/auth/profile', headers=admin_headers).get_json()['bio'] == 'Hello'
+
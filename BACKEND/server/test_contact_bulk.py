@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk admin actions on contact messages.
+Run with: python -m pytest server/test_contact_bulk.py
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from server.app import app
+from server.extensions import db
+from server.models import Contact
+
+
+def _add_contacts(rows=500):
+    """`rows` unread contacts, one a day going back from today."""
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Contact), [
+            {'name': f'Spammer {i}', 'email': f'spam{i}@example.com', 'message': 'Buy now',
+             'read': False, 'created_at': now - timedelta(days=i)}
+            for i in range(rows)
+        ])
+        db.session.commit()
+
+
+def test_bulk_by_ids(client, admin_headers):
+    _add_contacts()
+
+    response = client.post('/api/contact/bulk', json={'action': 'mark_read', 'ids': [1, 2, 3, 9999]}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 3
+
+    response = client.post('/api/contact/bulk', json={'action': 'delete', 'ids': [1, 2]}, headers=admin_headers)
+    assert response.get_json()['deleted'] == 2
+    with app.app_context():
+        assert Contact.query.count() == 498
+        assert Contact.query.filter_by(read=True).count() == 1
+
+
+def test_bulk_by_filter_is_one_statement(client, admin_headers):
+    _add_contacts()
+    with app.app_context():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.post('/api/contact/bulk', headers=admin_headers, json={
+                'action': 'delete', 'filter': {'read': False, 'older_than_days': 30}
+            })
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert response.status_code == 200
+        assert response.get_json()['deleted'] == 470
+        assert len([s for s in statements if s.lstrip().upper().startswith('DELETE')]) == 1
+        assert Contact.query.count() == 30
+
+
+def test_bulk_rejects_unsafe_requests(client, admin_headers):
+    _add_contacts(rows=5)
+    bad_bodies = [
+        {'action': 'delete'},
+        {'action': 'delete', 'filter': {}},
+        {'action': 'delete', 'ids': [], },
+        {'action': 'delete', 'ids': [1], 'filter': {'read': True}},
+        {'action': 'explode', 'ids': [1]},
+        {'action': 'delete', 'filter': {'older_than_days': 'soon'}},
+    ]
+    for body in bad_bodies:
+        assert client.post('/api/contact/bulk', json=body, headers=admin_headers).status_code == 400, body
+    with app.app_context():
+        assert Contact.query.count() == 5
+
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the connection pool profile and pool metrics.
+Run with: python -m pytest server/test_db_pool.py
+"""
+
+import os
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, exc, text
+
+from server.app import app, database_error
+from server.utils.db_pool import MeteredQueuePool, pool_engine_options, pool_snapshot
+
+
+def _engine(**options):
+    path = os.path.join(tempfile.mkdtemp(), 'pool.db')
+    return create_engine(f'sqlite:///{path}', poolclass=MeteredQueuePool, **options)
+
+
+def test_checkout_waits_and_timeouts_are_recorded():
+    engine = _engine(pool_size=1, max_overflow=0, pool_timeout=0.2)
+    held = engine.connect()
+    held.execute(text('SELECT 1'))
+    assert pool_snapshot(engine)['utilization'] == 1.0
+
+    errors = []
+
+    def second_checkout():
+        try:
+            engine.connect()
+        except exc.TimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=second_checkout)
+    thread.start()
+    thread.join()
+    held.close()
+    assert len(errors) == 1
+
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+    snapshot = pool_snapshot(engine)
+    assert snapshot['pool_class'] == 'MeteredQueuePool'
+    assert snapshot['checkouts'] == 2
+    assert snapshot['timeouts'] == 1
+    assert snapshot['slow_checkouts'] >= 1
+    assert snapshot['wait_ms_max'] >= 200
+    assert snapshot['checked_out'] == 0 and snapshot['utilization'] == 0.0
+
+    # Counters survive engine.dispose(), which replaces the pool
+    engine.dispose()
+    assert pool_snapshot(engine)['checkouts'] == 2
+
+
+def test_engine_options_profile():
+    memory = pool_engine_options('sqlite://', 5, 2, 10, 1800)
+    assert memory == {'pool_pre_ping': False}
+
+    options = pool_engine_options('postgresql://u:p@db/portfolio', 5, 2, 10, 1800)
+    assert options['poolclass'] is MeteredQueuePool
+    assert options['pool_size'] == 5 and options['max_overflow'] == 2
+    assert options['pool_timeout'] == 10 and options['pool_recycle'] == 1800
+    assert options['pool_pre_ping'] is False
+
+    engine = create_engine(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'p.db')}?check_same_thread=false",
+        **pool_engine_options('sqlite:///p.db', 3, 1, 10, 1800)
+    )
+    assert engine.pool.size() == 3 and engine.pool._recycle == 1800
+
+
+def test_pool_debug_endpoint():
+    response = app.test_client().get('/debug/db/pool')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'default' in data['pools']
+    assert data['max_connections_total'] == data['workers'] * data['max_connections_per_worker']
+
+
+def test_dropped_connection_maps_to_503():
+    error = exc.DBAPIError('SELECT 1', {}, Exception('server closed the connection'), connection_invalidated=True)
+    with app.test_request_context():
+        response, status = database_error(error)
+    assert status == 503
+    assert response.headers['Retry-After'] == '1'
+
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for routing read-only requests to the read replica.
+Run with: python -m pytest server/test_db_routing.py
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from server.app import app
+from server.extensions import db
+from server.models import Blog, User
+from server.utils.db_routing import PRIMARY_COOKIE, REPLICA_BIND
+
+
+def _seed(bind, title):
+    with Session(bind) as session:
+        author = User(username='author', email='author@example.com', password_hash='x')
+        session.add(author)
+        session.flush()
+        session.add(Blog(title=title, slug='post', content='...', author_id=author.id,
+                         published=True, published_at=datetime.utcnow(), views=0))
+        session.commit()
+
+
+@pytest.fixture
+def primary(fresh_db):
+    with app.app_context():
+        _seed(db.engine, 'from primary')
+
+
+def _attach_replica(url):
+    """Add a replica bind to the running app, as DATABASE_REPLICA_URL would at startup."""
+    engine = create_engine(url)
+    with app.app_context():
+        db.engines[REPLICA_BIND] = engine
+    app.extensions.pop('db_replica', None)
+    return engine
+
+
+def _detach_replica():
+    with app.app_context():
+        engine = db.engines.pop(REPLICA_BIND, None)
+    app.extensions.pop('db_replica', None)
+    if engine is not None:
+        engine.dispose()
+
+
+def _titles(client):
+    response = client.get('/api/blog')
+    assert response.status_code == 200
+    return [blog['title'] for blog in response.get_json()['blogs']]
+
+
+def test_reads_go_to_the_replica_until_a_write(primary):
+    engine = _attach_replica(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'replica.db')}")
+    try:
+        db.metadata.create_all(engine)
+        _seed(engine, 'from replica')
+        client = app.test_client()
+        assert _titles(client) == ['from replica']
+
+        # A write pins this client to the primary for the read-your-writes window
+        response = client.post('/api/contact', json={
+            'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Hello there, friend!'
+        })
+        assert response.status_code == 201
+        assert PRIMARY_COOKIE in response.headers.get('Set-Cookie', '')
+        assert _titles(client) == ['from primary']
+
+        # Another worker only sees the cookie
+        app.extensions['db_replica']._recent_writers.clear()
+        assert _titles(client) == ['from primary']
+        client.delete_cookie(PRIMARY_COOKIE)
+        assert _titles(client) == ['from replica']
+
+        # Writes inside a GET still land on the primary
+        assert client.get('/api/blog/post').status_code == 200
+        with app.app_context():
+            assert Blog.query.filter_by(slug='post').one().views == 1
+        with Session(engine) as session:
+            assert session.query(Blog).one().views == 0
+
+        stats = app.extensions['db_replica'].snapshot()
+        assert stats['replica_reads'] >= 2 and stats['primary_reads'] >= 2
+    finally:
+        _detach_replica()
+
+
+def test_unavailable_replica_falls_back_to_primary(primary):
+    _attach_replica(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'missing', 'replica.db')}")
+    try:
+        client = app.test_client()
+        assert _titles(client) == ['from primary']
+        monitor = app.extensions['db_replica']
+        assert monitor.snapshot()['healthy'] is False
+        assert monitor.stats['failures'] == 1
+        # Not re-checked on every request
+        assert _titles(client) == ['from primary']
+        assert monitor.stats['checks'] == 1
+    finally:
+        _detach_replica()
+
+
+def test_no_replica_means_no_routing(primary):
+    _detach_replica()
+    assert _titles(app.test_client()) == ['from primary']
+    assert 'db_replica' not in app.extensions
+
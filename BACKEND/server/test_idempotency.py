@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for Idempotency-Key handling on create endpoints.
+Run with: python -m pytest server/test_idempotency.py
+"""
+
+from datetime import datetime
+
+from server.app import app
+from server.extensions import db
+from server.models import Blog, Contact, IdempotencyKey, OutboundEmail, User
+
+CONTACT = {
+    "name": "Jane Visitor",
+    "email": "jane@example.com",
+    "subject": "Hello",
+    "message": "I would like to talk about a project."
+}
+
+
+def test_contact_retry_replays_first_response(fresh_db, client):
+    headers = {'Idempotency-Key': 'contact-1'}
+
+    first = client.post('/api/contact', json=CONTACT, headers=headers)
+    assert first.status_code == 201
+    for _ in range(3):
+        retry = client.post('/api/contact', json=CONTACT, headers=headers)
+        assert retry.status_code == 201
+        assert retry.get_json() == first.get_json()
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+
+    with app.app_context():
+        assert Contact.query.count() == 1
+        assert OutboundEmail.query.count() == 2
+
+    # A different key is a different submission
+    assert client.post('/api/contact', json=CONTACT, headers={'Idempotency-Key': 'contact-2'}).status_code == 201
+    # No key: no idempotency
+    assert client.post('/api/contact', json=CONTACT).status_code == 201
+    with app.app_context():
+        assert Contact.query.count() == 3
+
+
+def test_key_reused_for_different_body_is_rejected(fresh_db, client):
+    headers = {'Idempotency-Key': 'contact-1'}
+    assert client.post('/api/contact', json=CONTACT, headers=headers).status_code == 201
+    response = client.post('/api/contact', json=dict(CONTACT, message='Something else'), headers=headers)
+    assert response.status_code == 422
+
+
+def test_in_progress_and_expired_keys(fresh_db, client):
+    with app.app_context():
+        body = client.post('/api/contact', json=CONTACT, headers={'Idempotency-Key': 'k'})
+        record = IdempotencyKey.query.one()
+
+        # Simulate the first request still running
+        record.status = 'in_progress'
+        db.session.commit()
+        response = client.post('/api/contact', json=CONTACT, headers={'Idempotency-Key': 'k'})
+        assert response.status_code == 409
+        assert response.headers['Retry-After'] == '1'
+
+        # Once expired, the key can be used again
+        record.expires_at = datetime(2000, 1, 1)
+        db.session.commit()
+        assert client.post('/api/contact', json=CONTACT, headers={'Idempotency-Key': 'k'}).status_code == 201
+        assert Contact.query.count() == 2
+        assert IdempotencyKey.query.count() == 1
+
+
+def test_create_blog_keys_are_scoped_per_user(fresh_db, client, auth_headers):
+    with app.app_context():
+        admins = [User(username=f'admin{i}', email=f'admin{i}@example.com', password_hash='x', is_admin=True)
+                  for i in range(2)]
+        db.session.add_all(admins)
+        db.session.commit()
+        headers = [dict(auth_headers(admin.id), **{'Idempotency-Key': 'same'}) for admin in admins]
+
+    post = {"title": "Hello world", "content": "Body"}
+    responses = [client.post('/api/blog', json=post, headers=h) for h in headers + headers]
+    assert [r.status_code for r in responses] == [201] * 4
+    assert responses[2].get_json() == responses[0].get_json()
+    assert responses[3].get_json() == responses[1].get_json()
+    with app.app_context():
+        assert Blog.query.count() == 2
+
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the denormalized image counters.
+Run with: python -m pytest server/test_image_counters.py
+"""
+
+import pytest
+
+from server.app import app
+from server.extensions import db
+from server.models import Image, ImageCounter, Project
+from server.utils.image_counters import get_image_count, get_image_totals, reconcile_image_counters
+
+
+@pytest.fixture
+def projects(fresh_db):
+    with app.app_context():
+        projects = [Project(title=f'Project {i}', description='...') for i in range(2)]
+        db.session.add_all(projects)
+        db.session.commit()
+        return [project.id for project in projects]
+
+
+def _image(project_id, size=100, image_type='project'):
+    return Image(
+        filename='a.png', original_filename='a.png', file_path='a.png', file_url='/a.png',
+        file_size=size, mime_type='image/png', image_type=image_type, project_id=project_id
+    )
+
+
+def _counts(project_ids):
+    return [get_image_count('project', project_id) for project_id in project_ids]
+
+
+def test_changes_after_a_commit_reach_the_counters(projects):
+    with app.app_context():
+        image = _image(projects[0])
+        db.session.add(image)
+        db.session.commit()
+        assert _counts(projects) == [1, 0]
+        assert get_image_totals('all') == (1, 100)
+
+        # Every commit expires the image, so each change below starts from unloaded attributes
+        image.is_active = False
+        db.session.commit()
+        assert _counts(projects) == [0, 0]
+        assert get_image_totals('type', 'project') == (0, 0)
+
+        image.is_active = True
+        db.session.commit()
+        assert _counts(projects) == [1, 0]
+
+        image.project_id = projects[1]
+        db.session.commit()
+        assert _counts(projects) == [0, 1]
+
+        image.file_size = 250
+        image.image_type = 'gallery'
+        db.session.commit()
+        assert get_image_totals('all') == (1, 250)
+        assert get_image_totals('type', 'project') == (0, 0)
+        assert get_image_totals('type', 'gallery') == (1, 250)
+
+        db.session.delete(image)
+        db.session.commit()
+        assert _counts(projects) == [0, 0]
+        assert get_image_totals('all') == (0, 0)
+
+        assert reconcile_image_counters() == []
+
+
+def test_deleting_a_partly_loaded_image(projects):
+    with app.app_context():
+        image = _image(projects[0])
+        db.session.add(image)
+        db.session.commit()
+        image_id = image.id
+
+    with app.app_context():
+        image = db.session.query(Image).options(db.load_only(Image.id)).filter_by(id=image_id).one()
+        db.session.delete(image)
+        db.session.commit()
+        assert _counts(projects) == [0, 0]
+
+
+def test_counts_see_upserts_made_earlier_in_the_same_session(projects):
+    with app.app_context():
+        db.session.add(_image(projects[0]))
+        db.session.commit()
+        # Something in the request already holds the counter row in the identity map
+        counter = db.session.get(ImageCounter, ('project', str(projects[0])))
+        assert counter.image_count == 1
+
+        db.session.add(_image(projects[0]))
+        db.session.flush()
+        assert get_image_count('project', projects[0]) == 2
+        assert get_image_totals('project', projects[0]) == (2, 200)
+        db.session.commit()
+
+
+def test_reconcile_repairs_drift(projects):
+    with app.app_context():
+        db.session.add_all([_image(projects[0]), _image(projects[1], size=50)])
+        db.session.commit()
+        db.session.execute(db.text("UPDATE image_counters SET image_count = 7 WHERE scope = 'all'"))
+        db.session.commit()
+
+        assert reconcile_image_counters() == [('all', '', 7, 2, 150, 150)]
+        assert get_image_totals('all') == (2, 150)
+        assert reconcile_image_counters() == []
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test script for image uploads and lookups.
+Files go to a LocalStorage in a temporary directory.
+Run with: python -m pytest server/test_images.py
+"""
+
+import io
+import os
+import tempfile
+
+import pytest
+from PIL import Image as PILImage
+from sqlalchemy import event
+
+from server.app import app
+from server.extensions import db
+from server.models import Blog, Image, Project, User
+from server.utils.images import inspect_image
+from server.utils.storage import LocalStorage
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    with tempfile.TemporaryDirectory() as root:
+        storage = LocalStorage(root)
+        monkeypatch.setitem(app.extensions, 'storage', storage)
+        yield storage
+
+
+@pytest.fixture
+def project_id(fresh_db):
+    with app.app_context():
+        project = Project(title='Project', description='...')
+        db.session.add(project)
+        db.session.commit()
+        return project.id
+
+
+def _image_file(size=(40, 30), image_format='PNG'):
+    data = io.BytesIO()
+    PILImage.new('RGB', size, (200, 40, 40)).save(data, image_format)
+    data.seek(0)
+    return data
+
+
+def _upload_batch(client, headers, files, **form):
+    return client.post('/api/images/upload/batch', headers=headers, data=dict(form, images=files))
+
+
+def test_batch_upload_reports_each_file(client, admin_headers, storage):
+    response = _upload_batch(client, admin_headers, [
+        (_image_file(), 'one.png'),
+        (io.BytesIO(b'not an image'), 'notes.txt'),
+        (io.BytesIO(b'not an image either'), 'fake.png'),
+        (_image_file(), 'two.png'),
+    ], image_type='general')
+    assert response.status_code == 207
+    data = response.get_json()
+    assert (data['uploaded'], data['failed']) == (2, 2)
+
+    results = data['results']
+    assert [result['original_filename'] for result in results] == ['one.png', 'notes.txt', 'fake.png', 'two.png']
+    assert 'File type not allowed' in results[1]['error']
+    assert results[2]['error'] == 'File content is not a supported image'
+    for result in (results[0], results[3]):
+        assert storage.exists(result['filename'])
+
+    with app.app_context():
+        ids = sorted(image.id for image in Image.query.all())
+    assert ids == sorted([results[0]['image_id'], results[3]['image_id']])
+
+
+def test_batch_upload_stops_at_the_entity_limit(client, admin_headers, storage, project_id, monkeypatch):
+    monkeypatch.setattr('server.routes.images_route.MAX_IMAGES_PER_ENTITY', 2)
+    files = [(_image_file(), f'{i}.png') for i in range(3)]
+    response = _upload_batch(client, admin_headers, files, image_type='project', project_id=project_id)
+    assert response.status_code == 207
+    assert [('error' in result) for result in response.get_json()['results']] == [False, False, True]
+
+    response = _upload_batch(client, admin_headers, [(_image_file(), 'more.png')],
+                             image_type='project', project_id=project_id)
+    assert response.status_code == 400
+    with app.app_context():
+        assert Image.query.filter_by(project_id=project_id).count() == 2
+
+
+def test_batch_upload_limit_skips_files_that_are_not_images(client, admin_headers, storage, project_id, monkeypatch):
+    monkeypatch.setattr('server.routes.images_route.MAX_IMAGES_PER_ENTITY', 2)
+    files = [(io.BytesIO(b'not an image'), 'fake.png')] + [(_image_file(), f'{i}.png') for i in range(3)]
+    response = _upload_batch(client, admin_headers, files, image_type='project', project_id=project_id)
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [result.get('error') for result in results] == [
+        'File content is not a supported image', None, None, 'Maximum 2 images per project reached'
+    ]
+    with app.app_context():
+        assert Image.query.filter_by(project_id=project_id).count() == 2
+    # Only the two recorded images are left in storage
+    assert sorted(os.listdir(storage.root)) == sorted(result['filename'] for result in results[1:3])
+
+
+def test_batch_upload_needs_an_admin(client, auth_headers, storage, fresh_db):
+    with app.app_context():
+        user = User(username='visitor', email='visitor@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        headers = auth_headers(user.id)
+    response = _upload_batch(client, headers, [(_image_file(), 'one.png')])
+    assert response.status_code == 403
+    assert _upload_batch(client, {}, [(_image_file(), 'one.png')]).status_code == 401
+
+
+@pytest.mark.parametrize('image_format, options, mode', [
+    ('PNG', {}, 'RGB'),
+    ('JPEG', {}, 'RGB'),
+    ('GIF', {}, 'RGB'),
+    ('WEBP', {}, 'RGB'),  # lossy, VP8
+    ('WEBP', {'lossless': True}, 'RGB'),  # VP8L
+    ('WEBP', {}, 'RGBA'),  # with alpha, VP8X
+])
+def test_inspect_image_reads_real_format_and_size(image_format, options, mode):
+    data = io.BytesIO()
+    PILImage.new(mode, (123, 45)).save(data, image_format, **options)
+    data.seek(0)
+    with app.app_context():
+        metadata = inspect_image(data)
+    assert metadata['format'] == image_format.lower()
+    assert (metadata['width'], metadata['height']) == (123, 45)
+    assert metadata['placeholder'].startswith('data:image/webp;base64,')
+    assert data.tell() == 0
+
+    with app.app_context():
+        assert inspect_image(io.BytesIO(b'GIF8 but not really')) is None
+
+
+def test_upload_records_the_sniffed_metadata(client, admin_headers, storage):
+    # A JPEG named .png is stored as what it really is
+    response = client.post('/api/images/upload', headers=admin_headers,
+                           data={'image': (_image_file((64, 48), 'JPEG'), 'photo.png')})
+    assert response.status_code == 201
+    uploaded = response.get_json()
+    assert (uploaded['mime_type'], uploaded['width'], uploaded['height']) == ('image/jpeg', 64, 48)
+
+    image = client.get(f"/api/images/{uploaded['image_id']}").get_json()
+    assert (image['mime_type'], image['width'], image['height']) == ('image/jpeg', 64, 48)
+    assert image['placeholder'] and image['placeholder'] == uploaded['placeholder']
+
+
+def test_presigned_upload_is_recorded(client, admin_headers, storage):
+    storage.put('direct.png', _image_file((32, 16)), 'image/png')
+    response = client.post('/api/images/presign/complete', headers=admin_headers,
+                           json={'filename': 'direct.png', 'original_filename': 'photo.png'})
+    assert response.status_code == 201
+    image = client.get(f"/api/images/{response.get_json()['image_id']}").get_json()
+    assert (image['original_filename'], image['width'], image['height']) == ('photo.png', 32, 16)
+
+
+def test_presigned_upload_is_deleted_when_it_cannot_be_recorded(client, admin_headers, storage, monkeypatch):
+    def fail(rows):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr('server.routes.images_route._insert_images', fail)
+    storage.put('direct.png', _image_file(), 'image/png')
+    response = client.post('/api/images/presign/complete', headers=admin_headers, json={'filename': 'direct.png'})
+    assert response.status_code == 500
+    assert not storage.exists('direct.png')
+
+
+@pytest.fixture
+def entity_images(admin_id):
+    """Two projects and a blog; the first project has two active images and an inactive one."""
+    with app.app_context():
+        projects = [Project(title=f'Project {i}', description='...') for i in range(2)]
+        blog = Blog(title='Post', slug='post', content='...', author_id=admin_id, published=True)
+        db.session.add_all(projects + [blog])
+        db.session.flush()
+
+        def image(name, **fields):
+            return Image(filename=name, original_filename=name, file_path=name, file_url=f'/{name}',
+                         file_size=1, mime_type='image/png', **fields)
+
+        db.session.add_all([
+            image('a.png', image_type='project', project_id=projects[0].id),
+            image('b.png', image_type='project', project_id=projects[0].id),
+            image('old.png', image_type='project', project_id=projects[0].id, is_active=False),
+            image('c.png', image_type='blog', blog_id=blog.id),
+        ])
+        db.session.commit()
+        return [project.id for project in projects], blog.id
+
+
+def _urls(images):
+    return [image['file_url'] for image in images]
+
+
+def test_entity_lookup_groups_active_images(client, entity_images):
+    (first, second), blog_id = entity_images
+    response = client.get(f'/api/images/entities?project_ids={first},{second},999&blog_ids={blog_id}')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {key: _urls(images) for key, images in data['projects'].items()} == {
+        str(first): ['/a.png', '/b.png'], str(second): [], '999': []
+    }
+    assert _urls(data['blogs'][str(blog_id)]) == ['/c.png']
+
+    assert client.get('/api/images/entities').status_code == 400
+    assert client.get('/api/images/entities?project_ids=1,x').status_code == 400
+    many = ','.join(str(i) for i in range(101))
+    assert client.get(f'/api/images/entities?project_ids={many}').status_code == 400
+
+
+def test_lists_embed_images_in_one_extra_query(client, entity_images):
+    (first, second), blog_id = entity_images
+    image_queries = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM images' in statement:
+            image_queries.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        projects = {project['id']: project for project in client.get('/api/projects?embed=images').get_json()}
+        blogs = client.get('/api/blog?embed=images').get_json()['blogs']
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    assert _urls(projects[first]['images']) == ['/a.png', '/b.png']
+    assert projects[second]['images'] == []
+    assert _urls(blogs[0]['images']) == ['/c.png']
+    assert len(image_queries) == 2
+
+    assert 'images' not in client.get('/api/projects').get_json()[0]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for the verified-JWT claims cache.
+Run with: python -m pytest server/test_jwt_cache.py
+"""
+
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+import flask_jwt_extended.jwt_manager
+from flask_jwt_extended import create_access_token, decode_token
+
+from server.app import app
+from server.extensions import db, jwt
+from server.models import RevokedToken, User
+from server.utils.jwt_cache import ClaimsCache
+from server.utils.token_revocation import TokenRevocations
+
+
+def test_repeated_token_is_verified_once(client, admin_headers):
+    real_decode = flask_jwt_extended.jwt_manager._decode_jwt
+    before = jwt.claims_cache.snapshot()
+    with mock.patch.object(flask_jwt_extended.jwt_manager, '_decode_jwt', side_effect=real_decode) as decode:
+        for _ in range(10):
+            assert client.get('/api/contact', headers=admin_headers).status_code == 200
+        assert decode.call_count == 1
+
+    stats = client.get('/api/auth/cache-stats', headers=admin_headers).get_json()['jwt_claims']
+    assert stats['hits'] - before['hits'] == 10
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hit_rate'] is not None
+
+
+def test_tampered_and_revoked_tokens_are_rejected(client, admin_headers):
+    token = admin_headers['Authorization'].split()[1]
+    assert client.get('/api/contact', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+    # A different signature is a different cache key, so it is verified (and fails)
+    header, payload, signature = token.split('.')
+    forged = f"{header}.{payload}.{signature[:-4]}AAAA"
+    assert client.get('/api/contact', headers={'Authorization': f'Bearer {forged}'}).status_code == 422
+
+    with app.app_context():
+        jti = decode_token(token)['jti']
+        jwt.revocations.revoke(jti)
+    response = client.get('/api/contact', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+    assert response.get_json()['msg'] == 'Token has been revoked'
+
+
+def test_entries_expire_with_the_token():
+    cache = ClaimsCache(max_size=2)
+    now = time.time()
+    cache.put('a', {'jti': 'a', 'exp': now + 60})
+    cache.put('expired', {'jti': 'x', 'exp': now - 1})
+    assert cache.get('a') is not None
+    assert cache.get('expired') is None
+
+    cache.put('short', {'jti': 's', 'exp': now + 0.05})
+    time.sleep(0.06)
+    assert cache.get('short') is None
+
+    # Bounded: the least recently used entry is evicted
+    cache.put('b', {'jti': 'b', 'exp': now + 60})
+    cache.put('c', {'jti': 'c', 'exp': now + 60})
+    assert cache.get('a') is None and cache.get('c') is not None
+    assert cache.snapshot()['size'] == 2
+
+
+def test_expired_token_is_still_rejected(client, admin_id):
+    with app.app_context():
+        token = create_access_token(identity=admin_id, expires_delta=timedelta(seconds=-1))
+    response = client.get('/api/contact', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 401
+
+
+
+def test_logout_revokes_the_token(client, admin_headers):
+    assert client.get('/api/contact', headers=admin_headers).status_code == 200
+    assert client.post('/api/auth/logout', headers=admin_headers).status_code == 200
+    response = client.get('/api/contact', headers=admin_headers)
+    assert response.status_code == 401
+    assert response.get_json()['msg'] == 'Token has been revoked'
+
+
+def test_logout_holds_with_the_cache_off(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(jwt, 'claims_cache_enabled', False)
+    assert client.post('/api/auth/logout', headers=admin_headers).status_code == 200
+    assert client.get('/api/contact', headers=admin_headers).status_code == 401
+
+
+def test_password_change_ends_old_sessions(fresh_db, client):
+    client.post('/api/auth/register', json={'username': 'bob', 'email': 'bob@example.com', 'password': 'first'})
+    tokens = client.post('/api/auth/login', json={'email': 'bob@example.com', 'password': 'first'}).get_json()
+    old = {'Authorization': f"Bearer {tokens['access_token']}"}
+    assert client.get('/api/auth/profile', headers=old).status_code == 200
+
+    response = client.put('/api/auth/change-password', headers=old,
+                          json={'current_password': 'first', 'new_password': 'second'})
+    assert response.status_code == 200
+    new = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    assert client.get('/api/auth/profile', headers=old).status_code == 401
+    assert client.get('/api/auth/profile', headers=new).status_code == 200
+
+
+def test_logout_holds_in_other_workers(client, admin_headers, monkeypatch):
+    assert client.post('/api/auth/logout', headers=admin_headers).status_code == 200
+    # Another worker starts with nothing memoized and reads the revocation from the database
+    monkeypatch.setattr(jwt, 'revocations', TokenRevocations(check_ttl=5))
+    response = client.get('/api/contact', headers=admin_headers)
+    assert response.status_code == 401
+    assert response.get_json()['msg'] == 'Token has been revoked'
+
+
+def test_revocations_are_shared_through_the_database(admin_id):
+    now = int(time.time())
+    here, elsewhere = TokenRevocations(check_ttl=60), TokenRevocations(check_ttl=0)
+    token = {'sub': admin_id, 'jti': 'a', 'iat': now - 10}
+    with app.app_context():
+        assert not here.is_revoked(token) and not elsewhere.is_revoked(token)
+
+        here.revoke('a', expires_at=now + 60)
+        assert here.is_revoked(token) and elsewhere.is_revoked(token)
+
+        # A password change ends tokens issued before it, in every worker
+        db.session.get(User, admin_id).tokens_valid_after = datetime.utcfromtimestamp(now)
+        db.session.commit()
+        assert elsewhere.is_revoked({'sub': admin_id, 'jti': 'b', 'iat': now - 1})
+        assert not elsewhere.is_revoked({'sub': admin_id, 'jti': 'c', 'iat': now})
+        assert not elsewhere.is_revoked({'sub': 999, 'jti': 'd', 'iat': now - 1})
+
+
+def test_expired_revocations_are_dropped(admin_id):
+    revocations = TokenRevocations()
+    with app.app_context():
+        revocations.revoke('old', expires_at=time.time() - 60)
+        revocations.revoke('new', expires_at=time.time() + 60)
+        assert [row.jti for row in RevokedToken.query.all()] == ['new']
+
+
+def test_user_changes_drop_cached_claims(client, admin_id, admin_headers):
+    assert client.get('/api/contact', headers=admin_headers).status_code == 200
+    assert jwt.claims_cache.snapshot()['size'] == 1
+    with app.app_context():
+        db.session.get(User, admin_id).is_admin = False
+        db.session.commit()
+    assert jwt.claims_cache.snapshot()['size'] == 0
+    assert client.get('/api/contact', headers=admin_headers).status_code == 403
+
+
+def test_entries_live_through_the_decode_leeway():
+    cache = ClaimsCache(leeway=30)
+    cache.put('a', {'jti': 'a', 'exp': time.time() - 1})
+    assert cache.get('a') is not None
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Test script for the outbound mail queue.
+Contact submissions are queued, then delivered to a local aiosmtpd server
+standing in for Gmail. Run with: python -m pytest server/test_mail_outbox.py
+"""
+
+import asyncio
+import socket
+import time
+from datetime import datetime
+
+import pytest
+from aiosmtpd.controller import Controller
+from flask_mail import Message
+
+from server.app import app
+from server.extensions import db, mail
+from server.models import Contact, OutboundEmail
+from server.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from server.utils.contact_digest import flush_contact_digest
+from server.utils.mailer import deliver_pending
+from server.utils.smtp_pool import get_smtp_pool
+
+# Deliveries are driven explicitly below, never by the background thread
+app.extensions['mail_sender'].stop()
+
+CONTACT = {
+    "name": "Jane Visitor",
+    "email": "jane@example.com",
+    "subject": "Hello",
+    "message": "I would like to talk about a project."
+}
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+class SlowHandler(RecordingHandler):
+    """Answers every command, just slowly."""
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(0.2)
+        return await super().handle_EHLO(server, session, envelope, hostname, responses)
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        await asyncio.sleep(0.2)
+        envelope.mail_from = address
+        return '250 OK'
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        await asyncio.sleep(0.2)
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(0.2)
+        return await super().handle_DATA(server, session, envelope)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _configure_mail(port):
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False,
+        MAIL_DEFAULT_SENDER=('Portfolio', 'owner@example.com'),
+        MAIL_MAX_ATTEMPTS=2, MAIL_RETRY_BASE_SECONDS=60,
+        MAIL_BREAKER_FAILURE_THRESHOLD=5, MAIL_BREAKER_RESET_SECONDS=30
+    )
+    mail.init_app(app)
+
+
+@pytest.fixture
+def smtp_server():
+    """A local SMTP server that records what it receives, with the app configured to send to it."""
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    _configure_mail(controller.port)
+    yield handler
+    controller.stop()
+
+
+def test_contact_is_queued_and_delivered(fresh_db, client, smtp_server):
+    response = client.post('/api/contact', json=CONTACT)
+    assert response.status_code == 201
+    assert smtp_server.messages == []  # nothing is sent inside the request
+
+    with app.app_context():
+        assert OutboundEmail.query.filter_by(status='pending').count() == 2
+        assert deliver_pending() == 2
+        assert OutboundEmail.query.filter_by(status='sent').count() == 2
+
+    recipients = sorted(r for m in smtp_server.messages for r in m.rcpt_tos)
+    assert recipients == ['jane@example.com', 'owner@example.com']
+
+
+def test_batch_reuses_one_smtp_session(fresh_db, client, smtp_server):
+    for _ in range(5):
+        assert client.post('/api/contact', json=CONTACT).status_code == 201
+
+    with app.app_context():
+        assert deliver_pending() == 10
+        # Later sends reuse the pooled session instead of reconnecting
+        assert client.post('/api/contact', json=CONTACT).status_code == 201
+        assert deliver_pending() == 2
+
+    assert len(smtp_server.messages) == 12
+    assert smtp_server.sessions == 1
+
+
+def test_send_budget_covers_the_whole_exchange():
+    # Each reply comes well within the budget, but all of them together do not
+    handler = SlowHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    _configure_mail(controller.port)
+    try:
+        with app.app_context():
+            message = Message(subject='Hi', recipients=['jane@example.com'], body='Hello')
+            started = time.monotonic()
+            with pytest.raises(OSError):
+                get_smtp_pool().send(message, timeout=0.5)
+            assert time.monotonic() - started < 0.7
+    finally:
+        controller.stop()
+    assert handler.messages == []
+
+
+def test_failed_sends_back_off_then_give_up(fresh_db, client):
+    _configure_mail(_free_port())  # nothing listening here
+    assert client.post('/api/contact', json=CONTACT).status_code == 201
+
+    with app.app_context():
+        assert deliver_pending() == 0
+        emails = OutboundEmail.query.all()
+        assert all(e.status == 'pending' and e.attempts == 1 for e in emails)
+        assert all(e.next_attempt_at > datetime.utcnow() for e in emails)
+
+        # Not due yet, so nothing is retried
+        assert deliver_pending() == 0
+        assert all(e.attempts == 1 for e in OutboundEmail.query.all())
+
+        # Make them due again; the second failure reaches MAIL_MAX_ATTEMPTS
+        OutboundEmail.query.update({'next_attempt_at': datetime.utcnow()})
+        db.session.commit()
+        deliver_pending()
+        assert all(e.status == 'failed' and e.attempts == 2 for e in OutboundEmail.query.all())
+
+
+def test_digest_groups_owner_notifications(fresh_db, client):
+    app.config.update(CONTACT_DIGEST_ENABLED=True, MAIL_DEFAULT_SENDER=('Portfolio', 'owner@example.com'),
+                      MAIL_USERNAME=None, CONTACT_DIGEST_WINDOW_SECONDS=300)
+    try:
+        for _ in range(20):
+            assert client.post('/api/contact', json=CONTACT).status_code == 201
+
+        with app.app_context():
+            owner_emails = lambda: OutboundEmail.query.filter(OutboundEmail.recipients.contains('owner@')).all()
+            # The first contact after a quiet period is sent at once, the rest wait
+            assert len(owner_emails()) == 1
+            assert Contact.query.filter(Contact.owner_notified_at.is_(None)).count() == 19
+
+            # Still inside the window
+            assert flush_contact_digest() == 0
+
+            # Move the last notification back past the window
+            Contact.query.filter(Contact.owner_notified_at.isnot(None)).update({'owner_notified_at': datetime(2000, 1, 1)})
+            db.session.commit()
+            assert flush_contact_digest() == 19
+            assert flush_contact_digest() == 0
+
+            emails = owner_emails()
+            assert len(emails) == 2
+            assert emails[1].subject == '19 new contact messages'
+            assert Contact.query.filter(Contact.owner_notified_at.is_(None)).count() == 0
+            # Every visitor still gets an acknowledgement
+            assert OutboundEmail.query.count() == 22
+    finally:
+        app.config['CONTACT_DIGEST_ENABLED'] = False
+
+
+def test_circuit_breaker_states():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure(OSError('down'))
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == breaker.HALF_OPEN
+    breaker.allow()  # the single trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.snapshot()['times_opened'] == 1
+    assert breaker.snapshot()['rejected'] == 2
+
+
+def test_open_breaker_defers_reply_to_outbox(client, admin_headers):
+    _configure_mail(_free_port())  # nothing listening here
+    app.config['MAIL_BREAKER_FAILURE_THRESHOLD'] = 1
+
+    with app.app_context():
+        contact = Contact(name='Jane', email='jane@example.com', message='Hi')
+        db.session.add(contact)
+        db.session.commit()
+        contact_id = contact.id
+
+        pool = get_smtp_pool()
+        started = time.monotonic()
+        response = client.post(f'/api/contact/{contact_id}/reply', json={'message': 'Thanks!'}, headers=admin_headers)
+        assert response.status_code == 202
+        assert 'details' not in response.get_json()
+        assert pool.breaker.state == pool.breaker.OPEN
+
+        # While open, sends fail fast without touching the network
+        response = client.post(f'/api/contact/{contact_id}/reply', json={'message': 'Again'}, headers=admin_headers)
+        assert response.status_code == 202
+        assert time.monotonic() - started < 2
+        assert pool.breaker.snapshot()['rejected'] == 1
+        assert OutboundEmail.query.filter_by(status='pending').count() == 2
+
+        # ...and the outbox is left alone, so no retry attempts are used up
+        assert deliver_pending() == 0
+        assert all(e.attempts == 0 for e in OutboundEmail.query.all())
+
+        status = client.get('/api/contact/mail/status', headers=admin_headers).get_json()
+        assert status['breaker']['state'] == 'open'
+        assert status['outbox'] == {'pending': 2}
+
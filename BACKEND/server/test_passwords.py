@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for bounded password hashing and rehash-on-login.
+Run with: python -m pytest server/test_passwords.py
+"""
+
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from server.app import app
+from server.extensions import db
+from server.models import User
+from server.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def _swap_hasher(hasher=None):
+    old = app.extensions.pop('password_hasher', None)
+    if old is not None:
+        old.shutdown()
+    if hasher is not None:
+        app.extensions['password_hasher'] = hasher
+
+
+@pytest.fixture
+def use_hasher():
+    """Swap in a hasher for the test; afterwards the next request builds one from config again."""
+    yield _swap_hasher
+    _swap_hasher()
+
+
+def _add_alice(password_hash):
+    with app.app_context():
+        db.session.add(User(username='alice', email='alice@example.com', password_hash=password_hash))
+        db.session.commit()
+
+
+def _login(client, password='secret'):
+    return client.post('/api/auth/login', json={'email': 'alice@example.com', 'password': password})
+
+
+def test_login_upgrades_old_hashes(fresh_db, client, use_hasher):
+    use_hasher(PasswordHasher('scrypt', workers=2))
+    _add_alice(generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+
+    assert _login(client, 'wrong').status_code == 401
+    with app.app_context():
+        assert User.query.one().password_hash.startswith('pbkdf2:sha256:1000$')
+
+    assert _login(client).status_code == 200
+    with app.app_context():
+        upgraded = User.query.one().password_hash
+    assert upgraded.startswith('scrypt:')
+
+    # Already current: logging in again leaves the hash alone
+    assert _login(client).status_code == 200
+    with app.app_context():
+        assert User.query.one().password_hash == upgraded
+
+
+def test_register_and_change_password_use_the_hasher(fresh_db, client, use_hasher):
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=0)
+    use_hasher(hasher)
+    _add_alice('x')
+
+    response = client.post('/api/auth/register', json={
+        'username': 'bob', 'email': 'bob@example.com', 'password': 'first'
+    })
+    assert response.status_code == 201
+    response = client.post('/api/auth/login', json={'email': 'bob@example.com', 'password': 'first'})
+    assert response.status_code == 200
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    response = client.put('/api/auth/change-password', headers=headers,
+                          json={'current_password': 'first', 'new_password': 'second'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert User.query.filter_by(username='bob').one().password_hash.startswith('pbkdf2:sha256:1000$')
+    assert client.post('/api/auth/login', json={'email': 'bob@example.com', 'password': 'second'}).status_code == 200
+    assert hasher.stats['hashed'] == 2
+
+
+def test_full_hasher_returns_503(fresh_db, client, use_hasher):
+    hasher = PasswordHasher('scrypt', workers=1, max_pending=0)
+    use_hasher(hasher)
+    _add_alice(generate_password_hash('secret', 'scrypt'))
+
+    # Occupy the only slot with a hash that waits on an event
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_hash(password_hash, password):
+        started.set()
+        release.wait(5)
+        return False
+
+    worker = threading.Thread(target=hasher._run, args=(slow_hash, 'x', 'y'))
+    worker.start()
+    started.wait(5)
+    try:
+        response = _login(client)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert hasher.stats['rejected'] == 1
+    finally:
+        release.set()
+        worker.join()
+
+    assert _login(client).status_code == 200
+
+
+def test_hasher_rejects_instead_of_queueing_forever():
+    hasher = PasswordHasher('scrypt', workers=1, max_pending=0)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(timeout):
+        started.set()
+        return release.wait(timeout)
+
+    worker = threading.Thread(target=hasher._run, args=(slow, 5))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy) as busy:
+            hasher.hash('secret')
+        assert busy.value.retry_after == 1
+    finally:
+        release.set()
+        worker.join()
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+    hasher.shutdown()
+
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    hasher = PasswordHasher('scrypt', workers=1, max_pending=0, timeout=0.05)
+    release = threading.Event()
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(release.wait, 5)
+    # The abandoned hash is still running on the only worker, so nothing else may queue behind it
+    queued = []
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(queued.append, 'queued')
+    assert hasher.stats['rejected'] == 2
+
+    release.set()
+    hasher._executor.submit(lambda: None).result(5)
+    assert queued == []
+    assert [hasher._run(lambda: True) for _ in range(3)] == [True, True, True]
+    hasher.shutdown()
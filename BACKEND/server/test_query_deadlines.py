@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for per-route query deadlines.
+Run with: python -m pytest server/test_query_deadlines.py
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+from flask import g
+from sqlalchemy import exc, text
+
+from server.app import app, database_busy, database_error
+from server.extensions import db
+from server.models import Blog, User
+from server.utils.query_deadline import is_statement_timeout
+
+# Never finishes on its own
+ENDLESS_QUERY = text('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c')
+BOUNDED_QUERY = text('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000) SELECT count(*) FROM c')
+
+
+def _add_blogs(blogs):
+    with app.app_context():
+        author = User(username='author', email='author@example.com', password_hash='x')
+        db.session.add(author)
+        db.session.flush()
+        content = 'lorem ipsum dolor sit amet ' * 800
+        db.session.add_all([
+            Blog(title=f'Post {i}', slug=f'post-{i}', content=content, author_id=author.id,
+                 published=True, published_at=datetime.utcnow())
+            for i in range(blogs)
+        ])
+        db.session.commit()
+
+
+def _timeouts():
+    return app.extensions['query_deadlines'].snapshot()
+
+
+def test_route_timeout_precedence(fresh_db, monkeypatch):
+    with app.test_request_context('/api/projects'):
+        app.preprocess_request()
+        assert g.db_statement_timeout_ms == app.config['DB_STATEMENT_TIMEOUT_MS']
+
+    with app.test_request_context('/api/blog/search?q=x'):
+        app.preprocess_request()
+        assert g.db_statement_timeout_ms == 3000  # @query_deadline
+
+    monkeypatch.setitem(app.config, 'DB_ROUTE_STATEMENT_TIMEOUTS', {'blog.search_blogs': 250})
+    with app.test_request_context('/api/blog/search?q=x'):
+        app.preprocess_request()
+        assert g.db_statement_timeout_ms == 250
+
+
+def test_sqlite_statement_is_interrupted_at_the_deadline(fresh_db):
+    with app.test_request_context('/api/projects'):
+        g.db_statement_timeout_ms = 100
+        started = time.monotonic()
+        with pytest.raises(exc.DBAPIError) as error:
+            db.session.execute(ENDLESS_QUERY)
+        assert is_statement_timeout(error.value)
+        assert time.monotonic() - started < 2
+        db.session.rollback()
+
+        # The next statement gets a fresh deadline
+        assert db.session.execute(text('SELECT 1')).scalar() == 1
+        db.session.remove()
+
+
+def test_no_deadline_outside_requests(fresh_db):
+    with app.test_request_context('/api/projects'):
+        g.db_statement_timeout_ms = 1
+        db.session.execute(text('SELECT 1'))
+        db.session.remove()
+
+    # CLI commands and background threads run without a limit
+    with app.app_context():
+        assert db.session.execute(BOUNDED_QUERY).scalar() == 200000
+        db.session.remove()
+
+
+def test_slow_search_returns_504_and_is_counted(fresh_db, client, monkeypatch):
+    _add_blogs(500)
+    before = _timeouts()['by_endpoint'].get('blog.search_blogs', 0)
+
+    monkeypatch.setitem(app.config, 'DB_ROUTE_STATEMENT_TIMEOUTS', {'blog.search_blogs': 1})
+    response = client.get('/api/blog/search?q=nothing-matches-this')
+    monkeypatch.undo()
+    assert response.status_code == 504, response.get_json()
+    assert _timeouts()['by_endpoint']['blog.search_blogs'] == before + 1
+
+    # Same query within the route's normal deadline
+    response = client.get('/api/blog/search?q=nothing-matches-this')
+    assert response.status_code == 200
+    assert response.get_json()['blogs'] == []
+
+    pool = client.get('/debug/db/pool').get_json()
+    assert pool['statement_timeouts']['timeouts'] >= 1
+
+
+class QueryCanceled(Exception):
+    pgcode = '57014'
+
+
+def test_postgres_cancel_and_pool_timeout_responses():
+    error = exc.OperationalError('SELECT 1', {}, QueryCanceled('canceling statement due to statement timeout'))
+    assert is_statement_timeout(error)
+    assert not is_statement_timeout(exc.OperationalError('SELECT 1', {}, Exception('database is locked')))
+
+    with app.test_request_context('/api/blog/search?q=x'):
+        app.preprocess_request()
+        response, status = database_error(error)
+        assert status == 504
+
+        response, status = database_busy(exc.TimeoutError('QueuePool limit reached'))
+        assert status == 503
+        assert response.headers['Retry-After'] == '1'
+
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test script checking that hot list endpoints are served from indexes.
+
+Every SELECT a request issues is run through EXPLAIN QUERY PLAN. A filtered
+query that scans its table (even through an index), an unfiltered one that
+scans without an index, or a temp B-tree sort of rows that were not found
+through an index all mean an index is missing.
+Run with: python -m pytest server/test_query_plans.py
+"""
+
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from server.app import app
+from server.extensions import db
+from server.models import (
+    Blog, Contact, Education, Experience, Image, Project, ProjectStatus
+)
+
+SCAN = re.compile(r'^SCAN (\w+)( USING (COVERING )?INDEX)?')
+SEARCH = re.compile(r'^SEARCH (\w+)')
+ORDER_BY = re.compile(r'\bORDER BY\b(.*?)(?:\bLIMIT\b|\bOFFSET\b|$)', re.S)
+
+
+@pytest.fixture(autouse=True)
+def rows(admin_id):
+    """30 rows in every table the hot list endpoints read."""
+    with app.app_context():
+        now = datetime.utcnow()
+        statuses = list(ProjectStatus)
+        for i in range(30):
+            db.session.add(Blog(
+                title=f'Post {i}', slug=f'post-{i}', content='...', author_id=admin_id,
+                published=i % 2 == 0, published_at=now - timedelta(days=i)
+            ))
+            db.session.add(Project(
+                title=f'Project {i}', description='...', status=statuses[i % len(statuses)],
+                featured=i % 5 == 0, created_at=now - timedelta(days=i)
+            ))
+            db.session.add(Contact(
+                name='Visitor', email=f'v{i}@example.com', message='hi', read=i % 3 == 0,
+                created_at=now - timedelta(hours=i)
+            ))
+            db.session.add(Experience(
+                company=f'Company {i}', position='Engineer', description='...',
+                start_date=date(2000 + i, 1, 1)
+            ))
+            db.session.add(Education(
+                institution=f'School {i}', degree='BSc', field_of_study='CS',
+                start_date=date(2000 + i, 9, 1)
+            ))
+            db.session.add(Image(
+                filename=f'{i}.png', original_filename=f'{i}.png', file_path=f'{i}.png',
+                file_url=f'/{i}.png', file_size=1, mime_type='image/png',
+                image_type='project' if i % 2 else 'blog', project_id=1, blog_id=1,
+                user_id=admin_id, is_active=i % 4 != 0
+            ))
+        db.session.commit()
+
+
+def _query_plans(path, headers=None):
+    """Run one GET and return [(sql, [plan details])] for every SELECT it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().get(path, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, (path, response.get_json())
+
+    plans = []
+    with app.app_context():
+        connection = db.session.connection()
+        for sql, params in statements:
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            plans.append((sql, [row[-1] for row in rows]))
+    return plans
+
+
+def _ordered_tables(sql, tables):
+    """The tables of `tables` whose columns the statement's ORDER BY sorts on."""
+    order_by = ORDER_BY.search(sql)
+    return {table for table in tables if order_by and re.search(rf'\b{table}\.', order_by.group(1))}
+
+
+def _assert_indexed(path, headers=None, tables=()):
+    plans = _query_plans(path, headers)
+    touched = set()
+    for sql, details in plans:
+        for detail in details:
+            scan = SCAN.match(detail)
+            if scan and scan.group(1) in tables:
+                # Walking an index in order is how unfiltered lists are meant to run
+                assert scan.group(2) and not re.search(r'\bWHERE\b', sql), f'{path}: full scan\n{sql}\n{details}'
+            touched.update(table for table in tables if re.search(rf'\b{table}\b', detail))
+        if any('TEMP B-TREE FOR ORDER BY' in detail for detail in details):
+            # Sorting a handful of rows an index already found is fine; sorting a scan is not,
+            # so the table being sorted must itself be reached through an index search
+            sorted_tables = _ordered_tables(sql, tables)
+            assert sorted_tables, f'{path}: sort on a table not under test\n{sql}\n{details}'
+            searched = {match.group(1) for match in map(SEARCH.match, details) if match}
+            assert sorted_tables <= searched, f'{path}: sort without index on {sorted_tables - searched}\n{sql}\n{details}'
+    assert touched == set(tables), f'{path}: expected queries on {tables}, saw {plans}'
+
+
+def test_blog_list_uses_published_index():
+    _assert_indexed('/api/blog', tables=('blogs',))
+    _assert_indexed('/api/blog?per_page=5&page=2', tables=('blogs',))
+
+
+def test_project_lists_use_indexes():
+    _assert_indexed('/api/projects', tables=('projects',))
+    _assert_indexed('/api/projects?featured=true', tables=('projects',))
+    _assert_indexed('/api/projects?status=completed', tables=('projects',))
+
+
+def test_contact_inbox_uses_indexes(admin_headers):
+    _assert_indexed('/api/contact', admin_headers, tables=('contacts',))
+    _assert_indexed('/api/contact?read=false', admin_headers, tables=('contacts',))
+
+
+def test_timelines_use_start_date_index():
+    _assert_indexed('/api/experience', tables=('experiences',))
+    _assert_indexed('/api/education', tables=('education',))
+
+
+def test_image_lookups_use_indexes():
+    _assert_indexed('/api/images/type/project', tables=('images',))
+    _assert_indexed('/api/images/entity/project/1', tables=('images',))
+    _assert_indexed('/api/images/entity/blog/1', tables=('images',))
+    _assert_indexed('/api/images/entity/user/1', tables=('images',))
+    _assert_indexed('/api/images/entities?project_ids=1,2&blog_ids=1', tables=('images',))
+
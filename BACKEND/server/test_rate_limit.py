@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the token-bucket rate limiter on public write and auth endpoints.
+Run with: python -m pytest server/test_rate_limit.py
+"""
+
+import os
+import tempfile
+import time
+
+import pytest
+
+from server.app import app
+from server.models import Contact
+from server.utils.rate_limit import SQLiteBucketStore, parse_rate
+
+CONTACT = {
+    "name": "Jane Visitor",
+    "email": "jane@example.com",
+    "subject": "Hello",
+    "message": "I would like to talk about a project."
+}
+
+
+def _enable_limits(**limits):
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimit.db')
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_STORAGE=f'sqlite:///{path}', **limits)
+    app.extensions.pop('rate_limiter', None)
+
+
+@pytest.fixture
+def use_limits():
+    """Enable the limiter with a fresh bucket file and the given RATE_LIMIT_* settings, for one test."""
+    yield _enable_limits
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+
+def test_parse_rate():
+    assert parse_rate('5/minute') == (5, 5 / 60)
+    assert parse_rate('10/seconds') == (10, 10)
+    assert parse_rate('24/day') == (24, 24 / 86400)
+
+
+def test_contact_is_limited_per_ip(fresh_db, client, use_limits):
+    use_limits(RATE_LIMIT_CONTACT='3/minute')
+    statuses = [client.post('/api/contact', json=CONTACT).status_code for _ in range(5)]
+    assert statuses == [201, 201, 201, 429, 429]
+
+    response = client.post('/api/contact', json=CONTACT)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 20
+    with app.app_context():
+        assert Contact.query.count() == 3
+
+    # Another client address has its own bucket
+    other = client.post('/api/contact', json=CONTACT, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 201
+
+
+def test_login_and_register_have_separate_buckets(fresh_db, client, use_limits):
+    use_limits(RATE_LIMIT_LOGIN='2/minute', RATE_LIMIT_REGISTER='1/hour')
+    credentials = {"email": "nobody@example.com", "password": "wrong"}
+    assert [client.post('/api/auth/login', json=credentials).status_code for _ in range(3)] == [401, 401, 429]
+
+    user = {"username": "jane", "email": "jane@example.com", "password": "secret123"}
+    assert client.post('/api/auth/register', json=user).status_code == 201
+    assert client.post('/api/auth/register', json=dict(user, username='jane2')).status_code == 429
+
+
+def test_buckets_are_shared_between_workers():
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimit.db')
+    # Two stores on one file stand in for two gunicorn workers
+    worker_a, worker_b = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    capacity, rate = parse_rate('4/second')
+    results = [store.take('contact:1.2.3.4', capacity, rate)[0] for store in (worker_a, worker_b) * 3]
+    assert results == [True, True, True, True, False, False]
+
+    time.sleep(0.3)  # refills at 4 tokens per second
+    assert worker_b.take('contact:1.2.3.4', capacity, rate)[0]
+
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for autocommit/read-only transactions on GET requests.
+Run with: python -m pytest server/test_read_only_gets.py
+"""
+
+from datetime import datetime
+
+import pytest
+from flask import g
+from sqlalchemy import event, select, update
+
+from server.app import app
+from server.extensions import db
+from server.models import Blog, Project, User
+
+
+@pytest.fixture(autouse=True)
+def rows(fresh_db, monkeypatch):
+    monkeypatch.setitem(app.config, 'DB_GET_TRANSACTION_MODE', 'autocommit')
+    with app.app_context():
+        author = User(username='author', email='author@example.com', password_hash='x')
+        db.session.add(author)
+        db.session.flush()
+        db.session.add(Blog(title='Hello', slug='hello', content='...', author_id=author.id,
+                            published=True, published_at=datetime.utcnow(), views=0))
+        db.session.add(Project(title='Site', description='...'))
+        db.session.commit()
+
+
+def _isolation_levels(method, path, **kwargs):
+    """Isolation level each statement of one request ran under (None = a normal transaction)."""
+    levels = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        levels.append((statement.split()[0], conn.get_execution_options().get('isolation_level')))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().open(path, method=method, **kwargs)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code < 400, response.get_json()
+    return levels
+
+
+def test_get_routes_read_in_autocommit():
+    levels = _isolation_levels('GET', '/api/projects')
+    assert levels and all(level == 'AUTOCOMMIT' for _, level in levels), levels
+
+
+def test_writing_get_keeps_its_transaction():
+    levels = _isolation_levels('GET', '/api/blog/hello')
+    assert ('UPDATE', None) in levels
+    assert all(level is None for _, level in levels), levels
+    with app.app_context():
+        assert Blog.query.filter_by(slug='hello').one().views == 1
+
+
+def test_other_methods_and_off_mode_are_untouched(monkeypatch):
+    levels = _isolation_levels('POST', '/api/contact', json={
+        'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Hello there, friend!'
+    })
+    assert levels and all(level is None for _, level in levels), levels
+
+    monkeypatch.setitem(app.config, 'DB_GET_TRANSACTION_MODE', 'off')
+    levels = _isolation_levels('GET', '/api/projects')
+    assert levels and all(level is None for _, level in levels), levels
+
+
+def test_streaming_export_keeps_a_transaction(admin_headers):
+    with app.test_request_context('/api/projects'):
+        g.db_read_mode = 'autocommit'
+        streamed = select(Blog).execution_options(yield_per=100)
+        assert db.session.get_bind(clause=streamed) is db.engine
+
+    # psycopg2 can only open the export's server-side cursor inside a transaction
+    levels = _isolation_levels('GET', '/api/contact/export', headers=admin_headers)
+    assert ('SELECT', None) in levels, levels
+
+
+def test_stray_write_in_autocommit_get_still_commits():
+    with app.test_request_context('/api/projects'):
+        g.db_read_mode = 'autocommit'
+        read_bind = db.session.get_bind(clause=select(Blog))
+        assert read_bind.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+
+        db.session.execute(update(Blog).values(views=Blog.views + 5))
+        assert db.session.info['wrote']
+        # Reads after the write share its transaction so they see it
+        assert db.session.get_bind(clause=select(Blog)) is db.engine
+        assert db.session.scalar(select(Blog.views)) == 5
+        db.session.commit()
+        db.session.remove()
+
+    with app.app_context():
+        assert Blog.query.one().views == 5
+
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite connection PRAGMAs.
+Run with: python -m pytest server/test_sqlite_pragmas.py
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+
+from server.app import app
+from server.extensions import db
+from server.utils.sqlite_pragmas import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+
+def _pragma(connection, name):
+    return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+def test_file_database_gets_the_profile():
+    path = os.path.join(tempfile.mkdtemp(), 'tuned.db')
+    engine = create_engine(f'sqlite:///{path}')
+    apply_sqlite_pragmas(engine, DEFAULT_SQLITE_PRAGMAS)
+    try:
+        with engine.connect() as connection:
+            assert _pragma(connection, 'journal_mode') == 'wal'
+            assert _pragma(connection, 'synchronous') == 1  # NORMAL
+            assert _pragma(connection, 'cache_size') == -65536
+            assert _pragma(connection, 'busy_timeout') == 5000
+            assert _pragma(connection, 'temp_store') == 2  # MEMORY
+            assert _pragma(connection, 'mmap_size') == 268435456
+    finally:
+        engine.dispose()
+
+
+def test_app_engine_applies_configured_pragmas():
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert _pragma(connection, 'busy_timeout') == app.config['SQLITE_PRAGMAS']['busy_timeout']
+            assert _pragma(connection, 'temp_store') == 2
+
+
+def test_unset_pragmas_are_skipped():
+    engine = create_engine('sqlite://')
+    apply_sqlite_pragmas(engine, {'cache_size': None, 'busy_timeout': 1234})
+    with engine.connect() as connection:
+        assert _pragma(connection, 'busy_timeout') == 1234
+        assert _pragma(connection, 'cache_size') is not None
+
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the upload storage backends (local disk and S3-compatible).
+The S3 backend runs against moto's in-process S3 stand-in, so no network or
+MinIO instance is needed. Run with: python -m pytest server/test_storage.py
+"""
+
+import io
+import os
+import tempfile
+
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+from PIL import Image
+
+from server.app import app
+from server.utils.storage import LocalStorage, S3Storage, StorageError
+
+BUCKET = 'portfolio-test'
+
+
+def _exercise_backend(storage):
+    payload = b'\x89PNG\r\n\x1a\n' + os.urandom(200 * 1024)
+
+    written = storage.put('hero_test.png', io.BytesIO(payload), 'image/png')
+    assert written == len(payload)
+    assert storage.exists('hero_test.png')
+    assert storage.size('hero_test.png') == len(payload)
+
+    # Streaming get returns the same bytes in several chunks
+    chunks = list(storage.get('hero_test.png'))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == payload
+
+    assert storage.delete('hero_test.png') is True
+    assert storage.delete('hero_test.png') is False
+    assert storage.size('hero_test.png') is None
+
+
+def test_local_storage():
+    with tempfile.TemporaryDirectory() as root, app.test_request_context():
+        storage = LocalStorage(root)
+        _exercise_backend(storage)
+        assert storage.url('a.png') == '/static/uploads/a.png'
+        assert storage.url('a.png', external=True) == 'http://localhost/static/uploads/a.png'
+        assert storage.presigned_upload('a.png', 'image/png') is None
+
+        # Keys outside the storage root are rejected
+        with pytest.raises(StorageError):
+            storage.put('../escape.png', io.BytesIO(b'x'))
+
+
+@mock_aws
+def test_s3_storage():
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+    storage = S3Storage(BUCKET, region='us-east-1', access_key='test', secret_key='test',
+                        public_url='https://cdn.example.com', prefix='uploads')
+
+    with app.test_request_context():
+        _exercise_backend(storage)
+        assert storage.url('a.png') == 'https://cdn.example.com/uploads/a.png'
+
+
+@mock_aws
+def test_s3_presigned_upload():
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+    storage = S3Storage(BUCKET, region='us-east-1', access_key='test', secret_key='test')
+
+    upload = storage.presigned_upload('direct.png', 'image/png', expires_in=60)
+    assert upload['method'] == 'PUT'
+
+    # The browser PUTs straight to the bucket; Flask never sees the bytes
+    response = requests.put(upload['url'], data=b'direct-bytes', headers=upload['headers'])
+    assert response.status_code == 200
+    assert storage.size('direct.png') == len(b'direct-bytes')
+
+
+
+def test_upload_records_an_absolute_url(admin_headers, client, monkeypatch):
+    png = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(png, 'PNG')
+    png.seek(0)
+    with tempfile.TemporaryDirectory() as root:
+        monkeypatch.setitem(app.extensions, 'storage', LocalStorage(root))
+        response = client.post('/api/images/upload', headers=admin_headers,
+                               data={'image': (png, 'hero.png'), 'image_type': 'hero'})
+        assert response.status_code == 201, response.get_json()
+        assert response.get_json()['file_url'].startswith('http://localhost/static/uploads/')
+
+        response = client.post('/api/images/presign', headers=admin_headers,
+                               json={'filename': 'a.png', 'image_type': 'banner'})
+        assert response.status_code == 400
+        assert 'Invalid image type' in response.get_json()['error']
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for case-insensitive email login and its expression index.
+Run with: python -m pytest server/test_user_email.py
+"""
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from server.app import app
+from server.extensions import db
+from server.models import User
+
+
+@pytest.fixture(autouse=True)
+def users(fresh_db):
+    with app.app_context():
+        # Pad the table so the planner has a reason to prefer the index
+        db.session.add_all([
+            User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(200)
+        ])
+        db.session.add(User(username='alice', email='alice@example.com',
+                            password_hash=generate_password_hash('secret', 'pbkdf2:sha256:1000')))
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+
+
+def _login(client, email):
+    return client.post('/api/auth/login', json={'email': email, 'password': 'secret'})
+
+
+def test_login_ignores_email_case(client):
+    assert _login(client, 'alice@example.com').status_code == 200
+    assert _login(client, '  Alice@Example.COM ').status_code == 200
+    assert _login(client, 'bob@example.com').status_code == 401
+
+
+def test_login_lookup_uses_the_lower_email_index(client):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM users' in statement:
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        assert _login(client, 'ALICE@example.com').status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    lookups = [(sql, params) for sql, params in statements if 'lower(users.email)' in sql]
+    assert lookups, statements
+    with app.app_context():
+        for sql, params in lookups:
+            plan = ' | '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {sql}', params
+            ))
+            assert 'USING INDEX ix_users_email_lower' in plan, plan
+            assert 'SCAN users' not in plan, plan
+
+
+def test_register_and_profile_store_normalized_email(client, auth_headers):
+
+    response = client.post('/api/auth/register', json={
+        'username': 'bob', 'email': ' Bob@Example.com', 'password': 'pw'
+    })
+    assert response.status_code == 201
+    response = client.post('/api/auth/register', json={
+        'username': 'bob2', 'email': 'BOB@example.com', 'password': 'pw'
+    })
+    assert response.status_code == 400
+
+    with app.app_context():
+        bob = User.query.filter_by(username='bob').one()
+        assert bob.email == 'bob@example.com'
+        headers = auth_headers(bob.id)
+
+    response = client.put('/api/auth/profile', headers=headers,
+                          json={'email': 'ALICE@example.com', 'current_password': 'pw'})
+    assert response.status_code == 400
+    response = client.put('/api/auth/profile', headers=headers,
+                          json={'email': 'Robert@Example.com ', 'current_password': 'pw'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert User.query.filter_by(username='bob').one().email == 'robert@example.com'
+
+
+def test_email_change_takes_the_current_password(client, auth_headers):
+    with app.app_context():
+        headers = auth_headers(User.query.filter_by(username='alice').one().id)
+
+    for body in ({'email': 'mallory@example.com'}, {'email': 'mallory@example.com', 'current_password': 'wrong'}):
+        response = client.put('/api/auth/profile', headers=headers, json=body)
+        assert response.status_code == 400
+    # Other fields, and re-sending the same email, don't need it
+    response = client.put('/api/auth/profile', headers=headers, json={'email': 'Alice@example.com', 'bio': 'Hi'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert User.query.filter_by(username='alice').one().email == 'alice@example.com'
+
+    response = client.put('/api/auth/profile', headers=headers,
+                          json={'email': 'alice@example.org', 'current_password': 'secret'})
+    assert response.status_code == 200
+    assert _login(client, 'alice@example.org').status_code == 200
+
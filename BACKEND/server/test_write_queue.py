@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-writer queue with group commits.
+Run with: python -m pytest server/test_write_queue.py
+"""
+
+import threading
+
+import pytest
+
+from server.app import app
+from server.extensions import db
+from server.models import Blog, Contact, User
+from server.routes import contact_route
+from server.routes.blog_route import _count_blog_view
+from server.utils.write_queue import WriteQueue, run_write, submit_write
+
+
+@pytest.fixture(autouse=True)
+def blog(fresh_db):
+    with app.app_context():
+        author = User(username='author', email='author@example.com', password_hash='x')
+        db.session.add(author)
+        db.session.flush()
+        db.session.add(Blog(title='Hello', slug='hello', content='...', author_id=author.id, published=True, views=0))
+        db.session.commit()
+
+
+def _stop_writer():
+    writer = app.extensions.pop('write_queue', None)
+    if writer is not None:
+        writer.stop()
+
+
+@pytest.fixture
+def use_writer():
+    """Returns a function that installs a WriteQueue; it is stopped after the test if still running."""
+    def install(max_wait=0.0):
+        writer = WriteQueue(app, max_batch=50, max_wait=max_wait)
+        app.extensions['write_queue'] = writer
+        return writer
+    yield install
+    _stop_writer()
+
+
+def _add_contact(name):
+    contact = Contact(name=name, email=f'{name}@example.com', message='hello there')
+    db.session.add(contact)
+    db.session.flush()
+    return contact.id
+
+
+def _fail():
+    db.session.add(Contact(name='bad', email='bad@example.com', message='never stored'))
+    db.session.flush()
+    raise ValueError('boom')
+
+
+def test_concurrent_views_are_group_committed(use_writer):
+    # The test database is one shared in-memory connection, so the concurrent
+    # writers here submit directly rather than through overlapping requests.
+    # A generous batching window so concurrent writers share commits
+    writer = use_writer(max_wait=0.05)
+    barrier = threading.Barrier(20)
+    futures = []
+
+    def view():
+        barrier.wait()
+        with app.app_context():
+            futures.append(submit_write(_count_blog_view, 1))
+
+    threads = [threading.Thread(target=view) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(5)
+    _stop_writer()
+
+    with app.app_context():
+        assert Blog.query.filter_by(slug='hello').one().views == 20
+    assert writer.stats['jobs'] == 20
+    assert writer.stats['batches'] < 20
+
+
+def test_blog_view_counter_route(client):
+    assert client.get('/api/blog/hello').get_json()['views'] == 1
+    assert client.get('/api/blog/hello').get_json()['views'] == 2
+    with app.app_context():
+        assert Blog.query.filter_by(slug='hello').one().views == 2
+
+
+def test_failing_job_does_not_sink_its_batch(use_writer):
+    writer = use_writer(max_wait=0.05)
+    with app.app_context():
+        futures = [submit_write(_add_contact, 'first'), submit_write(_fail), submit_write(_add_contact, 'second')]
+        first_id = futures[0].result(5)
+        assert futures[2].result(5) > first_id
+        with pytest.raises(ValueError, match='boom'):
+            futures[1].result(5)
+    _stop_writer()
+
+    with app.app_context():
+        assert sorted(c.name for c in Contact.query.all()) == ['first', 'second']
+    assert writer.stats['failed'] == 1
+
+
+def test_contact_form_and_inline_fallback(client, use_writer):
+    payload = {'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Hello from the queue!'}
+    use_writer()
+    assert client.post('/api/contact', json=payload).status_code == 201
+    _stop_writer()
+
+    # Without a writer the same calls commit in the request's own session
+    assert client.post('/api/contact', json=payload).status_code == 201
+    with app.app_context():
+        assert Contact.query.count() == 2
+        assert run_write(_add_contact, 'inline') is not None
+        assert Contact.query.count() == 3
+
+
+def test_stop_applies_queued_writes(use_writer):
+    writer = use_writer(max_wait=0.05)
+    with app.app_context():
+        futures = [submit_write(_add_contact, f'c{i}') for i in range(5)]
+    _stop_writer()
+    assert all(future.done() and future.exception() is None for future in futures)
+    with app.app_context():
+        assert Contact.query.count() == 5
+    assert writer.stats['batches'] == 1
+
+
+
+CONTACT = {'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Hello from the queue!'}
+
+
+def test_timed_out_write_that_never_started_is_cancelled(client, use_writer, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_QUEUE_TIMEOUT', 0.1)
+    use_writer()
+    started, release = threading.Event(), threading.Event()
+
+    def busy_job():
+        started.set()
+        release.wait(5)
+
+    with app.app_context():
+        busy = submit_write(busy_job)
+    started.wait(5)
+
+    # Queued behind the busy job, so it is cancelled and nothing is saved: safe to retry
+    response = client.post('/api/contact', json=CONTACT)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    release.set()
+    busy.result(5)
+    _stop_writer()
+    with app.app_context():
+        assert Contact.query.count() == 0
+
+
+def test_timed_out_write_that_started_reports_it_may_still_apply(client, use_writer, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_QUEUE_TIMEOUT', 0.1)
+    use_writer()
+    release = threading.Event()
+    save_contact = contact_route._save_contact
+
+    def slow_save_contact(*args):
+        release.wait(5)
+        return save_contact(*args)
+
+    monkeypatch.setattr(contact_route, '_save_contact', slow_save_contact)
+    response = client.post('/api/contact', json=CONTACT)
+    assert response.status_code == 202
+    assert response.get_json()['pending'] is True
+
+    # It does commit afterwards, so the client must not resend it
+    release.set()
+    _stop_writer()
+    with app.app_context():
+        assert Contact.query.count() == 1
+
+
+def test_idempotent_retry_waits_for_a_write_that_may_still_apply(client, use_writer, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_QUEUE_TIMEOUT', 0.1)
+    use_writer()
+    release = threading.Event()
+    save_contact = contact_route._save_contact
+
+    def slow_save_contact(*args):
+        release.wait(5)
+        return save_contact(*args)
+
+    monkeypatch.setattr(contact_route, '_save_contact', slow_save_contact)
+    headers = {'Idempotency-Key': 'contact-1'}
+    assert client.post('/api/contact', json=CONTACT, headers=headers).status_code == 202
+    release.set()
+    _stop_writer()
+
+    # The key stays claimed, so the retry does not write a second contact
+    assert client.post('/api/contact', json=CONTACT, headers=headers).status_code == 409
+    with app.app_context():
+        assert Contact.query.count() == 1
+
+
+def test_idempotent_retry_runs_again_after_a_cancelled_write(client, use_writer, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_QUEUE_TIMEOUT', 0.1)
+    use_writer()
+    started, release = threading.Event(), threading.Event()
+
+    def busy_job():
+        started.set()
+        release.wait(5)
+
+    with app.app_context():
+        busy = submit_write(busy_job)
+    started.wait(5)
+    headers = {'Idempotency-Key': 'contact-1'}
+    assert client.post('/api/contact', json=CONTACT, headers=headers).status_code == 503
+
+    release.set()
+    busy.result(5)
+    assert client.post('/api/contact', json=CONTACT, headers=headers).status_code == 201
+    _stop_writer()
+    with app.app_context():
+        assert Contact.query.count() == 1
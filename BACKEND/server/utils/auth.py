@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..extensions import db, jwt
+from ..models import User
+
+# What route guards need to know about the caller; cheap to cache and safe to share
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'email', 'is_admin'])
+
+
+class UserCache:
+    """Small thread-safe LRU of CurrentUser snapshots with a per-entry TTL."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, user_id, snapshot, ttl, max_size):
+        with self._lock:
+            self._entries[user_id] = (snapshot, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def _identity_key(identity):
+    try:
+        return int(identity)
+    except (TypeError, ValueError):
+        return identity
+
+
+def get_current_user():
+    """
+    Resolve the JWT caller to a CurrentUser (id, username, email, is_admin), or None.
+
+    Memoized for the request in `g`, and across requests in a short-TTL LRU
+    (USER_CACHE_TTL_SECONDS) that is dropped whenever the user row changes.
+    Use load_current_user() when the full User row is needed.
+    """
+    identity = get_jwt_identity()
+    if not identity:
+        return None
+    user_id = _identity_key(identity)
+
+    memo = g.setdefault('current_users', {})
+    if user_id in memo:
+        return memo[user_id]
+
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            snapshot = CurrentUser(user.id, user.username, user.email, bool(user.is_admin))
+            config = current_app.config
+            user_cache.put(
+                user_id, snapshot,
+                ttl=config.get('USER_CACHE_TTL_SECONDS', 30),
+                max_size=config.get('USER_CACHE_SIZE', 256)
+            )
+    memo[user_id] = snapshot
+    return snapshot
+
+
+def load_current_user():
+    """Return the caller's User row (for profile reads and writes), or None."""
+    identity = get_jwt_identity()
+    if not identity:
+        return None
+    return db.session.get(User, _identity_key(identity))
+
+
+def _forget_user(user_id):
+    user_cache.invalidate(user_id)
+    # Their tokens are verified afresh too, in case an admin or identity change should affect them
+    jwt.claims_cache.forget_identity(user_id)
+    jwt.revocations.forget_user(user_id)
+    if has_app_context():
+        g.pop('current_users', None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, user):
+    _forget_user(user.id)
+    # Drop it again at commit, in case another request re-cached the old row in between
+    session = Session.object_session(user)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(user.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _user_changes_committed(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        _forget_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _user_changes_rolled_back(session):
+    session.info.pop('changed_user_ids', None)
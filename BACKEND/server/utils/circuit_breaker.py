@@ -0,0 +1,108 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised (or returned) instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for calls to an external service.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    callers are refused straight away for `reset_timeout` seconds. It then
+    lets `half_open_max_calls` trial calls through: one success closes it
+    again, a failure re-opens it for another `reset_timeout`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0, 'successes': 0, 'failures': 0, 'rejected': 0,
+            'times_opened': 0, 'last_failure': None, 'last_latency_ms': None,
+        }
+
+    def _refresh(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a trial call through (0 when not open)."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+
+    def allow(self):
+        """Reserve a call. Raises CircuitOpenError when the call must not be made."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == self.OPEN or (
+                self._state == self.HALF_OPEN and self._half_open_calls >= self.half_open_max_calls
+            ):
+                self.stats['rejected'] += 1
+                retry_after = self.reset_timeout - (now - self._opened_at)
+                raise CircuitOpenError(self.name, max(retry_after, 0))
+            if self._state == self.HALF_OPEN:
+                self._half_open_calls += 1
+            self.stats['calls'] += 1
+
+    def record_success(self, latency=None):
+        with self._lock:
+            self.stats['successes'] += 1
+            if latency is not None:
+                self.stats['last_latency_ms'] = round(latency * 1000, 1)
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self, error=None, latency=None):
+        with self._lock:
+            self.stats['failures'] += 1
+            self.stats['last_failure'] = str(error)[:200] if error is not None else None
+            if latency is not None:
+                self.stats['last_latency_ms'] = round(latency * 1000, 1)
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.stats['times_opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self):
+        """Current state and counters, for health/metrics endpoints."""
+        state = self.state
+        with self._lock:
+            return dict(
+                self.stats,
+                name=self.name,
+                state=state,
+                consecutive_failures=self._failures,
+                retry_after=round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+                if state == self.OPEN else 0,
+            )
@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from ..extensions import db
+from ..models import Contact, ContactArchive, ContactMonthlyRollup
+
+ARCHIVED_COLUMNS = ('id', 'name', 'email', 'subject', 'message', 'read', 'created_at')
+
+
+def month_key(column):
+    """SQL expression formatting a datetime column as 'YYYY-MM' on the current database."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM')
+    if dialect == 'sqlite':
+        return db.func.strftime('%Y-%m', column)
+    return db.func.date_format(column, '%Y-%m')
+
+
+def _add_to_rollups(connection, months):
+    """Increment monthly rollups by {month: (total, read_count)} with one upsert per month."""
+    table = ContactMonthlyRollup.__table__
+    dialect = connection.dialect.name
+    for month, (total, read_count) in months.items():
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = insert(table).values(month=month, total=total, read_count=read_count)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.month],
+                set_={
+                    'total': table.c.total + stmt.excluded.total,
+                    'read_count': table.c.read_count + stmt.excluded.read_count,
+                }
+            )
+            connection.execute(stmt)
+            continue
+
+        result = connection.execute(
+            table.update().where(table.c.month == month)
+            .values(total=table.c.total + total, read_count=table.c.read_count + read_count)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(month=month, total=total, read_count=read_count))
+
+
+def archive_old_contacts(retention_days=None, batch_size=None):
+    """
+    Move contacts older than the retention window into contacts_archive.
+
+    Works in batches, each in its own transaction: copy the rows, add them to
+    the monthly rollups, then delete them from the hot table. Contacts still
+    waiting for an owner digest are left alone. Returns the number archived.
+    """
+    config = current_app.config
+    retention_days = retention_days if retention_days is not None else config.get('CONTACT_RETENTION_DAYS', 365)
+    batch_size = batch_size or config.get('CONTACT_ARCHIVE_BATCH_SIZE', 1000)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    archived = 0
+    while True:
+        rows = db.session.query(*[getattr(Contact, column) for column in ARCHIVED_COLUMNS]).filter(
+            Contact.created_at < cutoff,
+            Contact.owner_notified_at.isnot(None)
+        ).order_by(Contact.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        now = datetime.utcnow()
+        records = []
+        for row in rows:
+            record = dict(zip(ARCHIVED_COLUMNS, row), archived_at=now)
+            record['original_id'] = record.pop('id')
+            records.append(record)
+        months = Counter()
+        read_months = Counter()
+        for record in records:
+            month = record['created_at'].strftime('%Y-%m')
+            months[month] += 1
+            read_months[month] += 1 if record['read'] else 0
+
+        try:
+            db.session.execute(db.insert(ContactArchive), records)
+            _add_to_rollups(db.session.connection(), {m: (months[m], read_months[m]) for m in months})
+            db.session.execute(
+                db.delete(Contact)
+                .where(Contact.id.in_([record['original_id'] for record in records]))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        archived += len(records)
+
+    return archived
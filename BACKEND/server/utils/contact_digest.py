@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from ..extensions import db
+from ..models import Contact
+from .mailer import get_owner_email, queue_email
+
+# Longest message excerpt included for each contact in a digest
+DIGEST_EXCERPT_CHARS = 500
+
+
+def _last_owner_notification():
+    return db.session.query(db.func.max(Contact.owner_notified_at)).scalar()
+
+
+def _has_pending_contacts():
+    return db.session.query(Contact.id).filter(Contact.owner_notified_at.is_(None)).first() is not None
+
+
+def _queue_single_notification(contact):
+    subject_line = f"New contact: {contact.subject or 'No subject'} from {contact.name}"
+    body = (
+        f"You have received a new contact message from your portfolio site.\n\n"
+        f"Name: {contact.name}\n"
+        f"Email: {contact.email}\n"
+        f"Subject: {contact.subject or 'N/A'}\n\n"
+        f"Message:\n{contact.message}\n\n"
+        f"Submitted via API /contact"
+    )
+    queue_email(subject_line, [get_owner_email()], body, reply_to=contact.email)
+
+
+def notify_owner(contact):
+    """
+    Queue the owner notification for a new contact, or leave it for the next digest.
+
+    Without digest mode every contact gets its own email. In digest mode the
+    first contact after a quiet period is still sent straight away; the rest
+    wait for flush_contact_digest.
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+
+    if config.get('CONTACT_DIGEST_ENABLED'):
+        quiet_period = timedelta(seconds=config.get('CONTACT_DIGEST_QUIET_SECONDS', 300))
+        # The new contact may already be in the session; keep it out of the pending check
+        with db.session.no_autoflush:
+            last_notified = _last_owner_notification()
+            if (last_notified is not None and now - last_notified < quiet_period) or _has_pending_contacts():
+                return False
+
+    _queue_single_notification(contact)
+    contact.owner_notified_at = now
+    return True
+
+
+def flush_contact_digest(force=False):
+    """
+    Send one digest email for every contact still waiting on an owner notification.
+
+    Does nothing until CONTACT_DIGEST_WINDOW_SECONDS have passed since the last
+    notification (unless force is set). Contacts are claimed with a single
+    conditional UPDATE, so concurrent workers never put the same contact in two
+    digests. Returns the number of contacts included.
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+
+    if not force:
+        window = timedelta(seconds=config.get('CONTACT_DIGEST_WINDOW_SECONDS', 300))
+        last_notified = _last_owner_notification()
+        if last_notified is not None and now - last_notified < window:
+            return 0
+
+    claimed = db.session.execute(
+        db.update(Contact)
+        .where(Contact.owner_notified_at.is_(None))
+        .values(owner_notified_at=now)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return 0
+
+    max_items = config.get('CONTACT_DIGEST_MAX_ITEMS', 50)
+    contacts = Contact.query.filter(Contact.owner_notified_at == now) \
+        .order_by(Contact.created_at, Contact.id).limit(max_items).all()
+
+    sections = []
+    for contact in contacts:
+        message = contact.message
+        if len(message) > DIGEST_EXCERPT_CHARS:
+            message = message[:DIGEST_EXCERPT_CHARS].rstrip() + '...'
+        sections.append(
+            f"From: {contact.name} <{contact.email}>\n"
+            f"Subject: {contact.subject or 'N/A'}\n"
+            f"Received: {contact.created_at.strftime('%Y-%m-%d %H:%M UTC') if contact.created_at else 'N/A'}\n\n"
+            f"{message}"
+        )
+    if claimed > len(contacts):
+        sections.append(f"...and {claimed - len(contacts)} more. See the admin dashboard for the full list.")
+
+    body = (
+        f"You have received {claimed} new contact message{'s' if claimed != 1 else ''} "
+        f"from your portfolio site.\n\n" +
+        "\n\n----------------------------------------\n\n".join(sections)
+    )
+    queue_email(f"{claimed} new contact message{'s' if claimed != 1 else ''}", [get_owner_email()], body)
+    db.session.commit()
+    return claimed
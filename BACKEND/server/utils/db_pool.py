@@ -0,0 +1,129 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Checkouts that wait longer than this count as slow (the pool is too small or connections are held too long)
+SLOW_CHECKOUT_SECONDS = 0.1
+
+
+class PoolMetrics:
+    """Checkout counts and wait times for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.disconnects = 0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if waited >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'slow_checkouts': self.slow_checkouts,
+                'disconnects': self.disconnects,
+                'wait_ms_avg': round(self.wait_total / attempts * 1000, 3) if attempts else None,
+                'wait_ms_max': round(self.wait_max * 1000, 3),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection (including opening one)."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting across it
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def snapshot(self):
+        capacity = self.size() + max(self._max_overflow, 0)
+        checked_out = self.checkedout()
+        return dict(
+            self.metrics.snapshot(),
+            pool_size=self.size(),
+            max_overflow=self._max_overflow,
+            timeout=self._timeout,
+            checked_out=checked_out,
+            checked_in=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            utilization=round(checked_out / capacity, 3) if capacity else None,
+        )
+
+
+def pool_engine_options(uri, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping=False):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the given database URI.
+
+    In-memory SQLite keeps its single shared connection; everything else gets
+    a MeteredQueuePool. Stale connections are replaced by recycling them
+    after `pool_recycle` seconds rather than pinging on every checkout.
+    """
+    options = {'pool_pre_ping': pre_ping}
+    if uri.split('?', 1)[0] in ('sqlite://', 'sqlite:///:memory:'):
+        return options
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+    )
+    return options
+
+
+def pool_snapshot(engine):
+    pool = engine.pool
+    if isinstance(pool, MeteredQueuePool):
+        return dict(pool.snapshot(), pool_class=type(pool).__name__)
+    return {'pool_class': type(pool).__name__, 'status': pool.status()}
+
+
+def init_db_pool(app, db):
+    """Log dropped database connections; SQLAlchemy then replaces every pooled connection."""
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for bind, engine in engines.items():
+        def _on_error(context, bind=bind, engine=engine):
+            if not context.is_disconnect:
+                return
+            metrics = getattr(engine.pool, 'metrics', None)
+            if metrics is not None:
+                metrics.disconnects += 1
+            app.logger.warning(
+                f"Lost connection to database {bind or 'default'}; discarding pooled connections: "
+                f"{str(context.original_exception)}"
+            )
+
+        event.listen(engine, 'handle_error', _on_error)
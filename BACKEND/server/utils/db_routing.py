@@ -0,0 +1,247 @@
+import hashlib
+import threading
+import time
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from .rate_limit import client_address
+
+REPLICA_BIND = 'replica'
+PRIMARY_COOKIE = 'db_primary_until'
+
+# How far behind the primary the replica is, in seconds (0 when it has replayed everything it received)
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+# Engine variants that run each statement in autocommit mode, sharing the original engine's pool
+_autocommit_engines = {}
+_autocommit_lock = threading.Lock()
+
+
+def autocommit_engine(engine):
+    variant = _autocommit_engines.get(engine)
+    if variant is None:
+        with _autocommit_lock:
+            variant = _autocommit_engines.get(engine)
+            if variant is None:
+                variant = engine.execution_options(isolation_level='AUTOCOMMIT')
+                _autocommit_engines[engine] = variant
+    return variant
+
+
+class RoutingSession(Session):
+    """
+    Session that routes plain SELECTs according to the request.
+
+    A request opts in by setting `g.db_use_replica` (done for GET/HEAD by
+    init_replica_routing) to read from the replica, and `g.db_read_mode`
+    (done by init_read_only_requests) to read without a transaction.
+    Flushes and INSERT/UPDATE/DELETE always go to the primary in a normal
+    transaction, and once a session has written, its later reads follow so
+    they see that write. Streaming reads (yield_per / stream_results) also
+    keep a transaction, since server-side cursors need one.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+            self.info['wrote'] = True
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+        plain_read = not self.info.get('wrote') and getattr(clause, 'is_select', False) and has_app_context()
+        if plain_read and g.get('db_use_replica', False):
+            engine = self._db.engines[REPLICA_BIND]
+        else:
+            engine = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if plain_read and g.get('db_read_mode') == 'autocommit' and not _streams_results(clause):
+            return autocommit_engine(engine)
+        return engine
+
+
+def _streams_results(clause):
+    # Server-side cursors (psycopg2's named cursors) only exist inside a transaction
+    options = clause.get_execution_options()
+    return bool(options.get('stream_results') or options.get('yield_per'))
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _begin_read_only(session, transaction, connection):
+    # Must be the first statement of the transaction; SQLite has no equivalent and needs none
+    if (has_app_context() and g.get('db_read_mode') == 'read_only'
+            and connection.dialect.name in ('postgresql', 'mysql')):
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
+
+class ReplicaMonitor:
+    """Tracks whether the replica is reachable and caught up, re-checking at most every `check_interval` seconds."""
+
+    def __init__(self, engine, max_lag=2, check_interval=5):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy = True
+        self._next_check = 0
+        self._lock = threading.Lock()
+        self._recent_writers = {}  # client key -> read-from-primary-until timestamp
+        self.stats = {'replica_reads': 0, 'primary_reads': 0, 'checks': 0, 'failures': 0, 'lag': None}
+
+    def healthy(self):
+        if time.monotonic() < self._next_check:
+            return self._healthy
+        with self._lock:
+            if time.monotonic() >= self._next_check:
+                self._healthy = self._check()
+                self._next_check = time.monotonic() + self.check_interval
+        return self._healthy
+
+    def _check(self):
+        self.stats['checks'] += 1
+        try:
+            with self.engine.connect() as connection:
+                lag = 0
+                if connection.dialect.name == 'postgresql':
+                    lag = float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+                else:
+                    connection.execute(text('SELECT 1'))
+            self.stats['lag'] = lag
+            if lag > self.max_lag:
+                current_app.logger.warning(f"Read replica is {lag:.1f}s behind, reading from the primary")
+                return False
+            return True
+        except Exception as e:
+            self.stats['failures'] += 1
+            current_app.logger.warning(f"Read replica unavailable, reading from the primary: {str(e)}")
+            return False
+
+    def mark_down(self):
+        """Stop using the replica until the next health check."""
+        self._healthy = False
+        self._next_check = time.monotonic() + self.check_interval
+
+    def wrote(self, key, until):
+        with self._lock:
+            self._recent_writers[key] = until
+            if len(self._recent_writers) > 10000:
+                now = time.time()
+                self._recent_writers = {k: t for k, t in self._recent_writers.items() if t > now}
+
+    def recently_wrote(self, key):
+        return self._recent_writers.get(key, 0) > time.time()
+
+    def snapshot(self):
+        return dict(self.stats, healthy=self._healthy)
+
+
+def _client_key():
+    """Who made the request: their bearer token if any, otherwise their address."""
+    auth = request.headers.get('Authorization')
+    if auth:
+        return hashlib.sha256(auth.encode()).hexdigest()
+    return client_address()
+
+
+def get_replica_monitor():
+    """The replica monitor for the current app, or None when no replica bind is configured."""
+    monitor = current_app.extensions.get('db_replica')
+    if monitor is None:
+        from ..extensions import db
+        engine = db.engines.get(REPLICA_BIND)
+        if engine is None:
+            return None
+        config = current_app.config
+        monitor = ReplicaMonitor(
+            engine,
+            max_lag=config.get('REPLICA_MAX_LAG_SECONDS', 2),
+            check_interval=config.get('REPLICA_HEALTH_CHECK_SECONDS', 5)
+        )
+
+        @event.listens_for(engine, 'handle_error')
+        def _replica_error(context):
+            if context.is_disconnect or context.connection is None:
+                monitor.mark_down()
+
+        current_app.extensions['db_replica'] = monitor
+    return monitor
+
+
+def init_replica_routing(app):
+    """
+    Route read-only requests to the DATABASE_REPLICA_URL bind.
+
+    GET/HEAD requests read from the replica unless the same client wrote
+    within REPLICA_READ_YOUR_WRITES_SECONDS (tracked per worker and in a
+    cookie, so other workers honour it too), or the replica is down or
+    lagging. Without a replica bind this does nothing.
+    """
+
+    @app.before_request
+    def _choose_database():
+        if request.method not in ('GET', 'HEAD'):
+            return
+        monitor = get_replica_monitor()
+        if monitor is None:
+            return
+        cookie = request.cookies.get(PRIMARY_COOKIE, '')
+        wrote_recently = (cookie.isdigit() and int(cookie) > time.time()) or monitor.recently_wrote(_client_key())
+        if wrote_recently or not monitor.healthy():
+            monitor.stats['primary_reads'] += 1
+            return
+        monitor.stats['replica_reads'] += 1
+        g.db_use_replica = True
+
+    @app.after_request
+    def _remember_write(response):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') or response.status_code >= 400:
+            return response
+        monitor = get_replica_monitor()
+        if monitor is None:
+            return response
+        window = app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+        until = time.time() + window
+        monitor.wrote(_client_key(), until)
+        response.set_cookie(PRIMARY_COOKIE, str(int(until) + 1), max_age=window + 1, httponly=True, samesite='Lax')
+        return response
+
+
+def read_write_transaction(view):
+    """
+    Mark a GET route that writes, so it keeps a normal read/write transaction.
+
+    Without it, GET routes read in autocommit or read-only mode
+    (DB_GET_TRANSACTION_MODE).
+    """
+    view.read_write_transaction = True
+    return view
+
+
+def init_read_only_requests(app):
+    """
+    Run GET/HEAD requests in DB_GET_TRANSACTION_MODE:
+
+    'autocommit' reads without BEGIN/COMMIT (a stray write still gets its own
+    transaction, with a warning), 'read_only' wraps reads in SET TRANSACTION
+    READ ONLY (a stray write fails), and 'off' leaves transactions alone.
+    Routes decorated with @read_write_transaction are left alone too.
+    """
+
+    @app.before_request
+    def _choose_read_mode():
+        mode = app.config.get('DB_GET_TRANSACTION_MODE', 'autocommit')
+        if mode == 'off' or request.method not in ('GET', 'HEAD'):
+            return
+        view = app.view_functions.get(request.endpoint)
+        if view is None or getattr(view, 'read_write_transaction', False):
+            return
+        g.db_read_mode = mode
+
+    @app.teardown_request
+    def _warn_on_write(error=None):
+        if g.get('db_read_mode') == 'autocommit':
+            from ..extensions import db
+            if db.session.registry.has() and db.session.info.get('wrote'):
+                app.logger.warning(f"GET {request.endpoint} wrote to the database; mark it @read_write_transaction")
@@ -0,0 +1,135 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models import IdempotencyKey
+from .write_queue import WriteQueueTimeout
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _request_scope():
+    """Keys are per user for authenticated requests, per client address otherwise."""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # A stale token on a public endpoint should not fail the request
+        identity = None
+    if identity is not None:
+        return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record.response_body, status=record.response_status, mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim_key(key, scope, request_hash):
+    """
+    Insert the in-progress record for this key.
+
+    Returns None when this request owns the key, or the existing record when
+    another request (still running or finished) got there first.
+    """
+    now = datetime.utcnow()
+    existing = IdempotencyKey.query.filter_by(key=key, scope=scope).first()
+    if existing is not None and existing.expires_at > now:
+        return existing
+
+    # Drop expired keys (including an expired copy of this one); expires_at is indexed
+    IdempotencyKey.query.filter(IdempotencyKey.expires_at <= now).delete()
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL_SECONDS', 3600)
+    db.session.add(IdempotencyKey(
+        key=key,
+        scope=scope,
+        endpoint=request.endpoint,
+        request_hash=request_hash,
+        expires_at=now + timedelta(seconds=ttl)
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key won the insert
+        db.session.rollback()
+        return IdempotencyKey.query.filter_by(key=key, scope=scope).first()
+    return None
+
+
+def _release_key(key, scope):
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(key=key, scope=scope, status='in_progress').delete()
+    db.session.commit()
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a create endpoint.
+
+    The first request with a key runs normally and its response is stored;
+    retries with the same key and body get that response back without running
+    the view again. Server errors are not stored, so they can be retried,
+    except a timed-out queued write that may still commit: its key stays
+    in progress.
+    Apply below @jwt_required() so the key is scoped to the caller.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        scope = _request_scope()
+        request_hash = _request_hash()
+        existing = _claim_key(key, scope, request_hash)
+        if existing is not None:
+            if existing.request_hash != request_hash or existing.endpoint != request.endpoint:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}), 422
+            if existing.status != 'completed':
+                response = jsonify({"error": "A request with this Idempotency-Key is still being processed"})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            return _replay(existing)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except WriteQueueTimeout as e:
+            # A write that may still commit keeps the key, so retries get 409 instead of writing again
+            if not e.may_apply:
+                _release_key(key, scope)
+            raise
+        except Exception:
+            _release_key(key, scope)
+            raise
+
+        if response.status_code >= 500:
+            _release_key(key, scope)
+            return response
+
+        IdempotencyKey.query.filter_by(key=key, scope=scope).update({
+            'status': 'completed',
+            'response_status': response.status_code,
+            'response_body': response.get_data(as_text=True)
+        })
+        db.session.commit()
+        return response
+
+    return wrapper
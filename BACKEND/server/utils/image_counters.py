@@ -0,0 +1,182 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from ..extensions import db
+from ..models import Image, ImageCounter
+
+# Image columns that change which counters an image contributes to
+TRACKED_COLUMNS = ('is_active', 'file_size', 'image_type', 'user_id', 'project_id', 'blog_id')
+
+
+def _counter_keys(values):
+    """Return the (scope, scope_key) counters an active image with these values belongs to."""
+    keys = [('all', ''), ('type', values['image_type'] or '')]
+    for scope in ('user', 'project', 'blog'):
+        if values[f'{scope}_id'] is not None:
+            keys.append((scope, str(values[f'{scope}_id'])))
+    return keys
+
+
+def _current_values(image):
+    values = {column: getattr(image, column) for column in TRACKED_COLUMNS}
+    # Column defaults are applied at INSERT time, so new rows may still hold None
+    if values['is_active'] is None:
+        values['is_active'] = True
+    return values
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Without active_history, assigning to an expired attribute (e.g. after a commit)
+# does not load the value it replaces, and the attribute history comes back empty
+for _column in TRACKED_COLUMNS:
+    event.listen(getattr(Image, _column), 'set', _load_old_value, active_history=True)
+
+
+def _previous_values(image):
+    """Values the image had before this flush, read from the attribute history."""
+    state = inspect(image)
+    values = {}
+    for column in TRACKED_COLUMNS:
+        history = state.attrs[column].history
+        if history.deleted:
+            values[column] = history.deleted[0]
+        elif history.unchanged:
+            values[column] = history.unchanged[0]
+        else:
+            values[column] = getattr(image, column)
+    return values
+
+
+def _add(deltas, values, sign):
+    if not values['is_active']:
+        return
+    for key in _counter_keys(values):
+        deltas[key][0] += sign
+        deltas[key][1] += sign * (values['file_size'] or 0)
+
+
+def _apply_deltas(connection, deltas):
+    """Increment counters in place with a single upsert per counter."""
+    table = ImageCounter.__table__
+    dialect = connection.dialect.name
+    for (scope, scope_key), (count, size) in deltas.items():
+        if not count and not size:
+            continue
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = insert(table).values(
+                scope=scope, scope_key=scope_key, image_count=count, total_bytes=size
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.scope_key],
+                set_={
+                    'image_count': table.c.image_count + stmt.excluded.image_count,
+                    'total_bytes': table.c.total_bytes + stmt.excluded.total_bytes,
+                }
+            )
+            connection.execute(stmt)
+            continue
+
+        # Other databases: update, then insert if the counter does not exist yet
+        result = connection.execute(
+            table.update()
+            .where(table.c.scope == scope, table.c.scope_key == scope_key)
+            .values(image_count=table.c.image_count + count, total_bytes=table.c.total_bytes + size)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(
+                scope=scope, scope_key=scope_key, image_count=count, total_bytes=size
+            ))
+
+
+@event.listens_for(Session, 'before_flush')
+def _load_deleted_images(session, flush_context, instances):
+    # A deleted image that was expired can no longer be loaded once its row is gone
+    for obj in session.deleted:
+        if isinstance(obj, Image):
+            for column in TRACKED_COLUMNS:
+                getattr(obj, column)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_image_changes(session, flush_context):
+    """Keep image_counters in step with every Image insert/update/delete, in the same transaction."""
+    deltas = defaultdict(lambda: [0, 0])
+
+    for obj in session.new:
+        if isinstance(obj, Image):
+            _add(deltas, _current_values(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Image):
+            _add(deltas, _previous_values(obj), -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Image) and session.is_modified(obj, include_collections=False):
+            _add(deltas, _previous_values(obj), -1)
+            _add(deltas, _current_values(obj), 1)
+
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+
+def _get_counter(scope, scope_key):
+    # Counters are changed with Core upserts, which the identity map does not see
+    return db.session.get(ImageCounter, (scope, str(scope_key)), populate_existing=True)
+
+
+def get_image_count(scope, scope_key=''):
+    """O(1) lookup of the active image count for a counter."""
+    counter = _get_counter(scope, scope_key)
+    return counter.image_count if counter else 0
+
+
+def get_image_totals(scope, scope_key=''):
+    """Return (image_count, total_bytes) for a counter."""
+    counter = _get_counter(scope, scope_key)
+    return (counter.image_count, counter.total_bytes) if counter else (0, 0)
+
+
+def reconcile_image_counters():
+    """
+    Rebuild image_counters from the images table.
+
+    Returns a list of the counters that had drifted, as
+    (scope, scope_key, stored_count, actual_count, stored_bytes, actual_bytes).
+    """
+    actual = defaultdict(lambda: [0, 0])
+    columns = [getattr(Image, column) for column in TRACKED_COLUMNS if column != 'file_size']
+    rows = db.session.query(
+        *columns, db.func.count(Image.id), db.func.coalesce(db.func.sum(Image.file_size), 0)
+    ).filter(Image.is_active == True).group_by(*columns).all()
+
+    for row in rows:
+        values = dict(zip([c.key for c in columns], row[:-2]))
+        for key in _counter_keys(values):
+            actual[key][0] += row[-2]
+            actual[key][1] += row[-1]
+
+    stored = {(c.scope, c.scope_key): c for c in ImageCounter.query.all()}
+    drift = []
+    for key in set(stored) | set(actual):
+        counter = stored.get(key)
+        count, size = actual.get(key, (0, 0))
+        stored_count = counter.image_count if counter else 0
+        stored_size = counter.total_bytes if counter else 0
+        if (stored_count, stored_size) != (count, size):
+            drift.append((key[0], key[1], stored_count, count, stored_size, size))
+
+        if counter is None:
+            db.session.add(ImageCounter(scope=key[0], scope_key=key[1], image_count=count, total_bytes=size))
+        elif count == 0 and size == 0:
+            db.session.delete(counter)
+        else:
+            counter.image_count = count
+            counter.total_bytes = size
+
+    db.session.commit()
+    return sorted(drift)
@@ -1,9 +1,11 @@
-import os
 from werkzeug.utils import secure_filename
 from flask import current_app
-from pathlib import Path
+import base64
+import io
+import struct
 import uuid
 from datetime import datetime
+from .storage import get_storage, storage_key, StorageError
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
@@ -21,16 +23,15 @@ def generate_unique_filename(filename, image_type, entity_id=None):
         return f"{image_type}_{unique_id}_{basename}.{extension}"
 
 
-def save_portfolio_image(file, image_type, entity_id=None, user_id=None):
-    """Save the uploaded image and return the relative path."""
+def save_portfolio_image(file, image_type, entity_id=None, user_id=None, mime_type=None):
+    """Stream the uploaded image to storage and return the relative path."""
     if not file or not allowed_file(file.filename):
         return None
 
     filename = generate_unique_filename(file.filename, image_type, entity_id)
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
 
     try:
-        file.save(file_path)
+        get_storage().put(filename, file.stream, mime_type or get_mime_type(file.filename))
         return f"uploads/{filename}"
     except Exception as e:
         current_app.logger.error(f"Error saving portfolio image: {str(e)}")
@@ -38,10 +39,10 @@ def save_portfolio_image(file, image_type, entity_id=None, user_id=None):
 
 
 def get_file_size(file_path):
-    """Get file size in bytes."""
+    """Get the stored file's size in bytes."""
     try:
-        return os.path.getsize(file_path)
-    except OSError:
+        return get_storage().size(storage_key(file_path)) or 0
+    except StorageError:
         return 0
 
 
@@ -58,9 +59,140 @@ def get_mime_type(filename):
     return mime_types.get(extension, 'application/octet-stream')
 
 
+# Bytes read from the start of an upload to sniff its format and dimensions
+IMAGE_HEADER_BYTES = 64 * 1024
+
+IMAGE_FORMAT_MIME_TYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+
+def sniff_image_format(header):
+    """Detect the real image format from its magic bytes (ignores the extension)."""
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def get_image_dimensions(header, image_format):
+    """Read pixel dimensions from the image header. Returns (width, height) or (None, None)."""
+    try:
+        if image_format == 'png':
+            return struct.unpack('>II', header[16:24])
+        if image_format == 'gif':
+            return struct.unpack('<HH', header[6:10])
+        if image_format == 'webp':
+            chunk = header[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', header[26:30])
+                return width & 0x3fff, height & 0x3fff
+            if chunk == b'VP8L':
+                bits = int.from_bytes(header[21:25], 'little')
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            if chunk == b'VP8X':
+                return int.from_bytes(header[24:27], 'little') + 1, int.from_bytes(header[27:30], 'little') + 1
+        if image_format == 'jpeg':
+            # Walk the segment markers until the start-of-frame segment
+            offset = 2
+            while offset + 9 < len(header):
+                if header[offset] != 0xFF:
+                    offset += 1
+                    continue
+                marker = header[offset + 1]
+                if marker == 0xFF:
+                    offset += 1
+                    continue
+                length = struct.unpack('>H', header[offset + 2:offset + 4])[0]
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', header[offset + 5:offset + 9])
+                    return width, height
+                offset += 2 + length
+    except struct.error:
+        pass
+    return None, None
+
+
+def make_image_placeholder(stream, size=16):
+    """Build a tiny inline thumbnail (data URI) to show while the full image loads."""
+    try:
+        from PIL import Image as PILImage
+    except ImportError:
+        return None
+
+    try:
+        with PILImage.open(stream) as img:
+            # Let the JPEG decoder downscale while decoding instead of after
+            img.draft('RGB', (size * 4, size * 4))
+            img = img.convert('RGB')
+            img.thumbnail((size, size))
+            buffer = io.BytesIO()
+            # WebP keeps a 16px thumbnail to a couple of hundred bytes
+            img.save(buffer, 'WEBP', quality=50)
+        return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    except Exception as e:
+        current_app.logger.warning(f"Could not build image placeholder: {str(e)}")
+        return None
+
+
+def inspect_image(stream, with_placeholder=True):
+    """
+    Sniff format, dimensions and placeholder of an uploaded image.
+
+    The stream is rewound afterwards so it can still be saved.
+    Returns None if the bytes are not a recognised image.
+    """
+    header = stream.read(IMAGE_HEADER_BYTES)
+    stream.seek(0)
+
+    image_format = sniff_image_format(header)
+    if not image_format:
+        return None
+
+    width, height = get_image_dimensions(header, image_format)
+    placeholder = None
+    if with_placeholder:
+        placeholder = make_image_placeholder(stream, current_app.config.get('IMAGE_PLACEHOLDER_SIZE', 16))
+        stream.seek(0)
+
+    return {
+        'format': image_format,
+        'mime_type': IMAGE_FORMAT_MIME_TYPES[image_format],
+        'width': width,
+        'height': height,
+        'placeholder': placeholder
+    }
+
+
+def image_format_allowed(image_format, allowed_extensions=None):
+    """Check a sniffed format against the allowed extensions (jpeg covers jpg)."""
+    allowed = allowed_extensions or current_app.config['ALLOWED_EXTENSIONS']
+    return image_format in allowed or (image_format == 'jpeg' and 'jpg' in allowed)
+
+
+def image_to_dict(image):
+    """Serialize an Image row for embedding in project/blog payloads."""
+    return {
+        'image_id': image.id,
+        'file_url': image.file_url,
+        'mime_type': image.mime_type,
+        'width': image.width,
+        'height': image.height,
+        'placeholder': image.placeholder
+    }
+
+
 def delete_image_file(image_url):
     """
-    Safely delete an image file from the filesystem.
+    Safely delete an image file from the configured storage backend.
     
     Args:
         image_url (str): The URL or path of the image to delete
@@ -74,35 +206,19 @@ def delete_image_file(image_url):
             return False
             
         # Extract filename securely
-        filename = secure_filename(os.path.basename(image_url))
+        filename = secure_filename(storage_key(image_url))
         if not filename:
             current_app.logger.error(f"Invalid filename extracted from URL: {image_url}")
             return False
-            
-        # Build full path safely
-        upload_folder = current_app.config.get('UPLOAD_FOLDER')
-        if not upload_folder:
-            current_app.logger.error("UPLOAD_FOLDER not configured")
-            return False
-            
-        file_path = Path(upload_folder) / filename
-        
-        # Security check - ensure path is within upload folder
-        try:
-            file_path.resolve().relative_to(Path(upload_folder).resolve())
-        except ValueError:
-            current_app.logger.error(f"Attempted to delete file outside upload directory: {file_path}")
-            return False
-            
-        # Delete the file
-        if file_path.exists():
-            file_path.unlink()
-            current_app.logger.info(f"Successfully deleted image file: {file_path}")
+
+        # Delete the file (the backend rejects keys outside its root)
+        if get_storage().delete(filename):
+            current_app.logger.info(f"Successfully deleted image file: {filename}")
             return True
             
-        current_app.logger.warning(f"Image file not found: {file_path}")
+        current_app.logger.warning(f"Image file not found: {filename}")
         return False
         
     except Exception as e:
         current_app.logger.error(f"Error deleting image file {image_url}: {str(e)}", exc_info=True)
-        return False    
\ No newline at end of file
+        return False
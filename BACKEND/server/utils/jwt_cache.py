@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from flask_jwt_extended import JWTManager
+
+
+class ClaimsCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by the SHA-256 digest of the token.
+
+    Entries expire at the token's `exp` plus `leeway` (or after `max_ttl` for
+    tokens without one).
+    """
+
+    def __init__(self, max_size=1024, max_ttl=300, leeway=0, identity_claim_key='sub'):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.leeway = leeway
+        self.identity_claim_key = identity_claim_key
+        self._entries = OrderedDict()  # digest -> (claims, expires_at)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def digest(encoded_token):
+        return hashlib.sha256(encoded_token.encode()).digest()
+
+    def get(self, encoded_token):
+        key = self.digest(encoded_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return dict(entry[0])
+            if entry is not None:
+                del self._entries[key]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, encoded_token, claims):
+        now = time.time()
+        expires_at = claims['exp'] + self.leeway if claims.get('exp') else now + self.max_ttl
+        if expires_at <= now:
+            return
+        key = self.digest(encoded_token)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def forget(self, encoded_token):
+        """Drop one token's cached claims so its next use is verified again."""
+        with self._lock:
+            self._entries.pop(self.digest(encoded_token), None)
+
+    def forget_identity(self, identity):
+        """Drop cached claims for every token issued to this identity."""
+        with self._lock:
+            for key in [k for k, (claims, _) in self._entries.items()
+                        if str(claims.get(self.identity_claim_key)) == str(identity)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                max_size=self.max_size,
+                hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else None,
+            )
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that skips re-parsing and re-verifying tokens it has verified recently.
+
+    Only the signature/claims decode is cached; blocklist, user lookup and
+    token-type checks still run on every request, the blocklist being the
+    tokens revoked through `revocations`. Cookie tokens with a CSRF value and
+    expired-token decodes always take the normal path.
+    """
+
+    def init_app(self, app, add_context_processor=False):
+        super().init_app(app, add_context_processor)
+        # Imported here: the models import extensions, which builds this manager
+        from .token_revocation import TokenRevocations
+
+        config = app.config
+        leeway = _seconds(config['JWT_DECODE_LEEWAY'])
+        self.claims_cache = ClaimsCache(
+            max_size=config.get('JWT_CLAIMS_CACHE_SIZE', 1024),
+            max_ttl=config.get('JWT_CLAIMS_CACHE_MAX_TTL_SECONDS', 300),
+            leeway=leeway,
+            identity_claim_key=config['JWT_IDENTITY_CLAIM'],
+        )
+        self.revocations = TokenRevocations(
+            check_ttl=config.get('JWT_REVOCATION_CHECK_SECONDS', 5),
+            leeway=leeway,
+            identity_claim_key=config['JWT_IDENTITY_CLAIM'],
+        )
+        # Revocations go through the regular blocklist check, so they hold with the cache off too
+        self.token_in_blocklist_loader(lambda jwt_header, jwt_data: self.revocations.is_revoked(jwt_data))
+        self.claims_cache_enabled = config.get('JWT_CLAIMS_CACHE_ENABLED', True)
+        # The cache wraps a private JWTManager method; if a new release drops it, verify every time instead
+        if not hasattr(JWTManager, '_decode_jwt_from_config'):
+            app.logger.warning("JWTManager has no _decode_jwt_from_config, JWT claims cache disabled")
+            self.claims_cache_enabled = False
+        app.extensions['jwt_claims_cache'] = self.claims_cache
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.claims_cache_enabled or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        claims = self.claims_cache.get(encoded_token)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            self.claims_cache.put(encoded_token, claims)
+        return claims
+
+
+def _seconds(value):
+    return value.total_seconds() if isinstance(value, timedelta) else value
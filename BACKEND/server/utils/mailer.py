@@ -0,0 +1,187 @@
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from ..extensions import db
+from ..models import OutboundEmail
+from .smtp_pool import get_smtp_pool
+
+
+def get_owner_email():
+    """Address that receives site notifications (the authenticated mail account)."""
+    owner_email = current_app.config.get('MAIL_USERNAME') or current_app.config.get('MAIL_DEFAULT_SENDER')
+    if isinstance(owner_email, (list, tuple)):
+        owner_email = owner_email[-1]
+    return owner_email
+
+
+def queue_email(subject, recipients, body, reply_to=None):
+    """
+    Add an email to the outbox.
+
+    The row is only added to the session, so it is committed (or rolled back)
+    together with whatever the caller is saving.
+    """
+    email = OutboundEmail(
+        subject=subject,
+        recipients=json.dumps(list(recipients)),
+        body=body,
+        reply_to=reply_to
+    )
+    db.session.add(email)
+    return email
+
+
+def build_message(email):
+    msg = Message(subject=email.subject, recipients=json.loads(email.recipients))
+    msg.body = email.body
+    if email.reply_to:
+        msg.reply_to = email.reply_to
+    return msg
+
+
+def retry_delay(attempts):
+    """Exponential backoff with a little jitter, capped at MAIL_RETRY_MAX_SECONDS."""
+    base = current_app.config.get('MAIL_RETRY_BASE_SECONDS', 30)
+    cap = current_app.config.get('MAIL_RETRY_MAX_SECONDS', 3600)
+    delay = min(base * (2 ** max(attempts - 1, 0)), cap)
+    return timedelta(seconds=delay * random.uniform(1.0, 1.1))
+
+
+def claim_due_emails(limit):
+    """
+    Atomically claim up to `limit` due emails for this process.
+
+    Claiming moves next_attempt_at forward by a lease, so rows left in
+    'sending' by a crashed worker become due again once the lease expires.
+    """
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=current_app.config.get('MAIL_SEND_LEASE_SECONDS', 120))
+    candidates = db.session.query(OutboundEmail.id).filter(
+        OutboundEmail.status.in_(['pending', 'sending']),
+        OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(limit).all()
+
+    claimed = []
+    for (email_id,) in candidates:
+        result = db.session.execute(
+            db.update(OutboundEmail)
+            .where(
+                OutboundEmail.id == email_id,
+                OutboundEmail.status.in_(['pending', 'sending']),
+                OutboundEmail.next_attempt_at <= now
+            )
+            .values(status='sending', next_attempt_at=lease_until)
+        )
+        if result.rowcount:
+            claimed.append(email_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id).all()
+
+
+def record_delivery(email, error=None):
+    """Mark an email as sent, or schedule its retry (failed after MAIL_MAX_ATTEMPTS)."""
+    email.attempts += 1
+    if error is None:
+        email.status = 'sent'
+        email.sent_at = datetime.utcnow()
+        email.last_error = None
+        return
+
+    email.last_error = str(error)[:1000]
+    if email.attempts >= current_app.config.get('MAIL_MAX_ATTEMPTS', 8):
+        email.status = 'failed'
+        current_app.logger.error(f"Giving up on email {email.id} after {email.attempts} attempts: {error}")
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = datetime.utcnow() + retry_delay(email.attempts)
+        current_app.logger.warning(f"Email {email.id} failed (attempt {email.attempts}), retrying later: {error}")
+
+
+def deliver_pending(limit=None):
+    """Send due emails from the outbox. Returns the number sent successfully."""
+    limit = limit or current_app.config.get('MAIL_SEND_BATCH_SIZE', 50)
+    pool = get_smtp_pool()
+    # Leave the outbox alone while the SMTP breaker is open, so retries are not burnt
+    if pool.breaker.state == pool.breaker.OPEN:
+        return 0
+    emails = claim_due_emails(limit)
+    if not emails:
+        return 0
+
+    # The whole batch goes over one pooled SMTP session
+    errors = pool.send_batch([build_message(email) for email in emails])
+    for email, error in zip(emails, errors):
+        record_delivery(email, error)
+    db.session.commit()
+    return errors.count(None)
+
+
+class MailSender:
+    """Background thread that drains the outbox."""
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('MAIL_SENDER_POLL_SECONDS', 5)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Ask the sender to check the outbox now instead of at the next poll."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        from .contact_digest import flush_contact_digest
+
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    if self.app.config.get('CONTACT_DIGEST_ENABLED'):
+                        flush_contact_digest()
+                    while deliver_pending():
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Mail sender error: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+def init_mail_sender(app):
+    """Start the background sender lazily, on the first request each worker serves."""
+    sender = MailSender(app)
+    app.extensions['mail_sender'] = sender
+
+    if app.config.get('MAIL_SENDER_ENABLED', True):
+        @app.before_request
+        def _start_mail_sender():
+            sender.ensure_started()
+
+    return sender
+
+
+def wake_mail_sender():
+    sender = current_app.extensions.get('mail_sender')
+    if sender is not None:
+        sender.wake()
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already running or queued."""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Password hashing is at capacity")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs password hashing on a small, bounded thread pool.
+
+    At most `workers` hashes run at once (hashlib releases the GIL, so other
+    requests keep being served) and at most `max_pending` more may wait for a
+    slot; beyond that callers get PasswordHasherBusy instead of piling up.
+    With workers=0 hashing runs inline on the request thread.
+    """
+
+    def __init__(self, method, workers=2, max_pending=8, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._method_prefix = None
+        self.stats = {'hashed': 0, 'verified': 0, 'rejected': 0, 'rehashed': 0}
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.stats['rejected'] += 1
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(self._release_after, fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.stats['rejected'] += 1
+            raise PasswordHasherBusy()
+
+    def _release_after(self, fn, *args):
+        # A hash the caller stopped waiting for keeps running, so it holds its slot until it
+        # finishes. Released here rather than in a done callback, which runs only after the
+        # caller has been handed the result and may already be asking for the next slot.
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        self.stats['hashed'] += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        self.stats['verified'] += 1
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different algorithm or cost than PASSWORD_HASH_METHOD."""
+        if self._method_prefix is None:
+            # Let werkzeug fill in its defaults (e.g. 'scrypt' -> 'scrypt:32768:8:1'); done once per process
+            self._method_prefix = generate_password_hash('', self.method, salt_length=1).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def get_password_hasher():
+    """Return the password hasher for the current app, creating it on first use."""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = PasswordHasher(
+            config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            workers=config.get('PASSWORD_HASH_WORKERS', 2),
+            max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 8),
+            timeout=config.get('PASSWORD_HASH_TIMEOUT', 10)
+        )
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+
+def verify_password(user, password):
+    """
+    Check a password against the user's stored hash.
+
+    When it matches but was hashed with an older algorithm or cost, the hash is
+    upgraded in place (the caller commits).
+    """
+    hasher = get_password_hasher()
+    if not hasher.verify(user.password_hash, password):
+        return False
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hasher.hash(password)
+        hasher.stats['rehashed'] += 1
+    return True
@@ -0,0 +1,144 @@
+import threading
+import time
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+# SQLite calls the progress handler every this many virtual machine instructions
+SQLITE_PROGRESS_STEPS = 1000
+# SQLSTATE query_canceled, raised when statement_timeout fires
+POSTGRES_QUERY_CANCELED = '57014'
+
+
+class DeadlineMetrics:
+    """Statement timeouts per endpoint for this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.by_endpoint = {}
+
+    def record(self, endpoint):
+        with self._lock:
+            self.timeouts += 1
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'timeouts': self.timeouts, 'by_endpoint': dict(self.by_endpoint)}
+
+
+def query_deadline(ms):
+    """
+    Give each SQL statement of this route at most `ms` milliseconds (0 = no limit).
+
+    Overrides DB_STATEMENT_TIMEOUT_MS; DB_ROUTE_STATEMENT_TIMEOUTS overrides this.
+    """
+    def decorator(view):
+        view.statement_timeout_ms = ms
+        return view
+    return decorator
+
+
+def current_statement_timeout():
+    """Milliseconds the next statement may run, or 0 outside requests (CLI, migrations, background threads)."""
+    if not has_app_context():
+        return 0
+    return g.get('db_statement_timeout_ms', 0)
+
+
+def is_statement_timeout(error):
+    """True when a DBAPIError was raised because a statement ran past its deadline."""
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) == POSTGRES_QUERY_CANCELED:
+        return True
+    return type(orig).__name__ == 'OperationalError' and str(orig) == 'interrupted'
+
+
+def record_statement_timeout(app):
+    endpoint = request.endpoint if has_request_context() else None
+    app.extensions['query_deadlines'].record(endpoint or 'unknown')
+
+
+def _apply_postgres_timeouts(engine):
+    # statement_timeout is a session setting, so it is only sent when it differs from what
+    # the connection already has. A SET inside a transaction that rolls back is undone too.
+    # Streamed results come from a named cursor, where each FETCH of a batch is its own
+    # statement: the timeout bounds every batch, never the whole download.
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _set_statement_timeout(conn, cursor, statement, parameters, context, executemany):
+        ms = current_statement_timeout()
+        if conn.info.get('statement_timeout') == ms:
+            return
+        # A separate cursor, since the statement's own may be a named (server-side) one
+        setter = conn.connection.dbapi_connection.cursor()
+        try:
+            setter.execute(f'SET statement_timeout = {int(ms)}')
+        finally:
+            setter.close()
+        conn.info['statement_timeout'] = ms
+        in_transaction = conn.get_execution_options().get('isolation_level') != 'AUTOCOMMIT'
+        conn.info['statement_timeout_uncommitted'] = in_transaction
+
+    @event.listens_for(engine, 'commit')
+    def _keep_statement_timeout(conn):
+        conn.info.pop('statement_timeout_uncommitted', None)
+
+    def _forget_statement_timeout(info):
+        if info.pop('statement_timeout_uncommitted', False):
+            info.pop('statement_timeout', None)
+
+    event.listen(engine, 'rollback', lambda conn: _forget_statement_timeout(conn.info))
+    event.listen(engine, 'rollback_savepoint', lambda conn, name, context: _forget_statement_timeout(conn.info))
+    event.listen(engine.pool, 'reset',
+                 lambda dbapi_connection, connection_record, reset_state: _forget_statement_timeout(connection_record.info))
+
+
+def _apply_sqlite_timeouts(engine):
+    # A progress handler returning true makes SQLite abort the statement with "interrupted".
+    # The deadline is per connection and replaced by each statement, so it also covers fetching
+    # its rows, except for streamed results, which the client may take any time to download.
+    @event.listens_for(engine, 'connect')
+    def _install_progress_handler(dbapi_connection, connection_record):
+        info = connection_record.info
+
+        def _past_deadline():
+            deadline = info.get('query_deadline')
+            return deadline is not None and time.monotonic() > deadline
+
+        dbapi_connection.set_progress_handler(_past_deadline, SQLITE_PROGRESS_STEPS)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _set_query_deadline(conn, cursor, statement, parameters, context, executemany):
+        ms = current_statement_timeout()
+        conn.info['query_deadline'] = time.monotonic() + ms / 1000 if ms else None
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _clear_streaming_deadline(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and context.execution_options.get('stream_results'):
+            conn.info['query_deadline'] = None
+
+
+def init_query_deadlines(app, db):
+    """
+    Cap how long each SQL statement of a request may run.
+
+    Requests get DB_STATEMENT_TIMEOUT_MS, or the route's @query_deadline, or
+    its entry in DB_ROUTE_STATEMENT_TIMEOUTS. Postgres enforces it with
+    statement_timeout, SQLite with a progress handler. A statement that runs
+    over fails with a DBAPIError that is_statement_timeout() recognises.
+    """
+    app.extensions['query_deadlines'] = DeadlineMetrics()
+
+    @app.before_request
+    def _choose_statement_timeout():
+        view = app.view_functions.get(request.endpoint)
+        ms = getattr(view, 'statement_timeout_ms', app.config.get('DB_STATEMENT_TIMEOUT_MS', 0))
+        g.db_statement_timeout_ms = app.config.get('DB_ROUTE_STATEMENT_TIMEOUTS', {}).get(request.endpoint, ms)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'postgresql':
+            _apply_postgres_timeouts(engine)
+        elif engine.dialect.name == 'sqlite':
+            _apply_sqlite_timeouts(engine)
@@ -0,0 +1,173 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+
+RATE_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(value):
+    """
+    Parse a limit like '5/minute' or '20/hour' into (capacity, refill_per_second).
+
+    The bucket holds `capacity` tokens, so up to that many requests can arrive
+    in a burst; it then refills evenly over the period.
+    """
+    count, _, period = value.partition('/')
+    count = int(count)
+    seconds = RATE_PERIODS[period.strip().rstrip('s')]
+    return count, count / seconds
+
+
+def _refill(tokens, updated, now, capacity, rate):
+    if tokens is None:
+        return float(capacity)
+    return min(float(capacity), tokens + (now - updated) * rate)
+
+
+def _take_result(tokens, capacity, rate, cost):
+    """Return (allowed, tokens_left, retry_after_seconds)."""
+    if tokens >= cost:
+        return True, tokens - cost, 0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets in this process only (single worker, tests)."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            allowed, tokens, retry_after = _take_result(tokens, capacity, rate, cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a small local SQLite file shared by every worker on the host.
+
+    Each take is one short IMMEDIATE transaction, so concurrent workers
+    serialize on the bucket update and all see the same token counts.
+    """
+
+    # Buckets untouched for this long are full again and can be dropped
+    PRUNE_AFTER_SECONDS = 86400
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, cost=1):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0] if row else None, row[1] if row else now, now, capacity, rate)
+            allowed, tokens, retry_after = _take_result(tokens, capacity, rate, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.PRUNE_AFTER_SECONDS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+def create_bucket_store(config):
+    storage = config.get('RATE_LIMIT_STORAGE', 'memory')
+    if storage == 'memory':
+        return MemoryBucketStore()
+    if storage.startswith('sqlite:///'):
+        return SQLiteBucketStore(storage[len('sqlite:///'):])
+    raise ValueError(f"Unsupported RATE_LIMIT_STORAGE: {storage}")
+
+
+def get_bucket_store():
+    """Return the token bucket store for the current app, creating it on first use."""
+    store = current_app.extensions.get('rate_limiter')
+    if store is None:
+        store = create_bucket_store(current_app.config)
+        current_app.extensions['rate_limiter'] = store
+    return store
+
+
+def client_address():
+    """Client IP, taken from X-Forwarded-For when RATE_LIMIT_PROXY_HOPS proxies sit in front."""
+    hops = current_app.config.get('RATE_LIMIT_PROXY_HOPS', 0)
+    if hops:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit(name):
+    """
+    Throttle a route per client IP with a token bucket.
+
+    The limit is read from the RATE_LIMIT_<NAME> setting (e.g. '5/minute') on
+    each request. Rejected requests get 429 with Retry-After before the view
+    does any work.
+    """
+    setting = f'RATE_LIMIT_{name.upper()}'
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            limit = config.get(setting)
+            if not config.get('RATE_LIMIT_ENABLED', True) or not limit:
+                return view(*args, **kwargs)
+
+            capacity, rate = parse_rate(limit)
+            try:
+                allowed, retry_after = get_bucket_store().take(f'{name}:{client_address()}', capacity, rate)
+            except Exception as e:
+                # Never take the site down because the limiter store is unavailable
+                current_app.logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+                return view(*args, **kwargs)
+
+            if not allowed:
+                retry_after = max(1, math.ceil(retry_after))
+                response = jsonify({"error": "Too many requests, please try again later", "retry_after": retry_after})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+            return view(*args, **kwargs)
+
+        return wrapper
+    return decorator
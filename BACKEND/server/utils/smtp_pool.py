@@ -0,0 +1,278 @@
+import smtplib
+import threading
+import time
+from flask import current_app
+from flask_mail import BadHeaderError, email_dispatched, sanitize_address, sanitize_addresses
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class _DeadlineMixin:
+    """
+    Caps every command and reply of the session at what is left until `deadline`.
+
+    smtplib only has a per-socket-operation timeout, so a slow server could
+    otherwise stretch one sendmail (EHLO, MAIL, RCPT, DATA) to several times it.
+    """
+
+    deadline = None  # time.monotonic() the current batch must be done by; None: `timeout` per operation
+
+    def _use_time_left(self):
+        if self.sock is None:
+            return
+        if self.deadline is None:
+            self.sock.settimeout(self.timeout)
+            return
+        left = self.deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError("SMTP send budget used up")
+        self.sock.settimeout(left)
+
+    def send(self, s):
+        self._use_time_left()
+        return super().send(s)
+
+    def getreply(self):
+        self._use_time_left()
+        return super().getreply()
+
+
+class _SMTP(_DeadlineMixin, smtplib.SMTP):
+    pass
+
+
+class _SMTP_SSL(_DeadlineMixin, smtplib.SMTP_SSL):
+    pass
+
+
+class _PooledConnection:
+    """An open SMTP session plus the bookkeeping the pool needs."""
+
+    def __init__(self, host):
+        self.host = host
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def close(self):
+        try:
+            self.host.quit()
+        except Exception:
+            try:
+                self.host.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Keeps authenticated SMTP sessions open and reuses them across sends.
+
+    Idle sessions are kept for MAIL_POOL_MAX_IDLE_SECONDS, probed with NOOP
+    before reuse once they have been idle for MAIL_POOL_HEALTHCHECK_SECONDS,
+    and recycled after MAIL_POOL_MAX_MESSAGES messages.
+
+    Sends go through a circuit breaker: once the server has failed
+    MAIL_BREAKER_FAILURE_THRESHOLD times in a row, batches fail immediately
+    with CircuitOpenError until MAIL_BREAKER_RESET_SECONDS have passed.
+    """
+
+    def __init__(self, mail_state, size=2, max_idle=60, healthcheck_after=15,
+                 max_messages=100, timeout=10, breaker=None):
+        self.mail_state = mail_state
+        self.size = size
+        self.max_idle = max_idle
+        self.healthcheck_after = healthcheck_after
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.breaker = breaker or CircuitBreaker('smtp')
+        self.stats = {'connections_opened': 0, 'connections_reused': 0, 'messages_sent': 0}
+
+    def _open(self, deadline=None):
+        state = self.mail_state
+        host = (_SMTP_SSL if state.use_ssl else _SMTP)(timeout=self.timeout)
+        host.set_debuglevel(int(state.debug))
+        host.deadline = deadline
+        if deadline is not None:
+            # Connecting is not an SMTP command, so it gets what is left as a plain socket timeout
+            host.timeout = deadline - time.monotonic()
+            if host.timeout <= 0:
+                raise TimeoutError("SMTP send budget used up")
+        try:
+            host.connect(state.server, state.port)
+            host.timeout = self.timeout
+            if state.use_tls:
+                host.starttls()
+            if state.username and state.password:
+                host.login(state.username, state.password)
+        except BaseException:
+            host.close()
+            raise
+        self.stats['connections_opened'] += 1
+        return _PooledConnection(host)
+
+    def _healthy(self, conn):
+        now = time.monotonic()
+        if now - conn.last_used > self.max_idle:
+            return False
+        if now - conn.last_used > self.healthcheck_after:
+            try:
+                return conn.host.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def _acquire(self, deadline=None):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open(deadline)
+            # Reused sessions take the caller's budget, the NOOP probe included
+            conn.host.deadline = deadline
+            if self._healthy(conn):
+                self.stats['connections_reused'] += 1
+                return conn
+            conn.close()
+
+    def _release(self, conn):
+        if conn.messages_sent >= self.max_messages:
+            conn.close()
+            return
+        conn.host.deadline = None
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+
+    def _sendmail(self, conn, message):
+        conn.host.sendmail(
+            sanitize_address(message.sender),
+            list(sanitize_addresses(message.send_to)),
+            message.as_bytes(),
+            message.mail_options,
+            message.rcpt_options,
+        )
+        conn.messages_sent += 1
+        self.stats['messages_sent'] += 1
+
+    def send_batch(self, messages, timeout=None):
+        """
+        Send messages over one pooled session.
+
+        Returns a list with None for each message that was sent and the
+        exception for each one that failed, in the same order. `timeout` is
+        the budget for the whole batch: waiting for a free session,
+        connecting, sending and hanging up. Without it, each wait and SMTP
+        command gets MAIL_TIMEOUT.
+        """
+        for message in messages:
+            if message.date is None:
+                message.date = time.time()
+
+        app = current_app._get_current_object()
+        if self.mail_state.suppress:
+            for message in messages:
+                email_dispatched.send(app, message=message)
+            return [None] * len(messages)
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        # Waiting for a free session counts against the caller's budget too
+        if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+            return [TimeoutError("No SMTP connection became free in time")] * len(messages)
+        try:
+            self.breaker.allow()
+        except CircuitOpenError as e:
+            self._slots.release()
+            return [e] * len(messages)
+
+        results = []
+        transport_error = None
+        started = time.monotonic()
+        conn = None
+        try:
+            for message in messages:
+                try:
+                    if not message.send_to:
+                        raise ValueError("No recipients have been added")
+                    if message.has_bad_headers():
+                        raise BadHeaderError
+                    if conn is None or conn.messages_sent >= self.max_messages:
+                        if conn is not None:
+                            conn.close()
+                        try:
+                            conn = self._acquire(deadline)
+                        except (smtplib.SMTPException, OSError) as e:
+                            # Can't reach or log in to the server; fail the rest of the batch now
+                            conn = None
+                            transport_error = e
+                            results.extend([e] * (len(messages) - len(results)))
+                            break
+                    try:
+                        self._sendmail(conn, message)
+                    except smtplib.SMTPServerDisconnected:
+                        # The server dropped an idle session; retry once on a fresh one
+                        conn.close()
+                        conn = self._open(deadline)
+                        self._sendmail(conn, message)
+                    email_dispatched.send(app, message=message)
+                    results.append(None)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPDataError, BadHeaderError, ValueError) as e:
+                    # The session is still usable; only this message failed
+                    results.append(e)
+                except Exception as e:
+                    # Timeouts, dropped sessions: the server itself is misbehaving
+                    transport_error = e
+                    results.append(e)
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+        finally:
+            if conn is not None:
+                self._release(conn)
+            self._slots.release()
+            # Refused recipients or bad headers say nothing about the server's health
+            if transport_error is None:
+                self.breaker.record_success(time.monotonic() - started)
+            else:
+                self.breaker.record_failure(transport_error, time.monotonic() - started)
+        return results
+
+    def send(self, message, timeout=None):
+        """Send one message, raising on failure like Flask-Mail's mail.send."""
+        error = self.send_batch([message], timeout=timeout)[0]
+        if error is not None:
+            raise error
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def get_smtp_pool():
+    """Return the SMTP pool for the current app, rebuilt if the mail settings changed."""
+    mail_state = current_app.extensions['mail']
+    pool = current_app.extensions.get('smtp_pool')
+    if pool is None or pool.mail_state is not mail_state:
+        if pool is not None:
+            pool.close_all()
+        config = current_app.config
+        pool = SMTPConnectionPool(
+            mail_state,
+            size=config.get('MAIL_POOL_SIZE', 2),
+            max_idle=config.get('MAIL_POOL_MAX_IDLE_SECONDS', 60),
+            healthcheck_after=config.get('MAIL_POOL_HEALTHCHECK_SECONDS', 15),
+            max_messages=config.get('MAIL_POOL_MAX_MESSAGES', 100),
+            timeout=config.get('MAIL_TIMEOUT', 10),
+            breaker=CircuitBreaker(
+                'smtp',
+                failure_threshold=config.get('MAIL_BREAKER_FAILURE_THRESHOLD', 5),
+                reset_timeout=config.get('MAIL_BREAKER_RESET_SECONDS', 30),
+            ),
+        )
+        current_app.extensions['smtp_pool'] = pool
+    return pool
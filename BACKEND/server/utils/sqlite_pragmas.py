@@ -0,0 +1,41 @@
+from sqlalchemy import event
+
+# Tuned for a read-heavy site on one host: WAL lets readers run alongside the
+# single writer, NORMAL sync is safe under WAL (only the last commits can be
+# lost on power failure, never corruption), and the rest trades memory for I/O.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -65536,  # negative = KiB, so 64 MiB per connection
+    'busy_timeout': 5000,  # ms to wait for the write lock before "database is locked"
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every new DBAPI connection the engine opens."""
+    pragmas = {name: value for name, value in pragmas.items() if value is not None}
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    return _set_sqlite_pragmas
+
+
+def init_sqlite_pragmas(app, db):
+    """Apply SQLITE_PRAGMAS to every SQLite engine of the app (no-op for other databases)."""
+    if not app.config.get('SQLITE_PRAGMAS_ENABLED', True):
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            apply_sqlite_pragmas(engine, pragmas)
@@ -0,0 +1,206 @@
+import os
+import shutil
+from pathlib import Path
+from flask import current_app, url_for
+
+# Size of the chunks used when streaming objects in and out of storage
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageError(Exception):
+    """Raised when a storage backend cannot complete an operation."""
+
+
+class _CountingReader:
+    """File-like wrapper that counts the bytes read through it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class LocalStorage:
+    """Store uploads on the local filesystem (Config.UPLOAD_FOLDER)."""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        path = (self.root / key).resolve()
+        # Security check - keys must never escape the upload folder
+        try:
+            path.relative_to(self.root.resolve())
+        except ValueError:
+            raise StorageError(f"Key outside storage root: {key}")
+        return path
+
+    def put(self, key, stream, content_type=None):
+        """Stream a file-like object to disk and return the number of bytes written."""
+        path = self._path(key)
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(stream, out, CHUNK_SIZE)
+        return path.stat().st_size
+
+    def get(self, key):
+        """Yield the object's bytes in chunks."""
+        path = self._path(key)
+        if not path.exists():
+            raise StorageError(f"Object not found: {key}")
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def size(self, key):
+        """Return the object's size in bytes, or None if it does not exist."""
+        path = self._path(key)
+        return path.stat().st_size if path.exists() else None
+
+    def exists(self, key):
+        return self._path(key).exists()
+
+    def delete(self, key):
+        """Delete an object. Returns True if something was removed."""
+        path = self._path(key)
+        if path.exists():
+            path.unlink()
+            return True
+        return False
+
+    def url(self, key, external=False):
+        return url_for('serve_upload', filename=key, _external=external)
+
+    def presigned_upload(self, key, content_type, expires_in=900):
+        """Local disk has no direct-upload endpoint; callers fall back to POST /upload."""
+        return None
+
+
+class S3Storage:
+    """Store uploads in an S3-compatible bucket (AWS S3, MinIO, ...)."""
+
+    name = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None,
+                 secret_key=None, public_url=None, prefix=''):
+        try:
+            import boto3
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise StorageError("boto3 is required for STORAGE_BACKEND=s3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            # Path-style addressing is what MinIO and most S3 stand-ins expect
+            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path'}),
+        )
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key, stream, content_type=None):
+        """Stream a file-like object to the bucket (multipart for large files)."""
+        extra = {'ContentType': content_type} if content_type else None
+        reader = _CountingReader(stream)
+        self.client.upload_fileobj(reader, self.bucket, self._key(key), ExtraArgs=extra)
+        return reader.bytes_read
+
+    def get(self, key):
+        """Yield the object's bytes in chunks."""
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.client.exceptions.NoSuchKey:
+            raise StorageError(f"Object not found: {key}")
+        body = obj['Body']
+        try:
+            for chunk in body.iter_chunks(CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError:
+            return None
+        return head['ContentLength']
+
+    def exists(self, key):
+        return self.size(key) is not None
+
+    def delete(self, key):
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    def url(self, key, external=False):
+        if self.public_url:
+            return f"{self.public_url}/{self._key(key)}"
+        # Without a public bucket URL, objects are streamed back through serve_upload
+        return url_for('serve_upload', filename=key, _external=external)
+
+    def presigned_upload(self, key, content_type, expires_in=900):
+        """Return a presigned PUT the browser can use to upload straight to the bucket."""
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(key), 'ContentType': content_type},
+            ExpiresIn=expires_in,
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {'Content-Type': content_type},
+            'expires_in': expires_in,
+        }
+
+
+def create_storage(config):
+    """Build the storage backend selected by STORAGE_BACKEND."""
+    backend = (config.get('STORAGE_BACKEND') or 'local').lower()
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        if not config.get('S3_BUCKET'):
+            raise StorageError("S3_BUCKET must be set for STORAGE_BACKEND=s3")
+        return S3Storage(
+            bucket=config['S3_BUCKET'],
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION'),
+            access_key=config.get('S3_ACCESS_KEY_ID'),
+            secret_key=config.get('S3_SECRET_ACCESS_KEY'),
+            public_url=config.get('S3_PUBLIC_URL'),
+            prefix=config.get('S3_PREFIX', ''),
+        )
+    raise StorageError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def get_storage():
+    """Return the storage backend for the current app, creating it on first use."""
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        storage = create_storage(current_app.config)
+        current_app.extensions['storage'] = storage
+    return storage
+
+
+def storage_key(path_or_url):
+    """Map a stored file_path/file_url (e.g. 'uploads/x.png') to its storage key."""
+    return os.path.basename(path_or_url or '')
@@ -0,0 +1,95 @@
+import calendar
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from ..extensions import db
+from ..models import RevokedToken, User
+
+
+class TokenRevocations:
+    """
+    Revoked JWTs, kept in the database so every worker rejects them.
+
+    A token is revoked when its jti is in revoked_tokens (logout) or it was
+    issued before its user's tokens_valid_after (password change). Lookups are
+    memoized per worker for `check_ttl` seconds, so a revocation made by
+    another worker takes effect here within that long; the worker that
+    revokes sees it at once. Revoked jtis stay memoized for good (bounded by
+    `max_size`, least recently used first); their records are deleted once
+    the token's `exp` plus `leeway` has passed.
+    """
+
+    def __init__(self, check_ttl=5, max_size=4096, leeway=0, identity_claim_key='sub'):
+        self.check_ttl = check_ttl
+        self.max_size = max_size
+        self.leeway = leeway
+        self.identity_claim_key = identity_claim_key
+        self._checked = OrderedDict()  # ('jti', jti) | ('user', str(id)) -> (value, checked_until)
+        self._lock = threading.Lock()
+
+    def is_revoked(self, claims):
+        if self._jti_revoked(claims.get('jti')):
+            return True
+        valid_after = self._user_valid_after(claims.get(self.identity_claim_key))
+        # Token iats are whole seconds, so tokens issued earlier in the same second survive
+        return valid_after is not None and claims.get('iat', 0) < valid_after
+
+    def revoke(self, jti, expires_at=None):
+        """Record the token with this jti as revoked and drop expired records; commits the session."""
+        expired_before = datetime.utcnow() - timedelta(seconds=self.leeway)
+        try:
+            RevokedToken.query.filter(RevokedToken.expires_at < expired_before).delete(synchronize_session=False)
+            db.session.merge(RevokedToken(
+                jti=jti, expires_at=datetime.utcfromtimestamp(expires_at) if expires_at else None
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._remember(('jti', jti), True, float('inf'))
+
+    def forget_user(self, user_id):
+        """Drop the memoized tokens_valid_after for this user, so the next check reads it again."""
+        with self._lock:
+            self._checked.pop(('user', str(user_id)), None)
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+    def _jti_revoked(self, jti):
+        if jti is None:
+            return False
+        found, revoked = self._recall(('jti', jti))
+        if not found:
+            revoked = db.session.get(RevokedToken, jti) is not None
+            self._remember(('jti', jti), revoked, float('inf') if revoked else time.monotonic() + self.check_ttl)
+        return revoked
+
+    def _user_valid_after(self, identity):
+        try:
+            user_id = int(identity)
+        except (TypeError, ValueError):
+            return None
+        found, valid_after = self._recall(('user', str(user_id)))
+        if not found:
+            value = db.session.query(User.tokens_valid_after).filter_by(id=user_id).scalar()
+            valid_after = calendar.timegm(value.utctimetuple()) if value is not None else None
+            self._remember(('user', str(user_id)), valid_after, time.monotonic() + self.check_ttl)
+        return valid_after
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._checked.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return False, None
+            self._checked.move_to_end(key)
+            return True, entry[0]
+
+    def _remember(self, key, value, checked_until):
+        with self._lock:
+            self._checked[key] = (value, checked_until)
+            self._checked.move_to_end(key)
+            while len(self._checked) > self.max_size:
+                self._checked.popitem(last=False)
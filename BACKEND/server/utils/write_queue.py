@@ -0,0 +1,201 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import current_app
+from ..extensions import db
+
+
+class WriteQueueTimeout(Exception):
+    """
+    Raised by run_write when the write has not committed within WRITE_QUEUE_TIMEOUT.
+
+    `may_apply` is False when the job was still queued and has been cancelled,
+    so nothing was written; True when it had already started and may still commit.
+    """
+
+    def __init__(self, may_apply, retry_after=1):
+        super().__init__("Write is still in progress" if may_apply else "Write was cancelled before it started")
+        self.may_apply = may_apply
+        self.retry_after = retry_after
+
+
+class _WriteJob:
+    __slots__ = ('fn', 'args', 'kwargs', 'future')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteQueue:
+    """
+    One writer thread per worker that applies queued writes with group commits.
+
+    Each job is a function that uses db.session (it runs in the writer's own
+    app context) and returns plain values, never ORM objects. Jobs that arrive
+    within `max_wait` seconds of each other share one transaction, up to
+    `max_batch` jobs. A job that raises is rolled back alone and the rest of
+    its batch is re-applied. Callers get a Future that resolves once the
+    batch has committed.
+    """
+
+    def __init__(self, app, max_batch=50, max_wait=0.005):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'batches': 0, 'failed': 0, 'largest_batch': 0}
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        job = _WriteJob(fn, args, kwargs)
+        self.ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def stop(self, timeout=5):
+        """Apply everything already queued, then stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self):
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Finish this batch, then let _run see the stop marker
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._apply(batch)
+                except Exception as e:
+                    self.app.logger.error(f"Write queue error: {str(e)}")
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _apply(self, batch):
+        pending = list(batch)
+        while pending:
+            results = []
+            failed = None
+            for job in pending:
+                try:
+                    results.append(job.fn(*job.args, **job.kwargs))
+                except Exception as e:
+                    failed = (job, e)
+                    break
+
+            if failed is not None:
+                # Drop the failing job and replay the others on a clean transaction
+                db.session.rollback()
+                job, error = failed
+                pending.remove(job)
+                self.stats['failed'] += 1
+                self.app.logger.warning(f"Queued write {getattr(job.fn, '__name__', job.fn)} failed: {str(error)}")
+                job.future.set_exception(error)
+                continue
+
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.stats['failed'] += len(pending)
+                for job in pending:
+                    job.future.set_exception(e)
+                return
+
+            self.stats['batches'] += 1
+            self.stats['jobs'] += len(pending)
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(pending))
+            for job, result in zip(pending, results):
+                job.future.set_result(result)
+            return
+
+
+def init_write_queue(app):
+    """Create the writer for this app when WRITE_QUEUE_ENABLED (meant for SQLite deployments)."""
+    if not app.config.get('WRITE_QUEUE_ENABLED', False):
+        return None
+    writer = WriteQueue(
+        app,
+        max_batch=app.config.get('WRITE_QUEUE_MAX_BATCH', 50),
+        max_wait=app.config.get('WRITE_QUEUE_MAX_WAIT_MS', 5) / 1000
+    )
+    app.extensions['write_queue'] = writer
+    return writer
+
+
+def submit_write(fn, *args, **kwargs):
+    """
+    Run `fn(*args, **kwargs)` against db.session and commit; returns a Future of its result.
+
+    With the write queue enabled the work happens on the writer thread, so
+    `fn` must not touch objects loaded by the request. Otherwise it runs
+    right here in the request's session and the Future is already resolved.
+    """
+    writer = current_app.extensions.get('write_queue')
+    if writer is not None:
+        return writer.submit(fn, *args, **kwargs)
+
+    future = Future()
+    try:
+        result = fn(*args, **kwargs)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    submit_write and wait for the commit; re-raises the job's exception.
+
+    Past WRITE_QUEUE_TIMEOUT raises WriteQueueTimeout, cancelling the job first
+    if the writer has not picked it up yet.
+    """
+    future = submit_write(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=current_app.config.get('WRITE_QUEUE_TIMEOUT', 10))
+    except FutureTimeoutError:
+        raise WriteQueueTimeout(may_apply=not future.cancel())